@@ -39,14 +39,20 @@ def main():
     source_files = [str(source_dir / f) for f in fortran_sources]
     
     # f2py command - expose all needed subroutines
-    # This tells f2py to wrap iriwebg, irisubgl, and firisubl
+    # This tells f2py to wrap iriwebg, irisubgl, firisubl, the batch,
+    # sweep and ensemble drivers irisubgb/iriwebgs/iriwebge, the index
+    # reload iriindexr, the OpenMP thread count irithreads, the MSIS cache
+    # size irimsis, the magnetic coordinates irimag and their lookup grid
+    # irimagg, the FIRI tables firitab, daily F10.7 firif107 and point
+    # driver firisubp, the solar indices of the CCIR/URSI maps iritcon,
+    # and the counter accessors iristat/iristatr
     cmd = [
         sys.executable,
         "-m", "numpy.f2py",
         "-m", "iriweb",
         "--build-dir", str(build_dir),
         "--quiet",
-        "only:", "iriwebg", "irisubgl", "firisubl", ":"
+        "only:", "iriwebg", "irisubgl", "firisubl", "irisubgb", "iriwebgs", "iriwebge", "iriindexr", "irithreads", "irimsis", "irimag", "irimagg", "firitab", "firif107", "firisubp", "iritcon", "iristat", "iristatr", ":"
     ] + source_files
     
     print(f"Running f2py with Python: {sys.executable}")
@@ -6,7 +6,6 @@ except (ImportError, AttributeError):  # Python < 3.5
     from pathlib2 import Path  # type: ignore
 # %%
 try:
-    from .iriweb import iriwebg
     from timeutil import TimeUtilities
 except ModuleNotFoundError:
     # Create a simple fallback for TimeUtilities if not installed
@@ -21,7 +20,120 @@ except ModuleNotFoundError:
             return hours, minutes, seconds
 
 
-from numpy import arange, nan, ones, squeeze, where
+from functools import partial
+
+from numpy import (
+    arange,
+    array_split,
+    float32,
+    float64,
+    full,
+    nan,
+    ones,
+    squeeze,
+    where,
+)
+from numpy import dtype as as_dtype
+
+from .iriweb import iriindexr, irimsis, irithreads, iriwebg, iriwebgs
+from .shared import attach, fill
+from .times import decompose
+
+# Steps of IRI_WEB, as sized in irisub.for
+MAXSTP = 1000
+
+
+def _sweep_part(spec, task, args, addinp, folder):
+    """Worker of 'IRI2016Profile.Sweep': evaluate values[start:...] in place"""
+
+    start, values = task
+    a, b = iriwebgs(*args, values, addinp, folder)
+    arrays = attach(spec)
+    arrays["a"][:, :, start : start + len(values)] = a
+    arrays["b"][:, :, start : start + len(values)] = b
+
+
+def nsteps(start, stop, step):
+    """
+    Number of values from 'start' to 'stop' (inclusive) every 'step'; a
+    quotient within a millionth of a step of an integer counts as that
+    integer, so steps such as 0.1 km keep their last value
+    """
+
+    return int((stop - start) / step + 1e-6) + 1
+
+
+def _iriweb(dtype, *args):
+    """
+    Call IRI_WEB with the arguments of 'iriwebg', returning a (30, 1000) and
+    b (100, 1000) in double precision, or for dtype float32 from the
+    single-precision driver 'iriwebgs'; only the steps from vbeg to vend
+    hold results
+    """
+
+    dtype = as_dtype(dtype)
+    if dtype not in (float32, float64):
+        raise ValueError(f"dtype must be float32 or float64, not {dtype}")
+
+    hour = args[7]
+    vbeg, vend, vstp, addinp, folder = args[11:]
+    nstp = min(nsteps(vbeg, vend, vstp), MAXSTP)
+
+    if dtype == float64:
+        # IRI_WEB counts the steps in single precision, so end a hundredth
+        # of a step past the last one, as the native drivers do
+        return iriwebg(*args[:12], vbeg + (nstp - 0.99) * vstp, vstp, addinp, folder)
+
+    a, b = full((30, MAXSTP), -1.0, float32), full((100, MAXSTP), -1.0, float32)
+    a[:, :nstp], b[:, :nstp] = (
+        x[:, :, 0] for x in iriwebgs(*args[:12], vstp, nstp, 8, [hour], addinp, folder)
+    )
+    return a, b
+
+
+def reload_indices():
+    """
+    Read ig_rz.dat and apf107.dat again on the next model call
+
+    The native layer loads the index files once per process (and data
+    folder); call this after the files were updated by other means than
+    'pyiri2016.api.update.retrieve', which calls it itself.
+    """
+
+    iriindexr()
+
+
+def threads(n=None):
+    """
+    Set the number of OpenMP threads of the field-line drivers (used by
+    'IRI2016_2DProf.LatVsFL') to 'n', if given, and return the number in use
+
+    The native module uses threads only if built with OpenMP:
+
+        pip install . -Ccmake.define.PYIRI2016_OPENMP=ON
+
+    and returns 1 otherwise. The default is OMP_NUM_THREADS or the number of
+    cores. Every thread keeps its own copy of the model state, and results
+    do not depend on the number of threads.
+    """
+
+    return int(irithreads(n or 0))
+
+
+def msis_cache(size):
+    """
+    Keep the MSIS (GTD7) outputs of the last 'size' (at most 256, the
+    default) distinct inputs in the native layer, 0 to switch the cache off
+
+    IRI_SUB evaluates the neutral atmosphere at the same height, time and
+    location several times per profile, and again in sweeps that keep the
+    geometry fixed (ensembles, switch variants). Cached outputs are the ones
+    GTD7 returns for the same inputs; hits are counted as "gtd7_hit" in
+    'pyiri2016.counters'. With OpenMP, the cache of every thread has this
+    size.
+    """
+
+    irimsis(size)
 
 
 class IRI2016(object):
@@ -96,11 +208,17 @@ class IRI2016(object):
         vend=130.0 + 1.0,
         vstp=1.0,
         year=1980,
+        dtype=float,
+        time=None,
     ):
+        """
+        IRI at one location and local time; 'time' (datetime64, datetime or
+        ISO string, LT) replaces 'year', 'month', 'dom' and 'hrlt'
+        """
 
-        #        doy = squeeze(TimeUtilities().CalcDOY(year, month, dom))
-
-        hh, mm, ss = TimeUtilities().ToHMS(hrlt)
+        if time is not None:
+            year, mmdd, _, hrlt = (x.item() for x in decompose(time))
+            month, dom = divmod(mmdd, 100)
 
         # IRI options
         jf = self.Switches()
@@ -142,7 +260,8 @@ class IRI2016(object):
         ivstp = vstp
 
         # Ionosphere (IRI)
-        a, b = iriwebg(
+        a, b = _iriweb(
+            dtype,
             jmag,
             jf,
             glat,
@@ -247,7 +366,17 @@ class IRI2016Profile(IRI2016):
         option=1,
         verbose=True,
         year=2003,
+        dtype=float,
+        time=None,
     ):
+        """
+        'time' (datetime64, datetime or ISO string, UT if iut=1, LT
+        otherwise) replaces 'year', 'month', 'dom' and 'hour'
+        """
+
+        if time is not None:
+            year, mmdd, _, hour = (x.item() for x in decompose(time))
+            month, dom = divmod(mmdd, 100)
 
         self.iriDataFolder = Path(__file__).parent / "data"
 
@@ -289,7 +418,8 @@ class IRI2016Profile(IRI2016):
         self.alt = alt
 
         self.verbose = verbose
-        self.numstp = int((self.vend - self.vbeg) / self.vstp) + 1
+        self.dtype = dtype
+        self.numstp = nsteps(self.vbeg, self.vend, self.vstp)
 
         if option == 1:
             self.HeiProfile()
@@ -306,7 +436,8 @@ class IRI2016Profile(IRI2016):
 
     def _CallIRI(self):
 
-        self.a, self.b = iriwebg(
+        self.a, self.b = _iriweb(
+            self.dtype,
             self.jmag,
             self.jf,
             self.lat,
@@ -329,6 +460,63 @@ class IRI2016Profile(IRI2016):
     # End of '_CallIRI'
     #####
 
+    def Sweep(self, var, values, workers=1):
+        """
+        Repeat the profile set up in '__init__' for every value of a second
+        variable in one native call
+
+        var: 2 (latitude), 3 (longitude), 7 (day of year) or 8 (hour)
+        values: values of the second variable
+        workers: number of processes; with more than one, 'values' is split
+            among them and each writes its part of 'a' and 'b' in place in
+            shared memory (see pyiri2016.shared)
+
+        Returns arrays 'a' (30, numstp, len(values)) and 'b'
+        (100, numstp, len(values)), in single precision, laid out like
+        'self.a' and 'self.b' for each value. 'self.a' and 'self.b' are
+        set to the slices of the last value.
+        """
+
+        if var not in (2, 3, 7, 8):
+            raise ValueError("var must be 2 (lat), 3 (lon), 7 (day of year) or 8 (hour)")
+
+        args = (
+            self.jmag,
+            self.jf,
+            self.lat,
+            self.lon,
+            self.year,
+            self.mmdd,
+            self.iut,
+            self.hour,
+            self.alt,
+            self.htecmax,
+            self.option,
+            self.vbeg,
+            self.vstp,
+            self.numstp,
+            var,
+        )
+
+        nw = len(values)
+        if workers > 1 and nw > 1:
+            parts = array_split(arange(nw), min(workers, nw))
+            tasks = [(int(p[0]), [values[i] for i in p]) for p in parts]
+            shapes = {"a": (30, self.numstp, nw), "b": (100, self.numstp, nw)}
+            func = partial(_sweep_part, args=args, addinp=self.addinp, folder=self.iriDataFolder)
+            arrays = fill(shapes, func, tasks, workers, dtype=float32)
+            a, b = arrays["a"], arrays["b"]
+        else:
+            a, b = iriwebgs(*args, values, self.addinp, self.iriDataFolder)
+
+        self.a, self.b = a[:, :, -1], b[:, :, -1]
+
+        return a, b
+
+    #
+    # End of 'Sweep'
+    #####
+
     def _Hr2HHMMSS(self):
 
         self.HH = int(self.hour)
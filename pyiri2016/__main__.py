@@ -0,0 +1,29 @@
+"""
+Command-line entry point:
+
+    python -m pyiri2016 batch requests.csv -o results.csv --workers 4
+    python -m pyiri2016 job run ne-2003 --spec ne-2003.json --workers 8
+    python -m pyiri2016 serve --port 8765 --workers 4
+    python -m pyiri2016 validate --reference reference.npz --report validation.json
+"""
+
+import argparse
+
+from pyiri2016 import batch, jobs, server, validate
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(prog="python -m pyiri2016")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    batch.add_parser(subparsers)
+    jobs.add_parser(subparsers)
+    server.add_parser(subparsers)
+    validate.add_parser(subparsers)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""
+Adaptive-resolution latitude x longitude maps and height profiles.
+
+The map starts from a coarse grid and cells are split, level by level,
+only where the model fields bend faster than bilinear interpolation between
+the cell corners can follow (equatorial anomaly crests, terminator, auroral
+zones). Smooth regions are filled by interpolation, so a high-resolution map
+costs a fraction of the model evaluations of the uniform grid:
+
+    >>> from pyiri2016.adaptive import lat_lon_map
+    >>> m = lat_lon_map(2003, 11, 21, 12.0, latstp=1.0, lonstp=1.0)
+    >>> m["NmF2"].shape, m["evaluations"], m["error"].max()
+
+Height profiles are sampled the same way along altitude, anchored at the
+D, E, valley and F1/F2 peak heights the model reports, so a profile accurate
+to a fraction of a percent costs tens of evaluations:
+
+    >>> from pyiri2016.adaptive import height_profile
+    >>> p = height_profile(2003, 11, 21, 12.0, -11.95, -76.87)
+    >>> p.alt.size, p(numpy.arange(80.0, 1000.0, 0.1))["ne"]
+
+Every refinement level is evaluated in one native call.
+"""
+
+import numpy as np
+
+from pyiri2016 import batch
+
+MAP_FIELDS = ("NmF2", "hmF2", "TEC")
+
+PROFILE_FIELDS = ("ne", "te", "ti")
+
+# Heights reported in 'oarr' used as profile nodes: hmD, hmE, valley top,
+# hmF1 and hmF2
+ANCHORS = (7, 5, 11, 3, 1)
+
+# Interpolated in log: positive densities spanning decades
+LOG_FIELDS = ("ne",)
+
+
+def _nodes(n, stride):
+    """Coarse node indices along one axis, always including both ends"""
+
+    return np.unique(np.r_[np.arange(0, n, stride), n - 1])
+
+
+def _bilinear(corners, ti, tj):
+    """
+    Interpolate corner values (nfield, ncell, 2, 2) at fractional positions
+    ti, tj (ncell, npoint)
+    """
+
+    c = corners[..., None]
+    return (
+        c[:, :, 0, 0] * (1 - ti) * (1 - tj)
+        + c[:, :, 0, 1] * (1 - ti) * tj
+        + c[:, :, 1, 0] * ti * (1 - tj)
+        + c[:, :, 1, 1] * ti * tj
+    )
+
+
+def _fill(values, rows, cols):
+    """
+    Interpolate the rectangle spanned by the known rows x cols of 'values'
+    (nfield, nlat, nlon), piecewise bilinearly
+    """
+
+    i = np.arange(rows[0], rows[-1] + 1)
+    j = np.arange(cols[0], cols[-1] + 1)
+    block = []
+    for v in values:
+        across = np.array([np.interp(j, cols, row) for row in v[np.ix_(rows, cols)]])
+        block.append(np.array([np.interp(i, rows, col) for col in across.T]).T)
+    return np.ix_(i, j), np.array(block)
+
+
+def lat_lon_map(
+    year,
+    month,
+    day,
+    hour,
+    latlim=(-90.0, 90.0),
+    latstp=1.0,
+    lonlim=(-180.0, 180.0),
+    lonstp=1.0,
+    levels=4,
+    rtol=0.02,
+    fields=MAP_FIELDS,
+    refine=MAP_FIELDS,
+    alt=300.0,
+    iut=1,
+    jmag=0,
+    jf=None,
+    htecmax=None,
+):
+    """
+    Compute fields on the regular grid latlim x lonlim with steps
+    latstp x lonstp, evaluating the model only where needed
+
+    The initial grid is 2**levels times coarser than the requested one.
+    A cell is split in four while the model differs from the bilinear
+    interpolation of its corners, at its centre or edge midpoints, by more
+    than 'rtol' times the field's range over the coarse grid (for any of
+    'refine'), down to the requested resolution.
+
+    'fields' and 'refine' are names from pyiri2016.batch (height-dependent
+    ones are taken at 'alt'). TEC is integrated up to 'htecmax' km, 2000 km
+    by default when requested.
+
+    Returns a dict with 'lat' (nlat,), 'lon' (nlon,), every field with
+    shape (nlat, nlon), 'error' (nlat, nlon) with the estimated relative
+    interpolation error (0 at evaluated nodes), 'evaluated' (boolean mask of
+    nodes where the model was run) and 'evaluations' (their number).
+    """
+
+    fields = tuple(fields) + tuple(name for name in refine if name not in fields)
+    criteria = [fields.index(name) for name in refine]
+    if htecmax is None:
+        htecmax = 2000.0 if "TEC" in fields else 0.0
+
+    lat = latlim[0] + latstp * np.arange(round((latlim[1] - latlim[0]) / latstp) + 1)
+    lon = lonlim[0] + lonstp * np.arange(round((lonlim[1] - lonlim[0]) / lonstp) + 1)
+    nlat, nlon = lat.size, lon.size
+    if nlat < 2 or nlon < 2:
+        raise ValueError("the map needs at least two latitudes and two longitudes")
+
+    values = np.full((len(fields), nlat, nlon), np.nan)
+    error = np.zeros((nlat, nlon))
+    done = np.zeros((nlat, nlon), dtype=bool)
+
+    def run(i, j):
+        """Evaluate the model at the nodes (i, j) not evaluated yet"""
+
+        todo = ~done[i, j]
+        if not todo.any():
+            return
+        i, j = np.unique(np.stack([i[todo], j[todo]]), axis=1)
+        outf, oarr = batch.evaluate(
+            year,
+            month,
+            day,
+            hour,
+            lat[i],
+            lon[j],
+            alt=alt,
+            iut=iut,
+            jmag=jmag,
+            jf=jf,
+            htecmax=htecmax,
+        )
+        out = batch.to_fields(outf, oarr, fields)
+        for k, name in enumerate(fields):
+            values[k, i, j] = out[name]
+        done[i, j] = True
+
+    stride = 2**levels
+    ilat, ilon = _nodes(nlat, stride), _nodes(nlon, stride)
+    run(*[g.ravel() for g in np.meshgrid(ilat, ilon, indexing="ij")])
+
+    coarse = values[:, ilat][:, :, ilon]
+    scale = np.nanmax(coarse, axis=(1, 2)) - np.nanmin(coarse, axis=(1, 2))
+    scale = np.where(scale > 0, scale, 1.0)[:, None, None]
+
+    # Cells as rows of (i0, i1, j0, j1)
+    i0, j0 = np.meshgrid(ilat[:-1], ilon[:-1], indexing="ij")
+    i1, j1 = np.meshgrid(ilat[1:], ilon[1:], indexing="ij")
+    cells = np.stack([i0.ravel(), i1.ravel(), j0.ravel(), j1.ravel()], axis=1)
+
+    while cells.size:
+        i0, i1, j0, j1 = cells.T
+        im, jm = (i0 + i1) // 2, (j0 + j1) // 2
+
+        # Centre and edge midpoints of every cell
+        pi = np.stack([im, im, i0, i1, im], axis=1)
+        pj = np.stack([j0, j1, jm, jm, jm], axis=1)
+        run(pi.ravel(), pj.ravel())
+
+        corners = values[:, np.stack([i0, i0, i1, i1], axis=1), np.stack([j0, j1, j0, j1], axis=1)]
+        predicted = _bilinear(
+            corners.reshape(len(fields), -1, 2, 2),
+            (pi - i0[:, None]) / (i1 - i0)[:, None],
+            (pj - j0[:, None]) / (j1 - j0)[:, None],
+        )
+        err = np.abs(values[:, pi, pj] - predicted) / scale
+        err = np.nanmax(err[criteria], axis=(0, 2))
+        err = np.nan_to_num(err, nan=np.inf)
+
+        leaf = (err <= rtol) | ((i1 - i0 <= 1) & (j1 - j0 <= 1))
+        for c in np.flatnonzero(leaf):
+            rows = np.unique([i0[c], im[c], i1[c]])
+            cols = np.unique([j0[c], jm[c], j1[c]])
+            block, filled = _fill(values, rows, cols)
+            todo = ~done[block]
+            values[(slice(None),) + block] = np.where(todo, filled, values[(slice(None),) + block])
+            error[block] = np.where(todo, np.maximum(error[block], err[c]), 0.0)
+
+        children = []
+        for c in np.flatnonzero(~leaf):
+            lats = [(i0[c], im[c]), (im[c], i1[c])] if im[c] > i0[c] else [(i0[c], i1[c])]
+            lons = [(j0[c], jm[c]), (jm[c], j1[c])] if jm[c] > j0[c] else [(j0[c], j1[c])]
+            children += [(a, b, c_, d) for a, b in lats for c_, d in lons]
+        cells = np.array(children, dtype=int).reshape(-1, 4)
+
+    error[done] = 0.0
+
+    result = {"lat": lat, "lon": lon}
+    result.update({name: values[k] for k, name in enumerate(fields)})
+    result.update({"error": error, "evaluated": done, "evaluations": int(done.sum())})
+    return result
+
+
+def _pchip(x, xp, fp):
+    """
+    Shape-preserving piecewise cubic Hermite interpolation (Fritsch-Carlson
+    slopes), so resampled profiles do not overshoot the peaks
+    """
+
+    h = np.diff(xp)
+    delta = np.diff(fp) / h
+
+    d = np.zeros_like(fp)
+    w1, w2 = 2 * h[1:] + h[:-1], h[1:] + 2 * h[:-1]
+    same = delta[:-1] * delta[1:] > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d[1:-1] = np.where(same, (w1 + w2) / (w1 / delta[:-1] + w2 / delta[1:]), 0.0)
+
+    if xp.size > 2:
+        for end, (h0, h1, d0, d1) in (
+            (0, (h[0], h[1], delta[0], delta[1])),
+            (-1, (h[-1], h[-2], delta[-1], delta[-2])),
+        ):
+            slope = ((2 * h0 + h1) * d0 - h0 * d1) / (h0 + h1)
+            if np.sign(slope) != np.sign(d0):
+                slope = 0.0
+            elif np.sign(d0) != np.sign(d1) and abs(slope) > abs(3 * d0):
+                slope = 3 * d0
+            d[end] = slope
+    else:
+        d[:] = delta[0]
+
+    k = np.clip(np.searchsorted(xp, x) - 1, 0, xp.size - 2)
+    t = (x - xp[k]) / h[k]
+    return (
+        (2 * t**3 - 3 * t**2 + 1) * fp[k]
+        + (t**3 - 2 * t**2 + t) * h[k] * d[k]
+        + (-2 * t**3 + 3 * t**2) * fp[k + 1]
+        + (t**3 - t**2) * h[k] * d[k + 1]
+    )
+
+
+def _interp(x, xp, fp, log):
+
+    if log and (fp > 0).all():
+        return np.exp(_pchip(x, xp, np.log(fp)))
+    return _pchip(x, xp, fp)
+
+
+class HeightProfile:
+    """
+    Nonuniform height profile returned by 'height_profile'
+
+    'alt' holds the sampled heights (km, increasing), 'values' a dict of
+    the fields on them, 'peaks' the anchor heights found in the model
+    output and 'evaluations' the number of model calls. Calling the profile
+    with an array of heights resamples every field with the same
+    interpolation the error tolerance was checked against.
+    """
+
+    def __init__(self, alt, values, peaks, evaluations):
+
+        self.alt = alt
+        self.values = values
+        self.peaks = peaks
+        self.evaluations = evaluations
+
+    def __call__(self, alt):
+
+        alt = np.asarray(alt, dtype=float)
+        return {
+            name: _interp(alt, self.alt, v, name in LOG_FIELDS) for name, v in self.values.items()
+        }
+
+
+def height_profile(
+    year,
+    month,
+    day,
+    hour,
+    lat,
+    lon,
+    altlim=(80.0, 1000.0),
+    rtol=0.01,
+    minstp=0.1,
+    maxstp=50.0,
+    fields=PROFILE_FIELDS,
+    refine=("ne",),
+    iut=1,
+    jmag=0,
+    jf=None,
+):
+    """
+    Sample a height profile between 'altlim' densely only where needed
+
+    Sampling starts from a grid of at most 'maxstp' km plus the model's
+    own D, E, valley, F1 and F2 peak heights. Every interval is then halved
+    while any of 'refine' at its midpoint differs from the profile's own
+    interpolation (monotone cubic, in log for Ne) by more than 'rtol' of the
+    value, down to intervals of 'minstp' km.
+
+    Returns a HeightProfile.
+    """
+
+    fields = tuple(fields) + tuple(name for name in refine if name not in fields)
+    evaluations = 0
+
+    def run(alt):
+
+        nonlocal evaluations
+        evaluations += alt.size
+        outf, oarr = batch.evaluate(
+            year, month, day, hour, lat, lon, alt=alt, iut=iut, jmag=jmag, jf=jf
+        )
+        return batch.to_fields(outf, oarr, fields), oarr
+
+    n = int(np.ceil((altlim[1] - altlim[0]) / maxstp)) + 1
+    alt = np.linspace(altlim[0], altlim[1], n)
+    values, oarr = run(alt)
+
+    peaks = oarr[list(ANCHORS), 0].astype(float)
+    peaks = np.unique(peaks[(peaks > altlim[0]) & (peaks < altlim[1])])
+    peaks = peaks[~np.isin(peaks, alt)]
+    if peaks.size:
+        new, _ = run(peaks)
+        alt, values = _merge(alt, values, peaks, new)
+
+    # Intervals (as indices of their lower end) still to be checked
+    lower = np.arange(alt.size - 1)
+    while True:
+        lower = lower[alt[lower + 1] - alt[lower] > minstp]
+        if not lower.size:
+            break
+
+        mid = 0.5 * (alt[lower] + alt[lower + 1])
+        new, _ = run(mid)
+
+        bad = np.zeros(mid.size, dtype=bool)
+        for name in refine:
+            guess = _interp(mid, alt, values[name], name in LOG_FIELDS)
+            bad |= np.abs(new[name] - guess) > rtol * np.abs(new[name])
+
+        alt, values = _merge(alt, values, mid, new)
+
+        # Both halves of a failed interval are checked again
+        split = np.searchsorted(alt, mid[bad])
+        lower = np.sort(np.r_[split - 1, split])
+
+    return HeightProfile(alt, values, oarr[list(ANCHORS), 0].astype(float), evaluations)
+
+
+def _merge(alt, values, new_alt, new_values):
+    """Insert samples at 'new_alt' into the sorted profile"""
+
+    order = np.argsort(np.r_[alt, new_alt], kind="stable")
+    alt = np.r_[alt, new_alt][order]
+    values = {name: np.r_[v, new_values[name]][order] for name, v in values.items()}
+    return alt, values
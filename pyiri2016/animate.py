@@ -0,0 +1,241 @@
+"""
+Animated lat x lon maps over a list of times.
+
+Frames are computed and rendered in worker processes and encoded to a GIF
+or MP4 file as they arrive, in time order:
+
+    >>> from pyiri2016.animate import animate
+    >>> start = numpy.datetime64("2010-09-01T00:00")
+    >>> times = start + numpy.arange(288) * numpy.timedelta64(5, "m")
+    >>> animate(times, "foF2.gif", workers=8)
+
+At most 2 * workers frames are in flight, so memory does not grow with the
+number of frames. Each worker keeps one figure and redraws only the map data
+(see pyiri2016.mapplot), and the output only depends on the inputs, not on
+the number of workers. MP4 output needs the 'ffmpeg' executable.
+"""
+
+import subprocess
+from contextlib import ExitStack
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+from matplotlib import rcParams
+from PIL import Image
+from PIL.GifImagePlugin import getdata, getheader
+
+from pyiri2016 import batch
+from pyiri2016.mapplot import MapFigure
+from pyiri2016.times import calendar
+
+# Fields derived from the batch fields
+DERIVED = {"foF2": ("NmF2", lambda nmf2: 9.0 * np.sqrt(nmf2) * 1e-6)}
+
+LABELS = {"foF2": "foF2 (MHz)", "hmF2": "hmF2 (km)", "NmF2": "NmF2 (m$^{-3}$)", "TEC": "TEC (TECU)"}
+
+
+class GIFWriter:
+    """
+    Write frames to an animated GIF one at a time; frames are palette
+    images (see 'quantize'), each stored with its own color table
+    """
+
+    quantized = True
+
+    def __init__(self, path, fps, loop=0):
+
+        with ExitStack() as files:
+            self.fp = files.enter_context(open(path, "wb"))
+            self.files = files.pop_all()
+        self.duration = round(1000.0 / fps)
+        self.loop = loop
+        self.started = False
+
+    @staticmethod
+    def quantize(frame):
+        """RGB array -> 256-color palette image, as done in the workers"""
+
+        return Image.fromarray(frame).quantize(256, method=Image.Quantize.MEDIANCUT)
+
+    def write(self, im):
+
+        if not self.started:
+            header, _ = getheader(im, info={"loop": self.loop, "duration": self.duration})
+            self.fp.write(b"".join(header))
+            self.started = True
+        self.fp.write(b"".join(getdata(im, duration=self.duration, include_color_table=True)))
+
+    def close(self):
+
+        self.fp.write(b";")
+        self.files.close()
+
+
+class MP4Writer:
+    """Pipe RGB frames to ffmpeg, encoding H.264 while frames arrive"""
+
+    quantized = False
+
+    def __init__(self, path, fps):
+
+        self.path, self.fps = str(path), fps
+        self.proc = None
+
+    def write(self, frame):
+
+        if self.proc is None:
+            height, width, _ = frame.shape
+            command = [
+                rcParams["animation.ffmpeg_path"],
+                "-y",
+                "-loglevel",
+                "error",
+                "-f",
+                "rawvideo",
+                "-pix_fmt",
+                "rgb24",
+                "-s",
+                f"{width}x{height}",
+                "-r",
+                str(self.fps),
+                "-i",
+                "-",
+                "-vf",
+                "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+                "-c:v",
+                "libx264",
+                "-pix_fmt",
+                "yuv420p",
+                "-threads",
+                "1",
+                "-fflags",
+                "+bitexact",
+                "-flags",
+                "+bitexact",
+                self.path,
+            ]
+            try:
+                self.proc = subprocess.Popen(command, stdin=subprocess.PIPE)
+            except FileNotFoundError:
+                raise RuntimeError(
+                    "MP4 output needs ffmpeg (rcParams['animation.ffmpeg_path'])"
+                ) from None
+        self.proc.stdin.write(np.ascontiguousarray(frame).tobytes())
+
+    def close(self):
+
+        if self.proc is not None:
+            self.proc.stdin.close()
+            if self.proc.wait():
+                raise RuntimeError(f"ffmpeg failed writing {self.path}")
+
+
+WRITERS = {".gif": GIFWriter, ".mp4": MP4Writer}
+
+# Figure of the current worker process, reused by all its frames
+_figures: dict[tuple, MapFigure] = {}
+
+
+def _frame(item, field, lat, lon, vmin, vmax, alt, preset, figsize, dpi, quantized):
+    """
+    Compute and render one frame; returns an (height, width, 3) uint8 array,
+    or a GIF palette image if 'quantized'
+    """
+
+    time = np.datetime64(item, "s")
+    year, month, day, hour = calendar(time)
+
+    la, lo = np.meshgrid(lat, lon, indexing="ij")
+    source, convert = DERIVED.get(field, (field, None))
+    outf, oarr = batch.evaluate(
+        year, month, day, hour, la.ravel(), lo.ravel(), alt=alt, preset=preset
+    )
+    values = batch.to_fields(outf, oarr, (source, "dip"))
+    data = values[source].reshape(la.shape)
+    if convert is not None:
+        data = convert(data)
+
+    key = (figsize, dpi)
+    if key not in _figures:
+        _figures[key] = MapFigure(1, 1, figsize=figsize)
+        _figures[key].figure.set_dpi(dpi)
+    fig = _figures[key]
+
+    fig.panel(1).draw(
+        lat,
+        lon,
+        data,
+        vmin,
+        vmax,
+        dip=values["dip"].reshape(la.shape),
+        title=f"{str(time).replace('T', ' ')} UT",
+        label=LABELS.get(field, field),
+    )
+    canvas = fig.figure.canvas
+    canvas.draw()
+    frame = np.asarray(canvas.buffer_rgba())[:, :, :3].copy()
+    return GIFWriter.quantize(frame) if quantized else frame
+
+
+def animate(
+    times,
+    path,
+    field="foF2",
+    latlim=(-90.0, 90.0),
+    latstp=2.0,
+    lonlim=(-180.0, 180.0),
+    lonstp=4.0,
+    vmin=0.0,
+    vmax=15.0,
+    alt=300.0,
+    preset=None,
+    fps=10,
+    figsize=(12, 6),
+    dpi=100,
+    workers=1,
+    progress=None,
+):
+    """
+    Render a map of 'field' for every one of 'times' (UT; datetimes,
+    datetime64 or ISO strings) into the animation 'path' (.gif or .mp4)
+
+    'field' is a pyiri2016.batch field name or "foF2"; height-dependent
+    fields are taken at 'alt'. 'progress' is an optional file object
+    receiving one line per frame. Returns the number of frames.
+    """
+
+    path = Path(path)
+    if path.suffix.lower() not in WRITERS:
+        raise ValueError(f"Unknown animation format: {path.suffix} (use .gif or .mp4)")
+
+    lat = latlim[0] + latstp * np.arange(round((latlim[1] - latlim[0]) / latstp) + 1)
+    lon = lonlim[0] + lonstp * np.arange(round((lonlim[1] - lonlim[0]) / lonstp) + 1)
+    times = np.asarray(times, dtype="datetime64[s]").ravel()
+
+    writer = WRITERS[path.suffix.lower()](path, fps)
+    func = partial(
+        _frame,
+        field=field,
+        lat=lat,
+        lon=lon,
+        vmin=vmin,
+        vmax=vmax,
+        alt=alt,
+        preset=preset,
+        figsize=figsize,
+        dpi=dpi,
+        quantized=writer.quantized,
+    )
+
+    count = 0
+    try:
+        for frame in batch._ordered(iter(times), func, workers):
+            writer.write(frame)
+            count += 1
+            if progress is not None:
+                print(f"frame {count}/{times.size}", file=progress)
+    finally:
+        writer.close()
+
+    return count
@@ -2,6 +2,8 @@ import wget
 import tarfile
 import os
 
+import pyiri2016
+
 
 def retrieve(url: str, filename: str, directory: str) -> None:
     retrieved_fullpath = wget.download(f"{url}/{filename}", out=directory, bar=wget.bar_thermometer)
@@ -54,3 +56,6 @@ def retrieve(url: str, filename: str, directory: str) -> None:
 
             safe_extract(tar, path=directory)
         os.remove(retrieved_fullpath)
+
+    # The native layer keeps the index files of a folder loaded
+    pyiri2016.reload_indices()
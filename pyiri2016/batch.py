@@ -0,0 +1,576 @@
+"""
+Batch evaluation of IRI2016 for many independent points or height profiles,
+and the streaming runner behind ``python -m pyiri2016 batch``.
+
+Requests are rows with the columns ``year, month, day, hour, lat, lon`` and an
+optional ``alt`` (km). Each chunk of rows is evaluated in a single call to the
+native driver ``irisubgb``, so the index files are read once per chunk rather
+than once per point.
+"""
+
+import csv
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+from pyiri2016 import magnetic, presets
+from pyiri2016.iriweb import irisubgb
+from pyiri2016.times import as_datetime64, calendar, day_order
+
+DataFolder = Path(__file__).parent / "data"
+
+# Heights per profile request, as sized in IRI_SUB
+MAXALT = 1000
+
+COLUMNS = ("year", "month", "day", "hour", "lat", "lon", "alt")
+
+# Rows of 'outf' (height dependent) and 'oarr' (per request), see IRI_SUB
+OUTF_FIELDS = {
+    "ne": 0,
+    "tn": 1,
+    "ti": 2,
+    "te": 3,
+    "oplus": 4,
+    "hplus": 5,
+    "heplus": 6,
+    "o2plus": 7,
+    "noplus": 8,
+    "cluster": 9,
+    "nplus": 10,
+    "babs": 19,
+}
+OARR_FIELDS = {
+    "NmF2": 0,
+    "hmF2": 1,
+    "NmF1": 2,
+    "hmF1": 3,
+    "NmE": 4,
+    "hmE": 5,
+    "B0": 9,
+    "sza": 22,
+    "dip": 24,
+    "modip": 26,
+    "Rz12": 32,
+    "M3000F2": 35,
+    "TEC": 36,
+    "IG12": 38,
+    "F107": 40,
+    "F107_81": 45,
+    "ap": 50,
+    "Ap": 51,
+}
+FIELDS = ("ne", "te", "ti", "NmF2", "hmF2", "B0")
+
+
+def default_switches():
+    """Switches used by 'IRI2016.IRI' for dates covered by the index files"""
+
+    return presets.get("full").switches()
+
+
+def evaluate(
+    year,
+    month,
+    day,
+    hour,
+    lat,
+    lon,
+    alt=300.0,
+    altstp=1.0,
+    nalt=1,
+    iut=1,
+    jmag=0,
+    jf=None,
+    htecmax=0.0,
+    preset=None,
+    maggrid=None,
+):
+    """
+    Evaluate IRI for arrays of requests in one native call
+
+    Inputs broadcast against each other. Every request is a single point
+    (nalt=1) or a profile of 'nalt' heights starting at 'alt' with step
+    'altstp'. 'hour' is UT if iut=1, LT otherwise. A 'preset' (name or
+    pyiri2016.presets.Preset) sets 'jf' and 'htecmax'. With 'maggrid'
+    (True, or a dict of pyiri2016.magnetic.grid options such as 'tol' and
+    'cache_dir'), the magnetic coordinates are interpolated in the lookup
+    grid of every year instead of computed with IGRF, in one native call
+    per year.
+
+    Returns the raw model arrays 'outf' with shape (30, nalt, n) and
+    'oarr' with shape (100, n), in the model's single precision.
+    """
+
+    year, month, day, hour, lat, lon, alt = np.broadcast_arrays(
+        *map(np.atleast_1d, (year, month, day, hour, lat, lon, alt))
+    )
+    if not 1 <= nalt <= MAXALT:
+        raise ValueError(f"nalt must be between 1 and {MAXALT}")
+    if preset is not None:
+        preset = presets.get(preset)
+        jf, htecmax = preset.switches(), preset.htecmax
+    if jf is None:
+        jf = default_switches()
+
+    year = year.astype(int)
+    mmdd = month.astype(int) * 100 + day.astype(int)
+    dhour = hour + (25.0 if iut else 0.0)
+    requests = (year, mmdd, dhour, lat, lon, alt)
+
+    if not maggrid:
+        return irisubgb(jf, jmag, *requests, altstp, nalt, htecmax, str(DataFolder))
+
+    options = maggrid if isinstance(maggrid, dict) else {}
+    outf = np.empty((30, nalt, len(year)), dtype=np.float32)
+    oarr = np.empty((100, len(year)), dtype=np.float32)
+    for epoch in np.unique(year):
+        sel = year == epoch
+        with magnetic.use(epoch, **options):
+            outf[:, :, sel], oarr[:, sel] = irisubgb(
+                jf, jmag, *(a[sel] for a in requests), altstp, nalt, htecmax, str(DataFolder)
+            )
+    return outf, oarr
+
+
+def evaluate_times(times, lat, lon, alt=300.0, **kwargs):
+    """
+    Like 'evaluate', for an array of datetime64 'times' (UT if iut=1, the
+    default, LT otherwise) instead of 'year', 'month', 'day' and 'hour'
+
+    The requests are handed to the model sorted by day, so the per-day index
+    state and per-month coefficients cached inside IRI_SUB are set up once
+    per day however the times are ordered. 'lat', 'lon' and 'alt' broadcast
+    against 'times'; the results follow the order of the flattened inputs.
+    """
+
+    times, lat, lon, alt = np.broadcast_arrays(as_datetime64(times), lat, lon, alt)
+    times, lat, lon, alt = (np.ravel(x) for x in (times, lat, lon, alt))
+    order = day_order(times)
+
+    year, month, day, hour = calendar(times[order])
+    outf, oarr = evaluate(year, month, day, hour, lat[order], lon[order], alt[order], **kwargs)
+
+    inverse = np.empty_like(order)
+    inverse[order] = np.arange(len(order))
+
+    return outf[:, :, inverse], oarr[:, inverse]
+
+
+def to_fields(outf, oarr, fields=FIELDS):
+    """
+    Pick named fields from raw 'evaluate' output
+
+    Height-dependent fields have shape (n,) for points and (n, nalt) for
+    profiles; peak parameters and indices have shape (n,).
+    """
+
+    out = {}
+    for name in fields:
+        if name in OUTF_FIELDS:
+            arr = outf[OUTF_FIELDS[name]].T
+            out[name] = arr[:, 0] if arr.shape[1] == 1 else arr
+        elif name in OARR_FIELDS:
+            out[name] = oarr[OARR_FIELDS[name]]
+        else:
+            raise KeyError(f"Unknown field: {name}")
+    return out
+
+
+#
+# Streaming input
+#
+
+
+def _columns(rows, alt):
+    """List of row dicts -> dict of column arrays"""
+
+    chunk = {}
+    for name in COLUMNS:
+        if name == "alt" and (not rows or "alt" not in rows[0]):
+            chunk[name] = np.full(len(rows), alt, dtype=float)
+        else:
+            chunk[name] = np.array([float(row[name]) for row in rows])
+    return chunk
+
+
+def read_csv(fp, chunk_size, alt=300.0):
+
+    rows = []
+    for row in csv.DictReader(fp):
+        rows.append(row)
+        if len(rows) == chunk_size:
+            yield _columns(rows, alt)
+            rows = []
+    if rows:
+        yield _columns(rows, alt)
+
+
+def read_ndjson(fp, chunk_size, alt=300.0):
+
+    rows = []
+    for line in fp:
+        if not line.strip():
+            continue
+        rows.append(json.loads(line))
+        if len(rows) == chunk_size:
+            yield _columns(rows, alt)
+            rows = []
+    if rows:
+        yield _columns(rows, alt)
+
+
+def read_npy(fp, chunk_size, alt=300.0):
+    """
+    Stream rows of a .npy file without loading it: either a structured
+    array with named columns or a 2D array with columns in 'COLUMNS' order
+    """
+
+    version = np.lib.format.read_magic(fp)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fp)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fp)
+    if fortran_order:
+        raise ValueError("Fortran-ordered .npy input is not supported")
+
+    ncol = 1 if dtype.names else shape[1]
+    row_bytes = dtype.itemsize * ncol
+    nrows = shape[0]
+
+    while nrows > 0:
+        count = min(chunk_size, nrows)
+        buf = fp.read(count * row_bytes)
+        arr = np.frombuffer(buf, dtype=dtype)
+        if dtype.names:
+            chunk = {name: arr[name].astype(float) for name in COLUMNS if name in dtype.names}
+        else:
+            arr = arr.reshape(count, ncol)
+            chunk = {name: arr[:, i].astype(float) for i, name in enumerate(COLUMNS[:ncol])}
+        chunk.setdefault("alt", np.full(count, alt, dtype=float))
+        yield chunk
+        nrows -= count
+
+
+READERS = {"csv": read_csv, "ndjson": read_ndjson, "npy": read_npy}
+
+
+#
+# Streaming output
+#
+
+
+class CSVWriter:
+    def __init__(self, fp, fields, alts):
+        self.fp, self.fields, self.alts = fp, fields, alts
+        self.writer = csv.writer(fp)
+        self.writer.writerow(list(COLUMNS) + list(fields))
+
+    def write(self, chunk, values):
+        n = len(chunk["year"])
+        for i in range(n):
+            base = [chunk[name][i] for name in COLUMNS[:-1]]
+            for k in range(len(self.alts)):
+                alt = chunk["alt"][i] + self.alts[k]
+                row = [v[i] if v.ndim == 1 else v[i, k] for v in values.values()]
+                self.writer.writerow(base + [alt] + row)
+
+    def close(self):
+        self.fp.flush()
+
+
+class NDJSONWriter:
+    def __init__(self, fp, fields, alts):
+        self.fp, self.fields, self.alts = fp, fields, alts
+
+    def write(self, chunk, values):
+        n = len(chunk["year"])
+        for i in range(n):
+            record = {name: float(chunk[name][i]) for name in COLUMNS}
+            for name, v in values.items():
+                record[name] = float(v[i]) if v.ndim == 1 else v[i].tolist()
+            self.fp.write(json.dumps(record) + "\n")
+
+    def close(self):
+        self.fp.flush()
+
+
+class NPYWriter:
+    """
+    Structured .npy writer; the header is written with a placeholder
+    length and rewritten on close, so the output file must be seekable
+    """
+
+    PREFIX = b"\x93NUMPY\x01\x00"
+
+    def __init__(self, fp, fields, alts):
+        if not fp.seekable():
+            raise ValueError("npy output needs a seekable file, not a pipe")
+        self.fp, self.count = fp, 0
+        nalt = len(alts)
+        self.dtype = np.dtype(
+            [(name, "f8") for name in COLUMNS]
+            + [
+                (name, "f4", (nalt,)) if name in OUTF_FIELDS and nalt > 1 else (name, "f4")
+                for name in fields
+            ]
+        )
+        # Reserve room for the widest row count, keeping 64-byte alignment
+        widest = len(self._dict(10**18)) + 1
+        self.size = 64 * ((len(self.PREFIX) + 2 + widest) // 64 + 1) - len(self.PREFIX) - 2
+        self._header()
+
+    def _dict(self, count):
+        return repr({"descr": self.dtype.descr, "fortran_order": False, "shape": (count,)})
+
+    def _header(self):
+        header = self._dict(self.count).ljust(self.size - 1) + "\n"
+        self.fp.seek(0)
+        self.fp.write(self.PREFIX + np.uint16(self.size).tobytes() + header.encode("latin1"))
+        self.fp.seek(0, 2)
+
+    def write(self, chunk, values):
+        n = len(chunk["year"])
+        records = np.empty(n, dtype=self.dtype)
+        for name in COLUMNS:
+            records[name] = chunk[name]
+        for name, v in values.items():
+            records[name] = v
+        self.fp.write(records.tobytes())
+        self.count += n
+
+    def close(self):
+        self._header()
+        self.fp.flush()
+
+
+WRITERS = {"csv": CSVWriter, "ndjson": NDJSONWriter, "npy": NPYWriter}
+
+
+#
+# Runner
+#
+
+
+def _evaluate_chunk(chunk, fields, nalt, altstp, iut, jmag, htecmax, preset, maggrid=None):
+
+    outf, oarr = evaluate(
+        chunk["year"],
+        chunk["month"],
+        chunk["day"],
+        chunk["hour"],
+        chunk["lat"],
+        chunk["lon"],
+        alt=chunk["alt"],
+        altstp=altstp,
+        nalt=nalt,
+        iut=iut,
+        jmag=jmag,
+        htecmax=htecmax,
+        preset=preset,
+        maggrid=maggrid,
+    )
+    return chunk, to_fields(outf, oarr, fields)
+
+
+def _ordered(chunks, func, workers):
+    """
+    Map 'func' over 'chunks' keeping at most 2 * workers chunks in flight,
+    yielding results in input order as soon as they are done
+    """
+
+    if workers <= 1:
+        for chunk in chunks:
+            yield func(chunk)
+        return
+
+    pending = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in chunks:
+            pending.append(pool.submit(func, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def run(
+    source,
+    sink,
+    informat="csv",
+    outformat="csv",
+    fields=FIELDS,
+    chunk_size=10000,
+    workers=1,
+    alt=300.0,
+    profile=None,
+    iut=1,
+    jmag=0,
+    htecmax=0.0,
+    preset=None,
+    maggrid=None,
+    progress=None,
+):
+    """
+    Stream requests from file object 'source' to file object 'sink'
+
+    'profile' is an optional (altstp, nalt) pair turning each request into
+    a height profile starting at its 'alt'. 'preset' names a compute preset
+    (see pyiri2016.presets) overriding 'htecmax'. 'maggrid' is passed on to
+    'evaluate'. 'progress' is an optional file
+    object receiving one throughput line per chunk. Returns the number of
+    requests and the elapsed time in seconds.
+    """
+
+    altstp, nalt = profile if profile else (1.0, 1)
+    if preset is not None:
+        htecmax = presets.get(preset).htecmax
+    if htecmax > 0.0 and "TEC" not in fields:
+        fields = tuple(fields) + ("TEC",)
+
+    chunks = READERS[informat](source, chunk_size, alt)
+    writer = WRITERS[outformat](sink, fields, altstp * np.arange(nalt))
+
+    func = partial(
+        _evaluate_chunk,
+        fields=fields,
+        nalt=nalt,
+        altstp=altstp,
+        iut=iut,
+        jmag=jmag,
+        htecmax=htecmax,
+        preset=preset,
+        maggrid=maggrid,
+    )
+
+    count, start = 0, time.perf_counter()
+    for chunk, values in _ordered(chunks, func, workers):
+        writer.write(chunk, values)
+        count += len(chunk["year"])
+        if progress is not None:
+            elapsed = time.perf_counter() - start
+            print(
+                f"{count} requests, {elapsed:.1f} s, {count / elapsed:.0f} requests/s",
+                file=progress,
+            )
+    writer.close()
+
+    return count, time.perf_counter() - start
+
+
+def _format(path, default):
+
+    if path is None or path == "-":
+        return default
+    suffix = Path(path).suffix.lower()
+    return {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".npy": "npy"}.get(
+        suffix, default
+    )
+
+
+def _maggrid(args):
+    """'maggrid' option of 'evaluate' from the --maggrid* arguments"""
+
+    if args.maggrid is None:
+        return None
+    options = {"tol": args.maggrid}
+    if args.maggrid_cache:
+        options["cache_dir"] = args.maggrid_cache
+    return options
+
+
+def main(args):
+    """Entry point for 'python -m pyiri2016 batch'"""
+
+    informat = args.informat or _format(args.input, "csv")
+    outformat = args.outformat or _format(args.output, "csv")
+    binary_in, binary_out = informat == "npy", outformat == "npy"
+
+    with ExitStack() as files:
+        if args.input in (None, "-"):
+            source = sys.stdin.buffer if binary_in else sys.stdin
+        else:
+            source = files.enter_context(
+                open(args.input, "rb" if binary_in else "r", newline=None if binary_in else "")
+            )
+
+        if args.output in (None, "-"):
+            sink = sys.stdout.buffer if binary_out else sys.stdout
+        else:
+            sink = files.enter_context(
+                open(args.output, "w+b" if binary_out else "w", newline=None if binary_out else "")
+            )
+
+        count, elapsed = run(
+            source,
+            sink,
+            informat=informat,
+            outformat=outformat,
+            fields=tuple(args.fields.split(",")),
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            alt=args.alt,
+            profile=(args.altstp, args.nalt) if args.nalt > 1 else None,
+            iut=0 if args.lt else 1,
+            jmag=1 if args.geomagnetic else 0,
+            htecmax=args.htecmax,
+            preset=args.preset,
+            maggrid=_maggrid(args),
+            progress=sys.stderr if args.progress else None,
+        )
+
+    if not args.quiet:
+        rate = count / elapsed if elapsed > 0 else 0.0
+        print(f"{count} requests in {elapsed:.2f} s ({rate:.0f} requests/s)", file=sys.stderr)
+
+
+def add_parser(subparsers):
+    """Register the 'batch' sub-command"""
+
+    parser = subparsers.add_parser(
+        "batch",
+        help="evaluate point or profile requests from CSV, NDJSON or .npy",
+        description="Stream requests (year, month, day, hour, lat, lon[, alt]) "
+        "through IRI2016 in native batches.",
+    )
+    parser.add_argument("input", nargs="?", help="input file (default: stdin)")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--informat", choices=sorted(READERS))
+    parser.add_argument("--outformat", choices=sorted(WRITERS))
+    parser.add_argument(
+        "--fields",
+        default=",".join(FIELDS),
+        help="comma-separated output fields, from: "
+        + ", ".join(list(OUTF_FIELDS) + list(OARR_FIELDS)),
+    )
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--alt", type=float, default=300.0, help="height if not in input, km")
+    parser.add_argument("--nalt", type=int, default=1, help="heights per profile request")
+    parser.add_argument("--altstp", type=float, default=1.0, help="profile height step, km")
+    parser.add_argument("--lt", action="store_true", help="'hour' is local time (default UT)")
+    parser.add_argument("--geomagnetic", action="store_true", help="lat/lon are geomagnetic")
+    parser.add_argument("--htecmax", type=float, default=0.0, help="TEC upper boundary, km")
+    parser.add_argument(
+        "--preset", choices=list(presets.PRESETS), help="compute preset (sets --htecmax)"
+    )
+    parser.add_argument(
+        "--maggrid",
+        type=float,
+        nargs="?",
+        const=magnetic.TOL,
+        metavar="TOL",
+        help="magnetic coordinates from a lookup grid with this error bound, degrees "
+        f"(default {magnetic.TOL:g}), instead of IGRF",
+    )
+    parser.add_argument("--maggrid-cache", metavar="DIR", help="directory of cached grids")
+    parser.add_argument("--progress", action="store_true", help="report every chunk")
+    parser.add_argument("--quiet", action="store_true", help="no throughput summary")
+    parser.set_defaults(func=main)
+
+    return parser
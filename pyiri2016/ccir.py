@@ -0,0 +1,284 @@
+"""
+CCIR and URSI maps of the F2 peak (foF2, M(3000)F2 and the NmF2 and hmF2
+derived from them) evaluated with NumPy for whole grids.
+
+IRI_SUB evaluates the maps (GAMMA1 in irifun.for) one point at a time.
+They are sums of coefficients times fixed functions of modified dip,
+latitude and longitude (G) and of UT (T), so for the coefficients A of a
+day, interpolated in month and solar activity as IRI_SUB does, a map over
+a lat x lon x UT grid is the matrix product G @ A @ T:
+
+    >>> from pyiri2016 import ccir
+    >>> lat, lon = np.arange(-90, 91, 1.0), np.arange(0, 360, 1.0)
+    >>> times = np.datetime64("2003-11-21") + np.arange(24) * np.timedelta64(1, "h")
+    >>> peaks = ccir.maps(times, lat, lon)         # (24, 181, 360) per field
+    >>> peaks = ccir.evaluate(times, -11.95, -76.87)          # broadcast points
+
+The results are those of IRI_SUB with the default switches without storm
+updating (IRI2016().Switches()): URSI foF2 (CCIR with ccir=True), modified
+dip from IGRF, foE from the Edinburgh method and hmF2 from M(3000)F2
+(HMF2ED), to single precision; see the "ccir" engine of
+pyiri2016.validate. Dates the index files do not cover give nan.
+"""
+
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from pyiri2016 import magnetic
+from pyiri2016.firi import zenith
+from pyiri2016.iriweb import iritcon
+from pyiri2016.times import as_datetime64, by_day, decompose
+
+DataFolder = Path(__file__).parent / "data"
+
+# Fields of 'maps' and 'evaluate'
+FIELDS = ("foF2", "NmF2", "M3000F2", "hmF2", "foE")
+
+# Highest degree in the modified dip for every longitude harmonic (0, 1,
+# ...) and number of UT harmonics, of the foF2 and M(3000)F2 maps (FOUT and
+# XMOUT in irifun.for)
+QF, FOF2_HARMONICS = (11, 11, 8, 4, 1, 0, 0, 0, 0), 6
+QM, M3000_HARMONICS = (6, 7, 5, 2, 1, 0, 0), 4
+
+# Coefficients by month, read from the data files once (12 at most)
+_coefficients: dict[int, "Coefficients"] = {}
+
+
+class Coefficients(NamedTuple):
+    """
+    Map coefficients of a month for Rz12 (IG12 for foF2) of 0 and 100, with
+    shape (2, functions of G, functions of T): 'ccir' and 'ursi' for foF2,
+    'm3000' for M(3000)F2
+    """
+
+    ccir: np.ndarray
+    ursi: np.ndarray
+    m3000: np.ndarray
+
+
+def _read(path):
+    """Values of a coefficient file, written with FORMAT(1X,4E15.8)"""
+
+    values = []
+    with open(path) as f:
+        for line in f:
+            line = line.rstrip()
+            values.extend(float(line[i : i + 15]) for i in range(1, len(line), 15))
+    return np.array(values)
+
+
+def coefficients(month):
+    """Coefficients of 'month' (1-12), read from ccirNN.asc and ursiNN.asc"""
+
+    if month not in _coefficients:
+        nf, nm = 2 * FOF2_HARMONICS + 1, 2 * M3000_HARMONICS + 1
+        mf, mm = _size(QF), _size(QM)
+        values = _read(DataFolder / "ccir" / f"ccir{month + 10}.asc")
+        ccir = values[: nf * mf * 2].reshape((nf, mf, 2), order="F")
+        m3000 = values[nf * mf * 2 : nf * mf * 2 + nm * mm * 2].reshape((nm, mm, 2), order="F")
+        values = _read(DataFolder / "ursi" / f"ursi{month + 10}.asc")
+        ursi = values[: nf * mf * 2].reshape((nf, mf, 2), order="F")
+        _coefficients[month] = Coefficients(*(c.transpose(2, 1, 0) for c in (ccir, ursi, m3000)))
+    return _coefficients[month]
+
+
+def _size(q):
+
+    return 1 + q[0] + 2 * sum(n + 1 for n in q[1:])
+
+
+def geographic(modip, lat, lon, q):
+    """
+    Functions of modified dip, latitude and longitude (degrees) of the maps
+    with the degrees 'q' (QF or QM), shape (..., functions), as GAMMA1
+    """
+
+    modip, lat, lon = np.radians(np.broadcast_arrays(modip, lat, lon))
+    powers = np.sin(modip)[..., None] ** np.arange(q[0] + 2)
+    columns = [powers[..., : q[0] + 1]]
+    for k in range(1, len(q)):
+        scale = np.cos(lat) ** k
+        cos, sin = scale * np.cos(k * lon), scale * np.sin(k * lon)
+        harmonic = np.empty(lat.shape + (q[k] + 1, 2))
+        harmonic[..., 0] = powers[..., : q[k] + 1] * cos[..., None]
+        harmonic[..., 1] = powers[..., : q[k] + 1] * sin[..., None]
+        columns.append(harmonic.reshape(lat.shape + (-1,)))
+    return np.concatenate(columns, axis=-1)
+
+
+def harmonics(hour, n):
+    """Functions of the UT 'hour' of the maps with 'n' harmonics, (..., 2n + 1)"""
+
+    angle = np.radians(15.0 * np.asarray(hour, dtype=float) - 180.0)[..., None]
+    k = np.arange(1, n + 1)
+    columns = np.empty(angle.shape[:-1] + (n, 2))
+    columns[..., 0], columns[..., 1] = np.sin(k * angle), np.cos(k * angle)
+    return np.concatenate([np.ones_like(angle), columns.reshape(angle.shape[:-1] + (-1,))], -1)
+
+
+class Day(NamedTuple):
+    """
+    Coefficients of the foF2 and M(3000)F2 maps for a day, the Rz12 of
+    hmF2 ('rssn') and the F10.7 of foE ('cov') IRI_SUB takes for it; 'ok'
+    is False for days the index files do not cover
+    """
+
+    fof2: np.ndarray
+    m3000: np.ndarray
+    rssn: float
+    cov: float
+    ok: bool
+
+
+def day(year, month, dom, ccir=False):
+    """
+    Coefficients of day 'dom' of 'month' of 'year': those of the month and
+    of the previous (before the 15th, 14th in February) or following month
+    interpolated in solar activity, IG12 for foF2 and Rz12 for M(3000)F2,
+    then to the day
+    """
+
+    rz, ig, rsn, nmonth, cov = iritcon([year], [month * 100 + dom], str(DataFolder))
+    rz, ig, rsn, nmonth = rz[:, 0], ig[:, 0], float(rsn[0]), int(nmonth[0])
+    if nmonth < 0:
+        return Day(None, None, np.nan, np.nan, False)
+
+    this, other = coefficients(month), coefficients(nmonth)
+    weights = (rsn, 1.0 - rsn) if dom < (14 if month == 2 else 15) else (1.0 - rsn, rsn)
+
+    def interpolate(name, index):
+        result = 0.0
+        for c, r, w in zip((this, other), index[:2] / 100.0, weights, strict=True):
+            level = getattr(c, name)
+            result = result + w * (level[0] * (1.0 - r) + level[1] * r)
+        return result
+
+    fof2 = interpolate("ccir" if ccir else "ursi", ig)
+    return Day(fof2, interpolate("m3000", rz), float(rz[2]), float(cov[0]), True)
+
+
+def _magnetic(year, doy, lat, lon):
+    """Dip latitude and modified dip at 300 km for the decimal year of the day"""
+
+    days = 366 if year % 4 == 0 else 365
+    values = magnetic.exact(year + (doy - 1.0) / days, lat, lon)
+    return values["magbr"].astype(float), values["modip"].astype(float)
+
+
+def foe(cov, doy, hour, lat, lon):
+    """
+    foE (MHz) by the Edinburgh method (FOEEDI) at the UT 'hour' of day
+    'doy' for the solar activity 'cov' (F10.7)
+    """
+
+    lon = np.mod(lon, 360.0)
+    lt = hour + lon / 15.0
+    lt = np.where(lt > 24.0, lt - 24.0, lt)
+    xhi = zenith(doy, lt, lat, lon)
+    noon = np.minimum(zenith(doy, 12.0, lat, lon), 89.999)
+
+    a = 1.0 + 0.0094 * (cov - 66.0)
+    alat = np.abs(lat)
+    sl = np.cos(np.radians(alat))
+    low = alat < 32.0
+    sm = np.where(low, -1.93 + 1.92 * sl, 0.11 - 0.49 * sl)
+    c = np.where(low, 23.0 + 116.0 * sl, 92.0 + 35.0 * sl)
+    b = np.cos(np.radians(noon)) ** sm
+    sp = np.where(alat > 12.0, 1.2, 1.31)
+    xhic = xhi - 3.0 * np.log1p(np.exp((xhi - 89.98) / 3.0))
+    d = np.cos(np.radians(xhic)) ** sp
+    smin = (0.121 + 0.0015 * (cov - 60.0)) ** 2
+    return np.maximum(a * b * c * d, smin) ** 0.25
+
+
+def hmf2(magbr, rssn, ratio, m3000):
+    """hmF2 (km) from M(3000)F2 and foF2/foE 'ratio' (HMF2ED)"""
+
+    f1 = 0.00232 * rssn + 0.222
+    f2 = 1.2 - 0.0116 * np.exp(0.0239 * rssn)
+    f3 = 0.096 * (rssn - 25.0) / 150.0
+    f4 = 1.0 - rssn / 150.0 * np.exp(-magbr * magbr / 1600.0)
+    return 1490.0 / (m3000 + f1 * f4 / (np.maximum(ratio, 1.7) - f2) + f3) - 176.0
+
+
+def _peaks(fof2, m3000, magbr, coefs, doy, hour, lat, lon):
+
+    fe = foe(coefs.cov, doy, hour, lat, lon)
+    return {
+        "foF2": fof2,
+        "NmF2": 1.24e10 * fof2 * fof2,
+        "M3000F2": m3000,
+        "hmF2": hmf2(magbr, coefs.rssn, fof2 / fe, m3000),
+        "foE": fe,
+    }
+
+
+def maps(times, lat, lon, ccir=False):
+    """
+    F2 peak maps over the grid of latitudes 'lat' and longitudes 'lon'
+    (1-d, degrees) at the UT 'times' (datetime64, 1-d): a dict of arrays
+    (times, lat, lon) keyed by FIELDS (foF2, foE in MHz, NmF2 in m-3, hmF2
+    in km); URSI foF2 unless 'ccir'
+    """
+
+    times = np.atleast_1d(as_datetime64(times))
+    glat, glon = np.meshgrid(
+        np.asarray(lat, dtype=float), np.asarray(lon, dtype=float), indexing="ij"
+    )
+    year, mmdd, doy, hour = decompose(times)
+    result = {name: np.full((times.size,) + glat.shape, np.nan) for name in FIELDS}
+
+    order, starts = by_day(times)
+    for index in np.split(order, starts[1:]):
+        first = index[0]
+        coefs = day(year[first], mmdd[first] // 100, mmdd[first] % 100, ccir)
+        if not coefs.ok:
+            continue
+        magbr, modip = _magnetic(year[first], doy[first], glat, glon)
+
+        # (lat, lon, UT functions) @ (UT functions, times)
+        g = geographic(modip, glat, glon, QF) @ coefs.fof2
+        fof2 = np.moveaxis(g @ harmonics(hour[index], FOF2_HARMONICS).T, -1, 0)
+        g = geographic(modip, glat, glon, QM) @ coefs.m3000
+        m3000 = np.moveaxis(g @ harmonics(hour[index], M3000_HARMONICS).T, -1, 0)
+
+        peaks = _peaks(fof2, m3000, magbr, coefs, doy[first], hour[index, None, None], glat, glon)
+        for name, value in peaks.items():
+            result[name][index] = value
+    return result
+
+
+def evaluate(times, lat, lon, ccir=False):
+    """
+    F2 peak parameters at the UT 'times' (datetime64), latitudes 'lat' and
+    longitudes 'lon' (degrees), which broadcast against each other; a dict
+    of arrays keyed by FIELDS, as 'maps'
+    """
+
+    times, lat, lon = np.broadcast_arrays(as_datetime64(times), lat, lon)
+    shape = times.shape
+    lat, lon = np.ravel(lat).astype(float), np.ravel(lon).astype(float)
+    year, mmdd, doy, hour = decompose(times.ravel())
+    result = {name: np.full(lat.size, np.nan) for name in FIELDS}
+
+    order, starts = by_day(times)
+    for index in np.split(order, starts[1:]):
+        first = index[0]
+        coefs = day(year[first], mmdd[first] // 100, mmdd[first] % 100, ccir)
+        if not coefs.ok:
+            continue
+        glat, glon = lat[index], lon[index]
+        magbr, modip = _magnetic(year[first], doy[first], glat, glon)
+
+        # one row of G @ A @ T per point
+        g = geographic(modip, glat, glon, QF) @ coefs.fof2
+        fof2 = np.einsum("nk,nk->n", g, harmonics(hour[index], FOF2_HARMONICS))
+        g = geographic(modip, glat, glon, QM) @ coefs.m3000
+        m3000 = np.einsum("nk,nk->n", g, harmonics(hour[index], M3000_HARMONICS))
+
+        peaks = _peaks(fof2, m3000, magbr, coefs, doy[first], hour[index], glat, glon)
+        for name, value in peaks.items():
+            result[name][index] = value
+    return {name: value.reshape(shape) for name, value in result.items()}
@@ -0,0 +1,65 @@
+"""
+Native-side counters kept by the Fortran layer in COMMON /iricnt/.
+
+They record how often data files are opened, coefficient sets are reloaded
+and the expensive sub-models are entered, so cache effectiveness and batch
+ordering can be checked from Python:
+
+    >>> from pyiri2016 import IRI2016, counters
+    >>> counters.reset()
+    >>> IRI2016().IRI()
+    >>> counters.get()["ccir_open"]
+"""
+
+from contextlib import contextmanager
+
+from pyiri2016.iriweb import iristat, iristatr
+
+# Slot order of COMMON /iricnt/ (see 'iristat' in source/iriwebg.for)
+COUNTERS = (
+    "iri_sub",  # IRI_SUB calls (one per profile or point)
+    "ccir_open",  # ccirNN.asc opens
+    "ursi_open",  # ursiNN.asc opens
+    "mcsat_open",  # mcsatNN.dat opens (hmF2 coefficient reloads)
+    "mcsat_lookup",  # READ_DATA_SD calls, cached or not
+    "igrf_open",  # IGRF coefficient file opens (GETSHC)
+    "igrf_reload",  # FELDCOF reloads (IGRF coefficients for a new decimal year)
+    "ig_rz_open",  # ig_rz.dat opens (READ_IG_RZ)
+    "apf107_open",  # apf107.dat opens (READAPF107)
+    "igrf_dip",  # IGRF_DIP calls
+    "igrf_sub",  # IGRF_SUB calls
+    "gtd7",  # MSIS (GTD7) calls
+    "iri_tec",  # IRI_TEC calls
+    "chemion",  # CHEMION calls
+    "gtd7_hit",  # MSIS evaluations served from the native cache (GTD7C)
+    "maggrid",  # magnetic coordinates interpolated in the lookup grid (MAGGIN)
+)
+
+
+def get():
+    """Return the current counter values as a dict keyed by name"""
+
+    values = iristat()
+    return {name: int(values[i]) for i, name in enumerate(COUNTERS)}
+
+
+def reset():
+    """Set all native counters back to zero"""
+
+    iristatr()
+
+
+@contextmanager
+def track():
+    """
+    Context manager yielding a dict that is filled with the counter
+    increments accrued inside the block
+    """
+
+    before = get()
+    delta = {}
+    try:
+        yield delta
+    finally:
+        after = get()
+        delta.update({name: after[name] - before[name] for name in COUNTERS})
@@ -0,0 +1,160 @@
+"""
+Ensembles of IRI2016 profiles that differ only in their drivers (F10.7,
+Rz12, IG12, foF2, hmF2, ... given through the additional inputs of
+'iriwebg'), at one location and time.
+
+    >>> from pyiri2016 import ensemble
+    >>> rng = numpy.random.default_rng(0)
+    >>> addinp = ensemble.members(F107=rng.normal(150.0, 15.0, 200), IG12=100.0)
+    >>> result = ensemble.run(addinp, 2003, 11, 21, 13.5, lat=-11.95, lon=-76.87)
+    >>> result["ne"].shape, result["stats"]["ne"]["p95"].shape
+    ((200, 52), (52,))
+
+All members are evaluated in one call to the native driver 'iriwebge': the
+index files are set up once, and the CCIR/URSI coefficient sets IRI_SUB
+keeps for the month are shared by all members (with Rz12 or IG12 inputs,
+only their interpolation in solar activity is repeated per member).
+"""
+
+import warnings
+
+import numpy as np
+
+from pyiri2016 import batch, nsteps, presets
+from pyiri2016.iriweb import iriwebge
+
+# Additional inputs of 'iriwebg' (0-based), -1 = model value. foF2 values of
+# 100 or more are taken as NmF2 (m-3), foF1 and foE likewise; hmF2 values
+# below 50 are taken as M(3000)F2
+ADDINP = {
+    "foF2": 0,
+    "hmF2": 1,
+    "Ne300": 2,
+    "Ne400": 3,
+    "Ne550": 4,
+    "foF1": 5,
+    "hmF1": 6,
+    "foE": 7,
+    "hmE": 8,
+    "Rz12": 9,
+    "F107": 10,
+    "IG12": 11,
+}
+
+PERCENTILES = (5, 50, 95)
+
+
+def members(n=None, **drivers):
+    """
+    Return the (n, 12) 'addinp' array of an ensemble from driver arrays
+    named as in 'ADDINP'; drivers broadcast against each other (and 'n'
+    members, if given) and the other inputs are left to the model
+    """
+
+    unknown = set(drivers) - set(ADDINP)
+    if unknown:
+        raise KeyError(f"Unknown driver(s): {', '.join(sorted(unknown))}")
+
+    arrays = [np.atleast_1d(value) for value in drivers.values()]
+    if n is not None:
+        arrays.append(np.zeros(n))
+    arrays = np.broadcast_arrays(*arrays) if arrays else [np.zeros(1)]
+
+    addinp = -np.ones((len(arrays[0]), 12))
+    for name, value in zip(drivers, arrays[: len(drivers)], strict=True):
+        addinp[:, ADDINP[name]] = value
+    return addinp
+
+
+def statistics(values, percentiles=PERCENTILES):
+    """
+    Mean, standard deviation, minimum, maximum and the given percentiles
+    (keys 'p5', 'p50', ...) of 'values' over the members (first axis), and
+    the number 'n' of members they are taken from: values of -1 (the
+    model's mark of an invalid value) are left out, and statistics without
+    any valid value are nan
+    """
+
+    values = np.asarray(values, dtype=float)
+    values = np.where(values == -1.0, np.nan, values)
+    with warnings.catch_warnings():
+        # All-nan slices
+        warnings.simplefilter("ignore", RuntimeWarning)
+        stats = {
+            "n": np.isfinite(values).sum(axis=0),
+            "mean": np.nanmean(values, axis=0),
+            "std": np.nanstd(values, axis=0),
+            "min": np.nanmin(values, axis=0),
+            "max": np.nanmax(values, axis=0),
+        }
+        quantiles = np.nanpercentile(values, percentiles, axis=0)
+    for q, value in zip(percentiles, quantiles, strict=True):
+        stats[f"p{q:g}"] = value
+    return stats
+
+
+def run(
+    addinp,
+    year,
+    month,
+    day,
+    hour,
+    lat=0.0,
+    lon=0.0,
+    altlim=(90.0, 600.0),
+    altstp=10.0,
+    fields=batch.FIELDS,
+    iut=1,
+    jmag=0,
+    jf=None,
+    htecmax=0.0,
+    preset=None,
+    percentiles=PERCENTILES,
+):
+    """
+    Evaluate a height profile for every member (row) of 'addinp' (see
+    'members') at one location and time, UT if iut=1, LT otherwise
+
+    A 'preset' (name or pyiri2016.presets.Preset) sets 'jf' and 'htecmax'.
+    Returns a dict with 'alt' (nalt,), the requested 'fields' stacked over
+    the members, height-dependent ones with shape (n, nalt) and peak
+    parameters with shape (n,), in the model's single precision, and
+    'stats' with the 'statistics' of every field.
+    """
+
+    addinp = np.atleast_2d(addinp)
+    if addinp.shape[1] != 12:
+        raise ValueError("addinp must have 12 columns, see ensemble.ADDINP")
+    if preset is not None:
+        preset = presets.get(preset)
+        jf, htecmax = preset.switches(), preset.htecmax
+    if jf is None:
+        jf = batch.default_switches()
+
+    nalt = nsteps(altlim[0], altlim[1], altstp)
+    if not 1 <= nalt <= batch.MAXALT:
+        raise ValueError(f"altlim and altstp must give between 1 and {batch.MAXALT} heights")
+
+    outa, outb = iriwebge(
+        jmag,
+        jf,
+        lat,
+        lon,
+        year,
+        int(month) * 100 + int(day),
+        iut,
+        hour,
+        altlim[0],
+        htecmax,
+        1,
+        altlim[0],
+        altstp,
+        nalt,
+        addinp.T,
+        str(batch.DataFolder),
+    )
+
+    result = {"alt": altlim[0] + altstp * np.arange(nalt)}
+    result.update(batch.to_fields(outa, outb[:, 0, :], fields))
+    result["stats"] = {name: statistics(result[name], percentiles) for name in fields}
+    return result
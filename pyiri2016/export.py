@@ -0,0 +1,429 @@
+"""
+Chunked, compressed export of model results to HDF5, NetCDF or Parquet.
+
+A dataset is a set of variables sharing a leading record dimension (time,
+request, hour, ...) plus fixed coordinate dimensions (alt, lat, ...). Records
+are appended block by block, so results can be streamed from a generator
+and never need to be held in memory:
+
+    >>> from pyiri2016 import export
+    >>> from pyiri2016.stream import iter_profiles
+    >>> export.save_stream("ne.nc", iter_profiles("2003-01-01", "2003-02-01", 300))
+
+Grids computed by IRI2016_2DProf are saved with 'save_grid', and any dict of
+arrays with 'save'. The format follows the file suffix: .h5/.hdf5 (h5py),
+.nc (netCDF4) or .parquet (pyarrow; a directory of part files, one per
+writer session, with one row group per block).
+
+HDF5 and NetCDF files hold coordinate variables (dimension scales in HDF5)
+and units; datetime64 records are stored as seconds since 1970-01-01 UT.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import h5py
+except ModuleNotFoundError:
+    h5py = None
+
+try:
+    import netCDF4
+except ModuleNotFoundError:
+    netCDF4 = None  # type: ignore[assignment]
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ModuleNotFoundError:
+    pyarrow = None
+
+EPOCH = "seconds since 1970-01-01 00:00:00"
+
+UNITS = {
+    "time": EPOCH,
+    "hour": "h",
+    "alt": "km",
+    "lat": "degrees_north",
+    "lon": "degrees_east",
+    "glat": "degrees_north",
+    "glon": "degrees_east",
+    "ne": "m-3",
+    "Ne": "m-3",
+    "NeFIRI": "m-3",
+    "NmF2": "m-3",
+    "NmF1": "m-3",
+    "NmE": "m-3",
+    "te": "K",
+    "ti": "K",
+    "tn": "K",
+    "Te": "K",
+    "Ti": "K",
+    "hmF2": "km",
+    "hmF1": "km",
+    "hmE": "km",
+    "B0": "km",
+    "dip": "degrees",
+    "modip": "degrees",
+    "TEC": "TECU",
+    "foF2": "MHz",
+}
+
+# Names taken as coordinates when inferring the layout of streamed blocks
+COORDS = ("alt", "lat", "lon", "hour", "line")
+
+
+def _require(module, name, extra):
+
+    if module is None:
+        raise ImportError(
+            f"{name} is required for {extra} export. Install it with: pip install {name}"
+        )
+
+
+def _record_values(values, name):
+    """Record coordinate values and units as stored: datetime64 -> int64 seconds"""
+
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype("datetime64[s]").astype(np.int64), EPOCH
+    return values, UNITS.get(name)
+
+
+class HDF5Writer:
+    """Append records to datasets of an HDF5 file, resizable along the record axis"""
+
+    def __init__(self, path, dims, coords, record, mode="w", compression=4, chunk=1024, attrs=None):
+
+        _require(h5py, "h5py", "HDF5")
+        self.f = h5py.File(path, "a" if mode == "a" else "w")
+        self.dims, self.record, self.chunk = dims, record, chunk
+        self.compression = compression
+
+        for name, values in coords.items():
+            if name not in self.f:
+                ds = self.f.create_dataset(name, data=np.asarray(values))
+                ds.make_scale(name)
+                if name in UNITS:
+                    ds.attrs["units"] = UNITS[name]
+        self.f.attrs.update(attrs or {})
+
+    def _create(self, name, value):
+
+        vdims = self.dims[name]
+        shape = value.shape[1:]
+        ds = self.f.create_dataset(
+            name,
+            shape=(0,) + shape,
+            maxshape=(None,) + shape,
+            dtype=value.dtype,
+            chunks=(self.chunk,) + shape,
+            compression="gzip",
+            compression_opts=self.compression,
+            shuffle=True,
+        )
+        for axis, dim in enumerate(vdims):
+            if dim in self.f and dim != name:
+                ds.dims[axis].attach_scale(self.f[dim])
+        if name in UNITS:
+            ds.attrs["units"] = UNITS[name]
+        return ds
+
+    def write(self, block):
+
+        values, units = _record_values(block[self.record], self.record)
+        if self.record not in self.f:
+            self.dims.setdefault(self.record, (self.record,))
+            self._create(self.record, values).make_scale(self.record)
+            if units:
+                self.f[self.record].attrs["units"] = units
+
+        start = self.f[self.record].shape[0]
+        stop = start + len(values)
+        for name in (self.record,) + tuple(n for n in self.dims if n != self.record):
+            value = values if name == self.record else np.asarray(block[name])
+            ds = self.f[name] if name in self.f else self._create(name, value)
+            ds.resize(stop, axis=0)
+            ds[start:stop] = value
+
+    def close(self):
+
+        self.f.close()
+
+
+class NetCDFWriter:
+    """Append records along the unlimited record dimension of a NetCDF-4 file"""
+
+    def __init__(self, path, dims, coords, record, mode="w", compression=4, chunk=1024, attrs=None):
+
+        _require(netCDF4, "netCDF4", "NetCDF")
+        self.f = netCDF4.Dataset(path, "a" if mode == "a" and Path(path).exists() else "w")
+        self.dims, self.record, self.chunk = dims, record, chunk
+        self.compression = compression
+
+        if record not in self.f.dimensions:
+            self.f.createDimension(record, None)
+        for name, values in coords.items():
+            if name not in self.f.dimensions:
+                values = np.asarray(values)
+                self.f.createDimension(name, values.size)
+                var = self.f.createVariable(name, values.dtype, (name,))
+                var[:] = values
+                if name in UNITS:
+                    var.units = UNITS[name]
+        self.f.setncatts(attrs or {})
+
+    def _create(self, name, value, dims):
+
+        var = self.f.createVariable(
+            name,
+            value.dtype,
+            dims,
+            zlib=True,
+            complevel=self.compression,
+            shuffle=True,
+            chunksizes=(self.chunk,) + value.shape[1:],
+        )
+        if name in UNITS:
+            var.units = UNITS[name]
+        return var
+
+    def write(self, block):
+
+        values, units = _record_values(block[self.record], self.record)
+        if self.record not in self.f.variables:
+            var = self._create(self.record, values, (self.record,))
+            if units:
+                var.units = units
+
+        start = len(self.f.dimensions[self.record])
+        stop = start + len(values)
+        self.f.variables[self.record][start:stop] = values
+        for name, vdims in self.dims.items():
+            if name == self.record:
+                continue
+            value = np.asarray(block[name])
+            if name not in self.f.variables:
+                self._create(name, value, vdims)
+            self.f.variables[name][start:stop] = value
+
+    def close(self):
+
+        self.f.close()
+
+
+class ParquetWriter:
+    """
+    Write records as rows of a Parquet part file in the directory 'path';
+    variables with extra dimensions become fixed-size list columns
+    """
+
+    def __init__(self, path, dims, coords, record, mode="w", compression=4, chunk=1024, attrs=None):
+
+        _require(pyarrow, "pyarrow", "Parquet")
+        self.dir = Path(path)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        parts = sorted(self.dir.glob("part-*.parquet"))
+        if mode != "a":
+            for part in parts:
+                part.unlink()
+            parts = []
+        self.path = self.dir / f"part-{len(parts):05d}.parquet"
+
+        self.dims, self.record, self.compression = dims, record, compression
+        self.metadata = {
+            "dims": json.dumps({name: list(vdims) for name, vdims in dims.items()}),
+            "coords": json.dumps({name: np.asarray(v).tolist() for name, v in coords.items()}),
+            "units": json.dumps({n: UNITS[n] for n in list(dims) + list(coords) if n in UNITS}),
+            "attrs": json.dumps(attrs or {}, default=str),
+        }
+        self.writer = None
+
+    def write(self, block):
+
+        columns = {self.record: pyarrow.array(np.asarray(block[self.record]))}
+        for name in self.dims:
+            if name == self.record:
+                continue
+            value = np.asarray(block[name])
+            if value.ndim == 1:
+                columns[name] = pyarrow.array(value)
+            else:
+                flat = value.reshape(len(value), -1)
+                columns[name] = pyarrow.FixedSizeListArray.from_arrays(
+                    pyarrow.array(flat.ravel()), flat.shape[1]
+                )
+        table = pyarrow.table(columns)
+
+        if self.writer is None:
+            schema = table.schema.with_metadata(self.metadata)
+            self.writer = pyarrow.parquet.ParquetWriter(
+                self.path, schema, compression="zstd", compression_level=self.compression
+            )
+        self.writer.write_table(table.replace_schema_metadata(self.writer.schema.metadata))
+
+    def close(self):
+
+        if self.writer is not None:
+            self.writer.close()
+
+
+WRITERS = {".h5": HDF5Writer, ".hdf5": HDF5Writer, ".nc": NetCDFWriter, ".parquet": ParquetWriter}
+
+
+def writer(path, dims, coords=None, record="time", mode="w", compression=4, chunk=1024, attrs=None):
+    """
+    Open a writer for 'path', its format given by the suffix
+
+    'dims' maps every variable to its dimension names, the first being the
+    record dimension 'record'; 'coords' maps the other dimensions to their
+    coordinate values. mode="a" appends records to an existing file. The
+    writer's 'write(block)' appends a dict of arrays holding the record
+    coordinate and every variable; call 'close()' when done.
+    """
+
+    suffix = Path(path).suffix.lower()
+    if suffix not in WRITERS:
+        raise ValueError(f"Unknown export format: {suffix} (use {', '.join(WRITERS)})")
+    for name, vdims in dims.items():
+        if vdims[0] != record:
+            raise ValueError(f"{name}: first dimension must be the record dimension '{record}'")
+
+    return WRITERS[suffix](
+        path,
+        dict(dims),
+        dict(coords or {}),
+        record,
+        mode=mode,
+        compression=compression,
+        chunk=chunk,
+        attrs=attrs,
+    )
+
+
+def save(path, data, dims, coords=None, record="time", mode="w", attrs=None, **kwargs):
+    """Write the dict of arrays 'data' (see 'writer') in one block"""
+
+    w = writer(path, dims, coords, record, mode=mode, attrs=attrs, **kwargs)
+    try:
+        w.write(data)
+    finally:
+        w.close()
+
+
+def _layout(block, record):
+    """Infer variable dimensions and coordinates from the first streamed block"""
+
+    nrec = len(block[record])
+    coords = {
+        name: np.asarray(v)
+        for name, v in block.items()
+        if name != record and name in COORDS and np.ndim(v) == 1
+    }
+    dims = {}
+    for name, value in block.items():
+        if name == record or name in coords:
+            continue
+        shape = np.shape(value)
+        if not shape or shape[0] != nrec:
+            raise ValueError(f"{name}: leading dimension must match '{record}'")
+        vdims = [record]
+        for size in shape[1:]:
+            match = [c for c, v in coords.items() if v.size == size and c not in vdims]
+            if not match:
+                raise ValueError(f"{name}: no coordinate of length {size}")
+            vdims.append(match[0])
+        dims[name] = tuple(vdims)
+    return dims, coords
+
+
+def save_stream(path, blocks, record="time", mode="w", attrs=None, **kwargs):
+    """
+    Write every block of the iterable 'blocks' (dicts of arrays such as the
+    ones yielded by pyiri2016.stream.iter_profiles) as it arrives
+
+    The layout is taken from the first block: 1-D arrays named like a
+    coordinate ('alt', 'lat', ...) are coordinates, the other arrays are
+    variables with the leading dimension 'record'. Returns the number of
+    records written.
+    """
+
+    w, count = None, 0
+    try:
+        for block in blocks:
+            if w is None:
+                dims, coords = _layout(block, record)
+                w = writer(path, dims, coords, record, mode=mode, attrs=attrs, **kwargs)
+            w.write(block)
+            count += len(block[record])
+    finally:
+        if w is not None:
+            w.close()
+    return count
+
+
+def grid_dataset(grid):
+    """
+    Variables, dimensions and coordinates of the latest results of an
+    IRI2016_2DProf instance: 'HeightVsTime' (record 'hour'), 'LatVsLon' or
+    'AdaptiveLatVsLon' (record 'lon') or 'LatVsFL' (record 'point', one
+    column per field line)
+
+    Returns the keyword arguments of 'save'.
+    """
+
+    if hasattr(grid, "data2D") and "alt" in grid.data2D:
+        d = grid.data2D
+        data = {"hour": np.asarray(d["hour"]), "Ne": d["Ne"], "Te": d["Te"], "Ti": d["Ti"]}
+        if hasattr(grid, "FIRI2D"):
+            data["NeFIRI"] = grid.FIRI2D["Ne"]
+        dims = {name: ("hour", "alt") for name in data if name != "hour"}
+        attrs = {"title1": d["title1"], "title2": d["title2"]}
+        return {
+            "data": data,
+            "dims": dims,
+            "coords": {"alt": d["alt"]},
+            "record": "hour",
+            "attrs": attrs,
+        }
+
+    if hasattr(grid, "data2D") and "lat" in grid.data2D:
+        d = grid.data2D
+        names = [n for n in ("NmF2", "hmF2", "B0", "dip", "TEC", "error") if n in d]
+        data = {"lon": np.asarray(d["lon"])}
+        data.update({name: d[name] for name in names})
+        return {
+            "data": data,
+            "dims": {name: ("lon", "lat") for name in names},
+            "coords": {"lat": np.asarray(d["lat"])},
+            "record": "lon",
+            "attrs": {"title": d["title"]},
+        }
+
+    if hasattr(grid, "coordl"):
+        names = ["ne", "te", "ti", "tn", "nHe", "nO", "nN2", "nO2", "nAr", "nH", "nN", "babs"]
+        if hasattr(grid, "neFIRI"):
+            names.append("neFIRI")
+        npts, nfl = grid.ne.shape
+        data = {"point": np.arange(npts)}
+        data.update({name: getattr(grid, name) for name in names})
+        data["glon"] = grid.coordl[:, 0, :].T
+        data["alt"] = grid.coordl[:, 1, :].T
+        data["glat"] = grid.coordl[:, 2, :].T
+        return {
+            "data": data,
+            "dims": {name: ("point", "line") for name in data if name != "point"},
+            "coords": {"line": np.arange(nfl)},
+            "record": "point",
+            "attrs": {"date": list(grid.date), "time": list(grid.time)},
+        }
+
+    raise ValueError("no HeightVsTime, LatVsLon or LatVsFL results to export")
+
+
+def save_grid(path, grid, mode="w", **kwargs):
+    """Write the latest grid results of an IRI2016_2DProf instance (see 'grid_dataset')"""
+
+    save(path, mode=mode, **grid_dataset(grid), **kwargs)
@@ -0,0 +1,146 @@
+"""
+Apex field-line geometry of 'LatVsFL', cached in memory and on disk.
+
+Tracing the field lines (pyapex.ApexFL().getFL, one call per equatorial
+apex height) takes most of a LatVsFL run, yet the lines depend only on the
+date (slowly), the location, the apex heights and the range and step of
+magnetic latitude. 'lines' returns them from a cache keyed on these:
+
+    >>> fl = fieldlines.lines(2003.89, -77.76, -11.95, heights, (-10, 10), 0.1)
+    >>> fl.coordl.shape                # (heights, 3: lon, alt, lat, points)
+
+The date is rounded to 'date_step' years (DATE_STEP, about 4 days; 0 for
+the exact date) and the lines are traced at the rounded date, so cached
+and freshly traced lines are the same. On a miss all heights are traced,
+in 'workers' processes. The MAXLINES most recently used sets of lines are
+kept in memory and, with a 'cache_dir', all of them in .npz files there.
+"""
+
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+try:
+    import pyapex
+except ModuleNotFoundError:
+    pyapex = None
+
+# Rounding of the date in the cache key, years
+DATE_STEP = 0.01
+
+# Sets of lines kept in memory, the least recently used dropped first
+MAXLINES = 32
+
+_lines: OrderedDict[tuple, "Lines"] = OrderedDict()
+
+
+class Lines(NamedTuple):
+    """
+    Field lines, with shape (heights, 3, points): 'coordl' in geographic
+    (lon, alt, lat) and 'qdcoordl' in quasi-dipole (lon, alt, lat)
+    coordinates
+    """
+
+    coordl: np.ndarray
+    qdcoordl: np.ndarray
+
+    def save(self, path):
+        """Write the lines to an .npz file"""
+
+        np.savez(path, coordl=self.coordl, qdcoordl=self.qdcoordl)
+
+    @classmethod
+    def load(cls, path):
+        """Read lines written by 'save'"""
+
+        with np.load(path) as data:
+            return cls(data["coordl"], data["qdcoordl"])
+
+
+def clear():
+    """Empty the in-memory cache"""
+
+    _lines.clear()
+
+
+def trace(date, dlon, dlat, hateq, mlatlim, mlatstp):
+    """
+    Trace the field line of apex height 'hateq' (km) over the station at
+    'dlon', 'dlat' for the decimal year 'date'; returns its geographic and
+    quasi-dipole (lon, alt, lat) coordinates, each (3, points)
+    """
+
+    if pyapex is None:
+        raise ImportError("pyapex is required for field lines. Install it with: pip install pyapex")
+
+    gc, qc = pyapex.ApexFL().getFL(
+        date=date, dlon=dlon, dlat=dlat, hateq=hateq, mlatRange=mlatlim, mlatSTP=mlatstp
+    )
+    return [gc["lon"], gc["alt"], gc["lat"]], [qc["lon"], gc["alt"], qc["lat"]]
+
+
+def key(date, dlon, dlat, heights, mlatlim, mlatstp, date_step=DATE_STEP):
+    """Cache key of the lines; its first item is the rounded date"""
+
+    if date_step:
+        date = round(date / date_step) * date_step
+    return (
+        round(float(date), 6),
+        round(float(dlon), 6),
+        round(float(dlat), 6),
+        tuple(round(float(h), 6) for h in np.atleast_1d(heights)),
+        tuple(round(float(m), 6) for m in mlatlim),
+        round(float(mlatstp), 6),
+    )
+
+
+def lines(
+    date,
+    dlon,
+    dlat,
+    heights,
+    mlatlim,
+    mlatstp,
+    workers=1,
+    cache_dir=None,
+    date_step=DATE_STEP,
+):
+    """
+    Field lines of the apex 'heights' (km) over the station at 'dlon',
+    'dlat' (degrees) for the decimal year 'date', at magnetic latitudes
+    'mlatlim' in steps of 'mlatstp' (degrees), from the cache or traced in
+    'workers' processes; with a 'cache_dir', lines are also read from and
+    written to .npz files there
+    """
+
+    k = key(date, dlon, dlat, heights, mlatlim, mlatstp, date_step)
+    if k not in _lines:
+        path = None
+        if cache_dir is not None:
+            digest = hashlib.sha1(repr(k).encode()).hexdigest()[:16]
+            path = Path(cache_dir).expanduser() / f"fieldlines-{digest}.npz"
+        if path is not None and path.exists():
+            result = Lines.load(path)
+        else:
+            func = partial(trace, k[0], k[1], k[2], mlatlim=k[4], mlatstp=k[5])
+            if workers > 1 and len(k[3]) > 1:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    traced = list(pool.map(func, k[3]))
+            else:
+                traced = [func(h) for h in k[3]]
+            result = Lines(*(np.array(c, dtype=float) for c in zip(*traced, strict=True)))
+            if path is not None:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                result.save(path)
+        _lines[k] = result
+        while len(_lines) > MAXLINES:
+            _lines.popitem(last=False)
+    _lines.move_to_end(k)
+
+    # copies, so the cached lines cannot be changed through the result
+    return Lines(*(c.copy() for c in _lines[k]))
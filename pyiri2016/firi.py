@@ -0,0 +1,267 @@
+"""
+FIRI D-region electron densities (Friedrich and Torkar, 2001) for arrays of
+points and times.
+
+The native 'firisubl' evaluates the FIRI table routine F00 for one UT per
+call. 'evaluate' hands points with their own UT days and times to the
+native point driver 'firisubp' in one call (in parallel with OpenMP), with
+the daily F10.7 of every day read once; 'f00' interpolates the tables of
+F00 (COMMON /FIRCOM/) with NumPy at given solar zenith angles and F10.7:
+
+    >>> from pyiri2016 import firi
+    >>> ne, ierr = firi.evaluate_times(times, lat, lon, alt)      # as firisubl
+    >>> ne, ierr = firi.f00(alt, lat, doy, zenith, f107)          # as F00
+
+'f00' reproduces F00 including its quirks (the latitude and month
+brackets it picks, 0 for densities where a table value is missing), to
+single precision, but is several times slower than the compiled loop; use
+it for inputs that do not come from a time and place. The error codes are
+those of F00: 0 no error, 1 model undefined (density 0), 2 input outside
+the tables (density extrapolated), 3 both.
+"""
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from pyiri2016.iriweb import firif107, firisubp, firitab
+from pyiri2016.times import decompose
+
+DataFolder = Path(__file__).parent / "data"
+
+# First day of every month in F00, day of year - 1
+MONTH_START = np.array([0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334])
+
+# Latitude step of the tables, degrees
+LATSTP = 15
+
+# Points interpolated at a time, bounding the memory of the 32 table
+# corners gathered per point
+CHUNK = 65536
+
+_tables = None
+
+# Daily F10.7 by year * 1000 + day of year, read from the index files once;
+# beyond F107_DAYS days the least recently used are dropped
+F107_DAYS = 36600
+_f107: OrderedDict[int, float] = OrderedDict()
+
+
+class Tables(NamedTuple):
+    """
+    FIRI tables: 'eden' holds log10 of the density (m-3) with shape (81, 5,
+    12, 12, 3) over the axes 'alt' (km), 'lat' (degrees, north; south is
+    taken six months later), 'month', 'zenith' (degrees) and 'logf107'
+    (log10 of F10.7)
+    """
+
+    eden: np.ndarray
+    alt: np.ndarray
+    lat: np.ndarray
+    month: np.ndarray
+    zenith: np.ndarray
+    logf107: np.ndarray
+
+
+def tables():
+    """Return the FIRI tables, read from the native module on first use"""
+
+    global _tables
+    if _tables is None:
+        eden, tabs = firitab()
+        _tables = Tables(eden, *np.split(tabs.astype(float), np.cumsum([81, 5, 12, 12])))
+    return _tables
+
+
+def _f00(alt, lat, doy, zenith, logf107, t, table):
+    """'f00' for 1-d arrays; 'table' is t.eden flattened in Fortran order"""
+
+    nalt, nlat = t.alt.size, t.lat.size
+    alat = np.abs(lat)
+
+    # Height: 1 km steps from 60 km, end values outside
+    i = np.clip(np.trunc(alt).astype(int) - 59, 1, nalt - 1) - 1
+    wi = np.where(alt < t.alt[0], 0.0, np.where(alt > t.alt[-1], 1.0, alt - t.alt[i]))
+
+    # Latitude: bracket as F00 picks it, its upper end above 60 degrees
+    j = np.clip(np.trunc(alat).astype(int) // LATSTP, 1, nlat - 1) - 1
+    wj = np.where(alat > t.lat[-1], 1.0, (alat - t.lat[j]) / LATSTP)
+
+    # Month: the one containing the day, the previous one before its
+    # 16th day (with a negative weight, as in F00); south six months later
+    mon = np.searchsorted(MONTH_START, doy, side="right")
+    wk = (doy - MONTH_START[np.maximum(mon, 1) - 1] - 15) / 30.0
+    mon = np.where(wk < 0.0, mon - 1, mon)
+    k1 = np.where((mon >= 1) & (mon <= 11), mon, 12)
+    k1, k2 = k1 - 1, k1 % 12
+    south = lat < 0.0
+    k1 = np.where(south, (k1 + 6) % 12, k1)
+    k2 = np.where(south, (k2 + 6) % 12, k2)
+
+    # Zenith angle: linear, extrapolated beyond the table
+    nzen = t.zenith.size
+    l1 = np.clip(np.searchsorted(t.zenith, zenith, side="right"), 1, nzen - 1) - 1
+    wl = (zenith - t.zenith[l1]) / (t.zenith[l1 + 1] - t.zenith[l1])
+
+    # Solar activity: clipped to the table
+    f = np.clip(logf107, t.logf107[0], t.logf107[-1])
+    m1 = np.where(f < t.logf107[1], 0, 1)
+    wm = (f - t.logf107[m1]) / (t.logf107[m1 + 1] - t.logf107[m1])
+
+    # Corners (2, 2, 2, 2, 2, n) over height, latitude, month, zenith angle
+    # and solar activity, gathered from the table in Fortran order
+    strides = np.cumprod((1,) + t.eden.shape[:-1])
+    corner = np.indices((2, 2, 2, 2, 2))
+    offsets = sum(corner[axis] * strides[axis] for axis in (0, 1, 3, 4)).astype(np.int32)
+    index = i + strides[1] * j + strides[2] * k1 + strides[3] * l1 + strides[4] * m1
+    index = np.add(index.astype(np.int32), offsets[..., None])
+    index[:, :, 1] += (strides[2] * (k2 - k1)).astype(np.int32)
+    corners = table[index]
+    missing = (corners == 0.0).reshape(32, -1).any(axis=0)
+
+    # Linear in one axis after the other, in place
+    for w in (wi, wj, wk, wl, wm):
+        step = np.subtract(corners[1], corners[0])
+        step *= w
+        step += corners[0]
+        corners = step
+    return np.where(missing, 0.0, 10.0**corners), missing
+
+
+def f00(alt, lat, doy, zenith, f107):
+    """
+    FIRI electron density (m-3) and F00 error code at heights 'alt' (km),
+    latitudes 'lat', days of year 'doy', solar zenith angles 'zenith'
+    (degrees) and F10.7 'f107', which broadcast against each other
+    """
+
+    t = tables()
+    alt, lat, doy, zenith, f107 = np.broadcast_arrays(alt, lat, doy, zenith, f107)
+    shape = alt.shape
+    alt, lat, zenith, f107 = (np.ravel(x).astype(float) for x in (alt, lat, zenith, f107))
+    doy = np.ravel(doy).astype(int)
+
+    logf107 = np.log10(np.clip(f107, 1.0, 1000.0))
+    outside = (
+        (alt < t.alt[0])
+        | (alt > t.alt[-1])
+        | (np.abs(lat) > t.lat[-1])
+        | (doy < 1)
+        | (doy > 366)
+        | (zenith < t.zenith[0])
+        | (zenith > t.zenith[-1])
+        | (logf107 < t.logf107[0])
+        | (logf107 > t.logf107[-1])
+    )
+
+    table = t.eden.ravel(order="F").astype(float)
+    edens = np.empty(alt.size)
+    missing = np.empty(alt.size, dtype=bool)
+    for s in range(0, alt.size, CHUNK):
+        part = slice(s, s + CHUNK)
+        edens[part], missing[part] = _f00(
+            alt[part], lat[part], np.maximum(doy[part], 0), zenith[part], logf107[part], t, table
+        )
+    ierr = 2 * outside + missing
+    return edens.reshape(shape), ierr.reshape(shape)
+
+
+def local_time(year, doy, hour, lon):
+    """
+    Local time (hours) and its year and day of year at longitudes 'lon' for
+    the UT 'hour' of day 'doy' of 'year', as UT_LT in irifun.for
+    """
+
+    year, doy, hour, lon = np.broadcast_arrays(year, doy, hour, lon)
+    lon = np.where(lon > 180.0, lon - 360.0, lon)
+    lt = hour + lon / 15.0
+
+    after, before = lt > 24.0, lt < 0.0
+    lt = np.where(after, lt - 24.0, np.where(before, lt + 24.0, lt))
+    doy = doy + after - before
+
+    leap = year % 4 == 0
+    days = np.where(leap, 366, 365)
+    next_year = doy > days
+    last_year = doy < 1
+    year = year + next_year - last_year
+    doy = np.where(next_year, 1, doy)
+    doy = np.where(last_year, np.where(year % 4 == 0, 366, 365), doy)
+    return year, doy, lt
+
+
+def zenith(doy, lt, lat, lon):
+    """
+    Solar zenith angle (degrees) on local day 'doy' at local time 'lt'
+    (hours), latitude 'lat' and longitude 'lon', as SOCO in irifun.for
+    """
+
+    p1, p2, p3, p4, p6 = 0.017203534, 0.034407068, 0.051610602, 0.068814136, 0.103221204
+
+    te = doy + (lt + (360.0 - np.asarray(lon)) / 15.0) / 24.0 + 0.9369
+    declination = np.radians(
+        23.256 * np.sin(p1 * (te - 82.242))
+        + 0.381 * np.sin(p2 * (te - 44.855))
+        + 0.167 * np.sin(p3 * (te - 23.355))
+        - 0.013 * np.sin(p4 * (te + 11.97))
+        + 0.011 * np.sin(p6 * (te - 10.41))
+        + 0.339137
+    )
+    tf = te - 0.5
+    equation = (
+        -7.38 * np.sin(p1 * (tf - 4.0))
+        - 9.87 * np.sin(p2 * (tf + 9.0))
+        + 0.27 * np.sin(p3 * (tf - 53.0))
+        - 0.2 * np.cos(p4 * (tf - 17.0))
+    )
+    phi = np.pi / 12.0 * (lt - 12.0) + np.radians(equation) / 4.0
+
+    fa = np.radians(lat)
+    cosx = np.sin(fa) * np.sin(declination) + np.cos(fa) * np.cos(declination) * np.cos(phi)
+    return np.degrees(np.arccos(np.clip(cosx, -1.0, 1.0)))
+
+
+def daily_f107(year, doy):
+    """
+    Daily F10.7 FIRI takes for UT days (from the 12-month running mean
+    sunspot number of ig_rz.dat), -1 for days the file does not cover
+    """
+
+    year, doy = np.broadcast_arrays(year, doy)
+    days, inverse = np.unique(np.ravel(year) * 1000 + np.ravel(doy), return_inverse=True)
+    new = np.array([day for day in days.tolist() if day not in _f107], dtype=int)
+    if new.size:
+        values = firif107(new // 1000, new % 1000, str(DataFolder))
+        _f107.update(zip(new.tolist(), values.astype(float).tolist(), strict=True))
+    for day in days.tolist():
+        _f107.move_to_end(day)
+    values = np.array([_f107[day] for day in days.tolist()])
+    while len(_f107) > F107_DAYS:
+        _f107.popitem(last=False)
+    return values[inverse].reshape(year.shape)
+
+
+def evaluate(year, doy, hour, lat, lon, alt, f107=None):
+    """
+    FIRI electron density (m-3) and error code at latitudes 'lat', longitudes
+    'lon' and heights 'alt' (km) for the UT 'hour' of day 'doy' of 'year',
+    as 'firisubl' computes them, in one native call; inputs broadcast
+    against each other. The daily F10.7 is taken from the index files
+    unless given
+    """
+
+    if f107 is None:
+        # per day, before the days are broadcast to all points
+        f107 = daily_f107(year, doy)
+    inputs = np.broadcast_arrays(year, doy, hour, lat, lon, alt, f107)
+    edens, ierr = firisubp(*(np.ravel(x) for x in inputs))
+    return edens.reshape(inputs[0].shape), ierr.reshape(inputs[0].shape)
+
+
+def evaluate_times(times, lat, lon, alt, f107=None):
+    """Like 'evaluate', for datetime64 UT 'times'"""
+
+    year, _, doy, hour = decompose(times)
+    return evaluate(year, doy, hour, lat, lon, alt, f107)
@@ -0,0 +1,76 @@
+"""
+Bilinear interpolation of latitude x longitude map fields.
+
+A MapInterpolator is built once per map and evaluates all of its fields at
+any batch of query points in one vectorized call. It holds only NumPy
+arrays, so it pickles cheaply to worker processes:
+
+    >>> from pyiri2016.interpolate import MapInterpolator
+    >>> f = MapInterpolator(lat, lon, foF2=foF2, hmF2=hmF2)
+    >>> f(rx_lat, rx_lon)["foF2"]
+
+Outside the grid the nearest edge value is returned, as 'interp2d' did.
+"""
+
+import numpy as np
+
+
+def _axis(x, xp):
+    """Lower node index and weight of each of 'x' on the increasing axis 'xp'"""
+
+    x = np.clip(x, xp[0], xp[-1])
+    i = np.clip(np.searchsorted(xp, x, side="right") - 1, 0, xp.size - 2)
+    return i, (x - xp[i]) / (xp[i + 1] - xp[i])
+
+
+class MapInterpolator:
+    """
+    Interpolator of fields given on the grid 'lat' x 'lon'
+
+    Every field is passed as a keyword argument with shape (nlat, nlon).
+    The axes may be increasing or decreasing.
+    """
+
+    def __init__(self, lat, lon, **fields):
+
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        if lat.size < 2 or lon.size < 2:
+            raise ValueError("the grid needs at least two latitudes and two longitudes")
+
+        values = np.stack([np.asarray(v, dtype=float) for v in fields.values()])
+        if values.shape[1:] != (lat.size, lon.size):
+            raise ValueError(f"fields must have shape ({lat.size}, {lon.size})")
+
+        if lat[0] > lat[-1]:
+            lat, values = lat[::-1], values[:, ::-1]
+        if lon[0] > lon[-1]:
+            lon, values = lon[::-1], values[:, :, ::-1]
+
+        self.lat, self.lon = lat, lon
+        self.names = tuple(fields)
+        self.values = np.ascontiguousarray(values)
+
+    def __call__(self, lat, lon):
+        """
+        Interpolate every field at the points (lat, lon), which broadcast
+        against each other; returns a dict of arrays of their shape
+        """
+
+        lat, lon = np.broadcast_arrays(np.asarray(lat, dtype=float), np.asarray(lon, dtype=float))
+        i, u = _axis(lat, self.lat)
+        j, v = _axis(lon, self.lon)
+
+        f = self.values
+        out = (
+            f[:, i, j] * (1 - u) * (1 - v)
+            + f[:, i, j + 1] * (1 - u) * v
+            + f[:, i + 1, j] * u * (1 - v)
+            + f[:, i + 1, j + 1] * u * v
+        )
+        return dict(zip(self.names, out, strict=True))
+
+    def grid(self, lat, lon):
+        """Interpolate every field on the grid 'lat' x 'lon' (shape (nlat, nlon))"""
+
+        return self(np.asarray(lat, dtype=float)[:, None], np.asarray(lon, dtype=float)[None, :])
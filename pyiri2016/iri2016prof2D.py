@@ -1,33 +1,27 @@
 import uuid
+from functools import partial
 from pathlib import Path
 from numpy import (
     arange,
     array,
     ceil,
-    empty,
     floor,
+    full,
     isnan,
     linspace,
     log10,
     meshgrid,
     nan,
-    tile,
+    timedelta64,
     transpose,
     where,
 )
 from numpy.ma import masked_where
 
 # Matplotlib backend is configured via the MPLBACKEND environment variable
-from matplotlib.pyplot import close, cm, colorbar, figure, savefig
-from mpl_toolkits.basemap import Basemap
-from scipy.interpolate import interp2d  # , RectBivariateSpline
+from matplotlib.pyplot import close, cm, colorbar, figure, gca, savefig
 
 #
-try:
-    import pyapex
-except ModuleNotFoundError:
-    pyapex = None
-
 try:
     from pyigrf.pyigrf import GetIGRF
 except ModuleNotFoundError:
@@ -35,18 +29,99 @@ except ModuleNotFoundError:
 
 from pyiri2016 import IRI2016
 from pyiri2016 import IRI2016Profile
+from pyiri2016.adaptive import lat_lon_map
+from pyiri2016 import fieldlines
+from pyiri2016.interpolate import MapInterpolator
+from pyiri2016.mapplot import MapFigure, MapPanel
+from pyiri2016.shared import attach, fill
+from pyiri2016.times import as_datetime64, decimal_year, decompose
 from pyiri2016.iriweb import irisubgl, firisubl
 
-try:
-    from timeutil import TimeUtilities
-except ModuleNotFoundError:
-    # Use fallback TimeUtilities from pyiri2016
-    from pyiri2016 import TimeUtilities
 #
 cwd = Path(__file__).parent
 DataFolder = cwd / "data"
 
 
+# Field-line grids of 'LatVsFL' and their rows of 'outf' (see IRI_SUB)
+FL_FIELDS = {
+    "ne": 0,
+    "tn": 1,
+    "ti": 2,
+    "te": 3,
+    "nHe": 20,
+    "nO": 21,
+    "nN2": 22,
+    "nO2": 23,
+    "nAr": 24,
+    "nH": 26,
+    "nN": 27,
+}
+
+# Map figures of 'Plot2D' and 'Plot2DMUF', shared by all instances and
+# reused from call to call, keyed by layout (the panels redraw their
+# background when the map extent changes)
+_mapfigures: dict[tuple, MapFigure] = {}
+
+
+def _map_figure(nrows, ncols, figsize):
+    """The shared MapFigure of nrows x ncols panels and size 'figsize'"""
+
+    key = (nrows, ncols, figsize)
+    if key not in _mapfigures:
+        _mapfigures[key] = MapFigure(nrows, ncols, figsize)
+    return _mapfigures[key]
+
+
+def _horizontal_field(coordl, year):
+    """IGRF horizontal magnetic field at the points 'coordl' (lon, alt, lat)"""
+
+    if GetIGRF is None:
+        raise ImportError(
+            "pyigrf is required for IGRF calculations. Install it with: pip install pyigrf"
+        )
+
+    for lon, alt, lat in coordl:
+        bn, be, _, _, _ = GetIGRF(lat, lon, alt, year)
+
+        # Horizontal component
+        bh = (bn**2 + be**2) ** 0.5
+
+        yield bh
+
+
+def _field_line(coordl, hmin, jf, jmag, year, mmdd, doy, hour2, FIRI, IGRF, date2):
+    """
+    Evaluate the points of the field line 'coordl' (npts, 3: lon, alt, lat)
+    above 'hmin'; returns their indices, the values of every 'LatVsFL' grid
+    there and 'oarr' (None if no point is above 'hmin')
+    """
+
+    ind = where(coordl[:, 1] >= hmin)[0]
+    if len(ind) == 0:
+        return ind, {}, None
+
+    outf, oarr = irisubgl(jf, jmag, year, mmdd, hour2, coordl[ind, :], DataFolder)
+
+    values = {name: outf[row, :] for name, row in FL_FIELDS.items()}
+    if FIRI:
+        values["neFIRI"], _ = firisubl(year, doy, hour2, coordl[ind, :], DataFolder)
+    values["babs"] = list(_horizontal_field(coordl[ind, :], date2)) if IGRF else outf[19, :]
+
+    return ind, values, oarr
+
+
+def _field_line_part(spec, task, **kwargs):
+    """Worker of 'LatVsFL': evaluate one field line in place in shared memory"""
+
+    fl, coordl = task
+    ind, values, oarr = _field_line(coordl, **kwargs)
+    arrays = attach(spec)
+    for name, value in values.items():
+        arrays[name][ind, fl] = value
+    if oarr is not None:
+        arrays["oarr"][:, fl] = oarr[:, 0]
+
+
 class IRI2016_2DProf(IRI2016Profile):
     # def __init__(self):
 
@@ -56,29 +131,22 @@ class IRI2016_2DProf(IRI2016Profile):
 
     #    IRI2016Profile()._GetTitle(__self__)
 
-    def HeightVsTime(self, FIRI=False, hrlim=[0.0, 24.0], hrstp=1.0):
+    def HeightVsTime(self, FIRI=False, hrlim=(0.0, 24.0), hrstp=1.0, workers=1):
 
         self.option = 1
         nhrstp = int((hrlim[1] + hrstp - hrlim[0]) / hrstp) + 1
         hrbins = list(map(lambda x: hrlim[0] + float(x) * hrstp, range(nhrstp)))
 
-        Ne = empty((nhrstp, self.numstp))
-        if FIRI:
-            NeFIRI = empty((nhrstp, self.numstp))
-        Te = empty((nhrstp, self.numstp))
-        Ti = empty((nhrstp, self.numstp))
-
-        for i in range(nhrstp):
-            self.hour = hrbins[i]
-            self.HeiProfile()
+        # All hours in one native call (per worker)
+        a, _ = self.Sweep(8, hrbins, workers=workers)
+        self.hour = hrbins[-1]
+        self._GetTitle()
 
-            Ne[i, :] = self.a[0, range(self.numstp)]
-            if FIRI:
-                NeFIRI[i, :] = self.a[12, range(self.numstp)]
-            Te[i, :] = self.a[3, range(self.numstp)]
-            Ti[i, :] = self.a[2, range(self.numstp)]
-
-        #   self._GetTitle()
+        Ne = transpose(a[0, :, :]).astype(self.dtype)
+        if FIRI:
+            NeFIRI = transpose(a[12, :, :]).astype(self.dtype)
+        Te = transpose(a[3, :, :]).astype(self.dtype)
+        Ti = transpose(a[2, :, :]).astype(self.dtype)
 
         altbins = arange(self.vbeg, self.vend + self.vstp, self.vstp)
         self.data2D = {
@@ -103,24 +171,21 @@ class IRI2016_2DProf(IRI2016Profile):
     # End of 'HeightVsTime'
     #####
 
-    def LatVsLon(self, lonlim=[-180.0, 180.0], lonstp=20.0):
+    def LatVsLon(self, lonlim=(-180.0, 180.0), lonstp=20.0, workers=1):
 
         self.option = 2
         nlonstp = int((lonlim[1] + lonstp - lonlim[0]) / lonstp) + 1
         lonbins = list(map(lambda x: lonlim[0] + float(x) * lonstp, range(nlonstp)))
 
-        NmF2 = empty((nlonstp, self.numstp))
-        hmF2 = empty((nlonstp, self.numstp))
-        B0 = empty((nlonstp, self.numstp))
-        dip = empty((nlonstp, self.numstp))
+        # All longitudes in one native call (per worker)
+        _, b = self.Sweep(3, lonbins, workers=workers)
+        self.lon = lonbins[-1]
+        self._GetTitle()
 
-        for i in range(nlonstp):
-            self.lon = lonbins[i]
-            self.HeiProfile()
-            NmF2[i, :] = self.b[0, range(self.numstp)]
-            hmF2[i, :] = self.b[1, range(self.numstp)]
-            B0[i, :] = self.b[9, range(self.numstp)]
-            dip[i, :] = self.b[24, range(self.numstp)]
+        NmF2 = transpose(b[0, :, :]).astype(self.dtype)
+        hmF2 = transpose(b[1, :, :]).astype(self.dtype)
+        B0 = transpose(b[9, :, :]).astype(self.dtype)
+        dip = transpose(b[24, :, :]).astype(self.dtype)
 
         latbins = arange(self.vbeg, self.vend + self.vstp, self.vstp)
         self.data2D = {
@@ -137,6 +202,49 @@ class IRI2016_2DProf(IRI2016Profile):
     # End of 'LatVsLon'
     #####
 
+    def AdaptiveLatVsLon(
+        self,
+        latlim=(-90.0, 90.0),
+        latstp=1.0,
+        lonlim=(-180.0, 180.0),
+        lonstp=1.0,
+        levels=4,
+        rtol=0.02,
+    ):
+        """
+        Like 'LatVsLon', on a fine grid refined only where NmF2, hmF2 or
+        TEC vary rapidly (see pyiri2016.adaptive.lat_lon_map). 'data2D'
+        also holds 'TEC' and the per-cell 'error' estimate.
+        """
+
+        m = lat_lon_map(
+            self.year,
+            self.month,
+            self.dom,
+            self.hour,
+            latlim=latlim,
+            latstp=latstp,
+            lonlim=lonlim,
+            lonstp=lonstp,
+            levels=levels,
+            rtol=rtol,
+            fields=("NmF2", "hmF2", "TEC", "B0", "dip"),
+            alt=self.alt,
+            iut=self.iut,
+            jmag=self.jmag,
+            jf=self.jf,
+        )
+        self._GetTitle()
+
+        self.data2D = {"lat": m["lat"], "lon": m["lon"], "title": self.title3}
+        for key in ("NmF2", "hmF2", "TEC", "B0", "dip", "error"):
+            self.data2D[key] = transpose(m[key]).astype(self.dtype)
+        self.evaluations = m["evaluations"]
+
+    #
+    # End of 'AdaptiveLatVsLon'
+    #####
+
     def LatVsFL(
         self,
         date=[2003, 11, 21],
@@ -148,22 +256,34 @@ class IRI2016_2DProf(IRI2016Profile):
         hstp=1.0,
         mlatlim=[-10.0, 10.0],
         mlatstp=0.1,
+        workers=1,
+        cache_dir=None,
+        date_step=0.0,
     ):
-
-        if pyapex is None:
-            raise ImportError(
-                "pyapex is required for LatVsFL(). Install it with: pip install pyapex"
-            )
+        """
+        'date' is [year, month, day] and 'time' [hour, minute, second], in
+        UT, or 'date' is a datetime64 (datetime or ISO string) giving both.
+        The field lines come from the cache of pyiri2016.fieldlines (also
+        on disk with a 'cache_dir'), traced with pyapex on a miss, at the
+        exact date or, to share them between nearby dates, at the date
+        rounded to 'date_step' years (e.g. fieldlines.DATE_STEP)
+        """
 
         #
         # INPUTS
         #
 
-        # Date
-        year, month, day = date
-
-        # Time
-        hour, minute, second = time
+        # Date and time
+        if isinstance(date, (list, tuple)):
+            when = as_datetime64("{:04d}-{:02d}-{:02d}".format(*date)) + timedelta64(
+                round(time[0] * 3600 + time[1] * 60 + time[2]), "s"
+            )
+        else:
+            when = as_datetime64(date)
+        year, mmdd, doy, hour2 = (x.item() for x in decompose(when))
+        seconds = round(hour2 * 3600)
+        date = [year, mmdd // 100, mmdd % 100]
+        time = [seconds // 3600, seconds // 60 % 60, seconds % 60]
 
         # Geog. Coord.
         dlon, dlat = gc
@@ -176,86 +296,67 @@ class IRI2016_2DProf(IRI2016Profile):
         #
         ###
 
-        doy = TimeUtilities().CalcDOY(year, month, day)
-        date2 = year + doy / (365 + 1 if TimeUtilities().IsLeapYear else 0)
+        date2 = decimal_year(when).item()
 
         # f = figure(figsize=(16,6))
 
         # pn = f.add_subplot(111)
 
-        self.coordl, self.qdcoordl = [], []
-
-        for h in arange(hlim[0], hlim[1] + hstp, hstp):
-            gc, qc = pyapex.ApexFL().getFL(
-                date=date2, dlon=dlon, dlat=dlat, hateq=h, mlatRange=mlatlim, mlatSTP=mlatstp
-            )
-
-            # x, y, z = gc['lat'], gc['alt'], gc['lon']
-
-            # ind = where(y < hlim[0])
-            # if len(ind) > 0: x[ind], y[ind], z[ind] = nan, nan, nan
-            # pn.plot(x, y)
-
-            self.coordl.append([gc["lon"], gc["alt"], gc["lat"]])
-            self.qdcoordl.append([qc["lon"], gc["alt"], qc["lat"]])
-
-        # pn.invert_xaxis()
-        # show()
+        lines = fieldlines.lines(
+            date2,
+            dlon,
+            dlat,
+            arange(hlim[0], hlim[1] + hstp, hstp),
+            mlatlim,
+            mlatstp,
+            workers=workers,
+            cache_dir=cache_dir,
+            date_step=date_step,
+        )
+        self.coordl, self.qdcoordl = lines.coordl, lines.qdcoordl
 
         jf = IRI2016().Switches()
         jmag = 0
-        mmdd = int(month * 100) + day
-        hour2 = hour + minute / 60 + second / 3600
-
-        self.coordl = array(self.coordl)
-        self.qdcoordl = array(self.qdcoordl)
 
         # nfl -> No. of field-line (or height)
         # nc -> No. of coord. (0 -> lon, 1 -> alt, 2 -> lat)
         # np -> No. of points per field-line
         nfl, nc, np = self.coordl.shape
 
-        self.ne, self.te = tile(nan, (np, nfl)), tile(nan, (np, nfl))
-        self.ti, self.tn = tile(nan, (np, nfl)), tile(nan, (np, nfl))
-        self.nHe, self.nO = tile(nan, (np, nfl)), tile(nan, (np, nfl))
-        self.nN2, self.nO2 = tile(nan, (np, nfl)), tile(nan, (np, nfl))
-        self.nAr, self.nH = tile(nan, (np, nfl)), tile(nan, (np, nfl))
-        self.nN, self.babs = tile(nan, (np, nfl)), tile(nan, (np, nfl))
-        if FIRI:
-            self.neFIRI = tile(nan, (np, nfl))
-
-        for fl in range(nfl):
-            curr_coordl = transpose(self.coordl[fl, :, :])
-
-            ind = where(curr_coordl[:, 1] >= (hlim[0] - 10.0))
-
-            if len(ind[0]) > 0:
-                outf, oarr = irisubgl(
-                    jf, jmag, year, mmdd, hour2, curr_coordl[ind[0], :], DataFolder
-                )
-
-                self.ne[ind[0], fl] = outf[0, :]
-
-                self.tn[ind[0], fl] = outf[1, :]
-                self.ti[ind[0], fl] = outf[2, :]
-                self.te[ind[0], fl] = outf[3, :]
-
-                if FIRI:
-                    self.neFIRI[ind[0], fl], ierr = firisubl(
-                        year, doy, hour2, curr_coordl[ind[0], :], DataFolder
-                    )
-
-                self.nHe[ind[0], fl] = outf[20, :]
-                self.nO[ind[0], fl] = outf[21, :]
-                self.nN2[ind[0], fl] = outf[22, :]
-                self.nO2[ind[0], fl] = outf[23, :]
-                self.nAr[ind[0], fl] = outf[24, :]
-                self.nH[ind[0], fl] = outf[26, :]
-                self.nN[ind[0], fl] = outf[27, :]
+        grids = list(FL_FIELDS) + ["babs"] + (["neFIRI"] if FIRI else [])
+        kwargs = {
+            "hmin": hlim[0] - 10.0,
+            "jf": jf,
+            "jmag": jmag,
+            "year": year,
+            "mmdd": mmdd,
+            "doy": doy,
+            "hour2": hour2,
+            "FIRI": FIRI,
+            "IGRF": IGRF,
+            "date2": date2,
+        }
 
-                self.babs[ind[0], fl] = (
-                    list(self.getIGRF(curr_coordl[ind[0], :], date2)) if IGRF else outf[19, :]
-                )
+        if workers > 1:
+            # Field lines in parallel, written in place in shared memory
+            shapes = {name: (np, nfl) for name in grids}
+            shapes["oarr"] = (100, nfl)
+            tasks = [(fl, transpose(self.coordl[fl, :, :])) for fl in range(nfl)]
+            func = partial(_field_line_part, **kwargs)
+            arrays = fill(shapes, func, tasks, workers, dtype=self.dtype, fill_value=nan)
+            for name in grids:
+                setattr(self, name, arrays[name])
+            done = where(~isnan(arrays["oarr"][0, :]))[0]
+            oarr = arrays["oarr"][:, done[-1:]]
+        else:
+            for name in grids:
+                setattr(self, name, full((np, nfl), nan, dtype=self.dtype))
+            for fl in range(nfl):
+                ind, values, out = _field_line(transpose(self.coordl[fl, :, :]), **kwargs)
+                for name, value in values.items():
+                    getattr(self, name)[ind, fl] = value
+                if out is not None:
+                    oarr = out
 
         self.hlim = hlim
 
@@ -285,18 +386,7 @@ class IRI2016_2DProf(IRI2016Profile):
 
     def getIGRF(self, coordl, year):
 
-        if GetIGRF is None:
-            raise ImportError(
-                "pyigrf is required for IGRF calculations. Install it with: pip install pyigrf"
-            )
-
-        for lon, alt, lat in coordl:
-            bn, be, bd, xl, icode = GetIGRF(lat, lon, alt, year)
-
-            # Horizontal component
-            bh = (bn**2 + be**2) ** 0.5
-
-            yield bh
+        return _horizontal_field(coordl, year)
 
     def PlotLatVsFL(self):
 
@@ -427,6 +517,28 @@ class IRI2016_2DProf(IRI2016Profile):
 
     def Plot2D(self):
 
+        if self.option == 2:
+            # Map figure kept from call to call; only the data are replaced
+            fig = _map_figure(1, 1, (24, 6))
+            fig.panel(1).draw(
+                self.data2D["lat"],
+                self.data2D["lon"],
+                transpose(9.0 * self.data2D["NmF2"] ** 0.5 * 1e-6),
+                0.0,
+                15.0,
+                dip=transpose(self.data2D["dip"]),
+                title=self.data2D["title"],
+                label="foF2 (MHz)",
+            )
+
+            figures_dir = Path(__file__).parent.parent / "figures"
+            figures_dir.mkdir(exist_ok=True)
+            unique_id = str(uuid.uuid4())[:8]
+            filepath = figures_dir / f"iri2D_option{self.option}_{unique_id}.png"
+            fig.save(filepath)
+            print(f"Plot saved to: {filepath}")
+            return
+
         f = figure(figsize=(24, 6))
 
         if self.option == 1:
@@ -454,43 +566,6 @@ class IRI2016_2DProf(IRI2016Profile):
             cp1 = colorbar(ipc)
             cp1.set_label(r"T$_i$ ($^\circ$)")
 
-        elif self.option == 2:
-            pn1 = f.add_subplot(111)
-
-            m = Basemap(
-                llcrnrlon=self.data2D["lon"][0],
-                llcrnrlat=self.data2D["lat"][0],
-                urcrnrlon=self.data2D["lon"][-1],
-                urcrnrlat=self.data2D["lat"][-1],
-                resolution="l",
-            )
-            m.drawcoastlines()
-
-            parallelsLim = self._RoundLim([self.data2D["lat"][0], self.data2D["lat"][-1]])
-            m.drawparallels(
-                arange(parallelsLim[0], parallelsLim[1], 20.0), labels=[True, False, False, True]
-            )
-
-            meridiansLim = self._RoundLim([self.data2D["lon"][0], self.data2D["lon"][-1]])
-            m.drawmeridians(
-                arange(meridiansLim[0], meridiansLim[1], 30.0), labels=[True, False, False, True]
-            )
-
-            X, Y = meshgrid(self.data2D["lon"], self.data2D["lat"])
-            ipc = m.pcolor(
-                X,
-                Y,
-                transpose(9.0 * self.data2D["NmF2"] ** 0.5 * 1e-6),
-                cmap=cm.jet,
-                vmax=15.0,
-                vmin=0,
-            )
-            m.contour(X, Y, transpose(self.data2D["dip"]), colors="k", linestyles="--")
-            pn1.set_title(self.data2D["title"])
-
-            cp1 = m.colorbar(ipc)
-            cp1.set_label("foF2 (MHz)")
-
         elif self.option == 8:
             pass
 
@@ -557,129 +632,113 @@ class IRI2016_2DProf(IRI2016Profile):
 
     def Plot2DMUF(self):
 
-        f = figure(figsize=(16, 12))
+        fig = _map_figure(2, 3, (16, 12))
 
-        f.add_subplot(231)
-        self.MapPColor(9.0 * self.data2D["NmF2"] ** 0.5 * 1e-6, 15.0, 5.0)
+        self.MapPColor(9.0 * self.data2D["NmF2"] ** 0.5 * 1e-6, 15.0, 5.0, fig.panel(1))
 
-        f.add_subplot(234)
         self.IntLatVsLon()
-        self.MapPColorInt(self.data2DInt["foF2"], 15.0, 5.0)
+        self.MapPColorInt(self.data2DInt["foF2"], 15.0, 5.0, fig.panel(4))
 
-        f.add_subplot(232)
-        self.MapPColor(self.data2D["hmF2"], 550.0, 250.0)
+        self.MapPColor(self.data2D["hmF2"], 550.0, 250.0, fig.panel(2))
 
-        f.add_subplot(235)
-        self.MapPColorInt(self.data2DInt["hmF2"], 550.0, 250.0)
+        self.MapPColorInt(self.data2DInt["hmF2"], 550.0, 250.0, fig.panel(5))
 
-        f.add_subplot(233)
-        self.MapPColor(self.data2D["B0"], 250.0, 100.0)
+        self.MapPColor(self.data2D["B0"], 250.0, 100.0, fig.panel(3))
 
-        f.add_subplot(236)
-        self.MapPColorInt(self.data2DInt["B0"], 250.0, 100.0)
+        self.MapPColorInt(self.data2DInt["B0"], 250.0, 100.0, fig.panel(6))
 
         # Save plot to file instead of displaying
         figures_dir = Path(__file__).parent.parent / "figures"
         figures_dir.mkdir(exist_ok=True)
         suffix = str(uuid.uuid4())[:8]
         filepath = figures_dir / f"iri2D_muf_{suffix}.png"
-        savefig(str(filepath), dpi=100, bbox_inches="tight")
+        fig.save(filepath)
         print(f"Plot saved to: {filepath}")
-        close()
-
-    def MapPColor(self, arr, vmax, vmin):
 
-        self.m = Basemap(
-            llcrnrlon=self.data2D["lon"][0],
-            llcrnrlat=self.data2D["lat"][0],
-            urcrnrlon=self.data2D["lon"][-1],
-            urcrnrlat=self.data2D["lat"][-1],
-            resolution="l",
+    def MapPColor(self, arr, vmax, vmin, panel=None):
+        """
+        Map 'arr' (laid out like 'data2D' fields) with the dip contours, on
+        'panel' (a pyiri2016.mapplot.MapPanel) or the current axes
+        """
+
+        if panel is None:
+            panel = MapPanel(gca())
+        panel.draw(
+            self.data2D["lat"],
+            self.data2D["lon"],
+            transpose(arr),
+            vmin,
+            vmax,
+            dip=transpose(self.data2D["dip"]),
+            dlat=2.0,
+            dlon=5.0,
+            countries=True,
         )
-        self.m.drawcoastlines()
-        self.m.drawcountries()
-
-        parallelsLim = self._RoundLim([self.data2D["lat"][0], self.data2D["lat"][-1]])
-        self.m.drawparallels(
-            arange(parallelsLim[0], parallelsLim[1], 2.0), labels=[True, False, False, True]
-        )
-
-        meridiansLim = self._RoundLim([self.data2D["lon"][0], self.data2D["lon"][-1]])
-        self.m.drawmeridians(
-            arange(meridiansLim[0], meridiansLim[1], 5.0), labels=[True, False, False, True]
-        )
-
-        X, Y = meshgrid(self.data2D["lon"], self.data2D["lat"])
-        self.m.pcolor(X, Y, transpose(arr), cmap=cm.jet, vmax=vmax, vmin=vmin)
-        self.m.contour(X, Y, transpose(self.data2D["dip"]), colors="k", linestyles="--")
-
-        # self.m.plot(X, Y, color='k', linestyle='None', marker='o')
+        self.m = panel.m
 
-        # lon0, lat0 = -11.95, -76.87
-        # x0, y0 = meshgrid(lon0, lat0)
-        # self.m.plot(x0, y0, color='k', linestyle='None', marker='o')
+    # ------------------------------------------------------------------------------
 
-        # print(x0, y0)
+    def Interpolator(self):
+        """
+        MapInterpolator of foF2, hmF2 and B0 for the current 'data2D' (from
+        'LatVsLon'), built once per map
+        """
+
+        cached = getattr(self, "_interpolator", None)
+        if cached is None or cached[0] is not self.data2D:
+            d = self.data2D
+            interpolator = MapInterpolator(
+                d["lat"],
+                d["lon"],
+                foF2=9.0 * transpose(d["NmF2"]) ** 0.5 * 1e-6,
+                hmF2=transpose(d["hmF2"]),
+                B0=transpose(d["B0"]),
+            )
+            self._interpolator = cached = (d, interpolator)
 
-    # ------------------------------------------------------------------------------
+        return cached[1]
 
     def IntLatVsLon(self, lat0=-11.95, lon0=-76.87):
 
         # self.m.plot(lon0, lat0, 'bx')
 
-        X0, Y0 = meshgrid(self.data2D["lon"], self.data2D["lat"])
-
         lon1 = lon0 + (array(self.data2D["lon"]) - lon0) * 0.5
         lat1 = lat0 + (array(self.data2D["lat"]) - lat0) * 0.5
 
-        x0, y0 = array(self.data2D["lon"]), array(self.data2D["lat"])
-
-        foF2 = interp2d(x0, y0, 9.0 * transpose(self.data2D["NmF2"]) ** 0.5 * 1e-6)(lon1, lat1)
-        hmF2 = interp2d(x0, y0, transpose(self.data2D["hmF2"]))(lon1, lat1)
-        B0 = interp2d(x0, y0, transpose(self.data2D["B0"]))(lon1, lat1)
+        interpolator = self.Interpolator()
+        grid = interpolator.grid(lat1, lon1)
 
         self.data2DInt = {
             "lon": lon1,
             "lat": lat1,
-            "foF2": transpose(foF2),
-            "hmF2": transpose(hmF2),
-            "B0": transpose(B0),
+            "foF2": transpose(grid["foF2"]),
+            "hmF2": transpose(grid["hmF2"]),
+            "B0": transpose(grid["B0"]),
         }
 
         self.data2DTX = {}
-        self.data2DTX["foF2"] = interp2d(
-            x0, y0, 9.0 * transpose(self.data2D["NmF2"]) ** 0.5 * 1e-6
-        )(lon0, lat0)[0]
+        self.data2DTX["foF2"] = float(interpolator(lat0, lon0)["foF2"])
 
     #
     # End of 'IntLatVsLon'
     #####
 
-    def MapPColorInt(self, arr, vmax, vmin):
-
-        self.m = Basemap(
-            llcrnrlon=self.data2D["lon"][0],
-            llcrnrlat=self.data2D["lat"][0],
-            urcrnrlon=self.data2D["lon"][-1],
-            urcrnrlat=self.data2D["lat"][-1],
-            resolution="l",
+    def MapPColorInt(self, arr, vmax, vmin, panel=None):
+        """As 'MapPColor', for fields of 'data2DInt' (from 'IntLatVsLon')"""
+
+        if panel is None:
+            panel = MapPanel(gca())
+        panel.draw(
+            self.data2DInt["lat"],
+            self.data2DInt["lon"],
+            transpose(arr),
+            vmin,
+            vmax,
+            dip=transpose(self.data2D["dip"]),
+            dlat=2.0,
+            dlon=5.0,
+            countries=True,
+            dip_lat=self.data2D["lat"],
+            dip_lon=self.data2D["lon"],
         )
-        self.m.drawcoastlines()
-        self.m.drawcountries()
-
-        parallelsLim = self._RoundLim([self.data2D["lat"][0], self.data2D["lat"][-1]])
-        self.m.drawparallels(
-            arange(parallelsLim[0], parallelsLim[1], 2.0), labels=[True, False, False, True]
-        )
-
-        meridiansLim = self._RoundLim([self.data2D["lon"][0], self.data2D["lon"][-1]])
-        self.m.drawmeridians(
-            arange(meridiansLim[0], meridiansLim[1], 5.0), labels=[True, False, False, True]
-        )
-
-        X, Y = meshgrid(self.data2DInt["lon"], self.data2DInt["lat"])
-        self.m.pcolor(X, Y, transpose(arr), cmap=cm.jet, vmax=vmax, vmin=vmin)
-
-        X0, Y0 = meshgrid(self.data2D["lon"], self.data2D["lat"])
-        self.m.contour(X0, Y0, transpose(self.data2D["dip"]), colors="k", linestyles="--")
-        # print(X.shape, Y.shape, arr.shape)
+        self.m = panel.m
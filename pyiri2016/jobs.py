@@ -0,0 +1,422 @@
+"""
+Resumable, sharded grid jobs behind ``python -m pyiri2016 job``.
+
+A job evaluates height profiles (or single heights) on a lat x lon grid at
+every time of a time range. Its spec is split into deterministic shards of
+'shard_size' consecutive times, which any number of processes on any number
+of nodes sharing the job directory can compute:
+
+    >>> from pyiri2016.jobs import Job
+    >>> job = Job("ne-2003", {"start": "2003-01-01", "stop": "2004-01-01", "cadence": 3600})
+    >>> job.run(workers=8)          # on every node; skips finished shards
+    >>> job.merge("ne-2003.nc")     # once all shards are done
+
+The job directory holds 'job.json' (the spec), one .npz file per finished
+shard in 'shards/' and 'manifest.ndjson', to which every finished shard is
+appended. Coordination is through the file system only: a shard is claimed
+by creating its lock file exclusively, its result is written to a temporary
+file renamed into place, and it counts as done once listed in the
+manifest. Locks left by dead processes are reclaimed, immediately on the
+same host and after 'stale' seconds from other hosts.
+"""
+
+import json
+import os
+import socket
+import sys
+import time
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+from pyiri2016 import batch, export, presets
+from pyiri2016.stream import _as_timedelta64
+from pyiri2016.times import calendar
+
+SPEC = {
+    "start": None,
+    "stop": None,
+    "cadence": 3600.0,
+    "latlim": [-90.0, 90.0],
+    "latstp": 10.0,
+    "lonlim": [-180.0, 180.0],
+    "lonstp": 20.0,
+    "altlim": [90.0, 600.0],
+    "altstp": 10.0,
+    "fields": ["ne", "te", "ti"],
+    "preset": None,
+    "htecmax": 0.0,
+    "iut": 1,
+    "jmag": 0,
+    "shard_size": 24,
+    "chunk_size": 10000,
+}
+
+
+def _axis(lim, stp):
+
+    return lim[0] + stp * np.arange(round((lim[1] - lim[0]) / stp) + 1)
+
+
+def normalize(spec):
+    """
+    Complete 'spec' with the defaults of SPEC and check it; returns the
+    JSON-compatible spec stored in 'job.json'
+
+    'start' is required; 'stop' (exclusive) defaults to a single time and
+    'cadence' is in seconds. Heights go from altlim[0] to altlim[1] every
+    'altstp' km (a single height if both limits are equal).
+    """
+
+    unknown = set(spec) - set(SPEC)
+    if unknown:
+        raise ValueError(f"Unknown job spec keys: {', '.join(sorted(unknown))}")
+    spec = {**SPEC, **spec}
+    if spec["start"] is None:
+        raise ValueError("the job spec needs a 'start' time")
+
+    spec["start"] = str(np.datetime64(spec["start"], "s"))
+    if spec["stop"] is not None:
+        spec["stop"] = str(np.datetime64(spec["stop"], "s"))
+    spec["cadence"] = float(spec["cadence"])
+    if spec["cadence"] <= 0.0:
+        raise ValueError("cadence must be positive")
+
+    for name in spec["fields"]:
+        if name not in batch.OUTF_FIELDS and name not in batch.OARR_FIELDS:
+            raise KeyError(f"Unknown field: {name}")
+    if spec["preset"] is not None:
+        presets.get(spec["preset"])
+    if spec["shard_size"] < 1:
+        raise ValueError("shard_size must be at least 1")
+
+    # Round trip, so that specs compare equal to the ones read back
+    return json.loads(json.dumps(spec))
+
+
+def _write_atomic(path, text):
+
+    tmp = path.with_name(f".{path.name}.{socket.gethostname()}.{os.getpid()}")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+def _alive(pid):
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Job:
+    """
+    Sharded job in the directory 'path', created from 'spec' (a dict, see
+    SPEC and 'normalize') or opened if 'spec' is None
+
+    Opening an existing job with a different spec raises ValueError.
+    """
+
+    def __init__(self, path, spec=None):
+
+        self.path = Path(path)
+        jobfile = self.path / "job.json"
+
+        if spec is not None:
+            spec = normalize(spec)
+            if jobfile.exists():
+                if json.loads(jobfile.read_text())["spec"] != spec:
+                    raise ValueError(f"{self.path} holds a job with a different spec")
+            else:
+                (self.path / "shards").mkdir(parents=True, exist_ok=True)
+                _write_atomic(jobfile, json.dumps({"spec": spec}, indent=2))
+        elif not jobfile.exists():
+            raise FileNotFoundError(f"No job in {self.path} (give a spec to create one)")
+
+        self.spec = spec = json.loads(jobfile.read_text())["spec"]
+
+        start = np.datetime64(spec["start"], "s")
+        step = _as_timedelta64(spec["cadence"])
+        stop = start + step if spec["stop"] is None else np.datetime64(spec["stop"], "s")
+        total = int(np.ceil((stop - start) / step))
+        self.times = (start + step * np.arange(total)).astype("datetime64[s]")
+
+        self.lat = _axis(spec["latlim"], spec["latstp"])
+        self.lon = _axis(spec["lonlim"], spec["lonstp"])
+        self.alt = _axis(spec["altlim"], spec["altstp"])
+        self.nshards = -(-total // spec["shard_size"])
+
+        self.manifest = self.path / "manifest.ndjson"
+        self._done, self._offset = {}, 0
+
+    def shard_times(self, shard):
+        """Times of shard number 'shard'"""
+
+        size = self.spec["shard_size"]
+        return self.times[shard * size : (shard + 1) * size]
+
+    def shard_file(self, shard):
+
+        return self.path / "shards" / f"{shard:06d}.npz"
+
+    def _lock_file(self, shard):
+
+        return self.path / "shards" / f"{shard:06d}.lock"
+
+    def completed(self):
+        """
+        Manifest records (dicts) of the finished shards, by shard number,
+        read incrementally from the manifest
+        """
+
+        if self.manifest.exists():
+            with open(self.manifest, "rb") as fp:
+                fp.seek(self._offset)
+                for line in fp:
+                    if not line.endswith(b"\n"):
+                        break
+                    self._offset += len(line)
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if self.shard_file(record["shard"]).exists():
+                        self._done[record["shard"]] = record
+        return self._done
+
+    def _claim(self, shard, stale):
+        """Create the lock of 'shard'; False if another live process holds it"""
+
+        lock = self._lock_file(shard)
+        owner = json.dumps({"host": socket.gethostname(), "pid": os.getpid(), "time": time.time()})
+        for _ in range(2):
+            try:
+                fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    holder = json.loads(lock.read_text())
+                except FileNotFoundError:
+                    continue
+                except ValueError:
+                    # Empty if its owner died right after creating it
+                    holder = {"host": None, "pid": 0, "time": lock.stat().st_mtime}
+                dead = holder["host"] == socket.gethostname() and not _alive(holder["pid"])
+                if not dead and time.time() - holder["time"] < stale:
+                    return False
+                lock.unlink(missing_ok=True)
+                continue
+            os.write(fd, owner.encode())
+            os.close(fd)
+            return True
+        return False
+
+    def _claims(self, stale, claimed):
+        """Claim and yield the shards not done yet, in order"""
+
+        for shard in range(self.nshards):
+            if shard in self.completed():
+                continue
+            if not self._claim(shard, stale):
+                continue
+            claimed.add(shard)
+            # Finished elsewhere between the check and the claim
+            if shard in self.completed():
+                self._release(shard, claimed)
+                continue
+            yield shard
+
+    def _release(self, shard, claimed):
+
+        claimed.discard(shard)
+        self._lock_file(shard).unlink(missing_ok=True)
+
+    def run(self, workers=1, stale=3600.0, progress=None):
+        """
+        Compute the shards that are neither done nor claimed by another live
+        process, on 'workers' processes; returns the number of shards
+        computed here
+
+        'progress' is an optional file object receiving one line per shard.
+        """
+
+        func = partial(_run_shard, path=str(self.path))
+        claimed, count = set(), 0
+        try:
+            for shard, elapsed in batch._ordered(self._claims(stale, claimed), func, workers):
+                self._release(shard, claimed)
+                count += 1
+                if progress is not None:
+                    done = len(self.completed())
+                    print(
+                        f"shard {shard}: {elapsed:.1f} s, {done}/{self.nshards} done",
+                        file=progress,
+                    )
+        finally:
+            for shard in list(claimed):
+                self._release(shard, claimed)
+        return count
+
+    def load(self, shard):
+        """Results of a finished shard: a dict with 'time' and the fields"""
+
+        with np.load(self.shard_file(shard)) as data:
+            return dict(data)
+
+    def merge(self, path=None):
+        """
+        Merge the results of all shards in time order
+
+        With 'path', they are streamed shard by shard to an HDF5, NetCDF or
+        Parquet file (see pyiri2016.export), with record dimension 'time'
+        and coordinates 'lat', 'lon' and 'alt'. Otherwise returns a dict
+        with 'time', 'lat', 'lon', 'alt' and the fields, height-dependent
+        ones with shape (ntime, nlat, nlon, nalt) and the others
+        (ntime, nlat, nlon).
+        """
+
+        missing = self.nshards - len(self.completed())
+        if missing:
+            raise RuntimeError(f"{missing} of {self.nshards} shards are not done")
+
+        if path is None:
+            blocks = [self.load(shard) for shard in range(self.nshards)]
+            out = {"lat": self.lat, "lon": self.lon, "alt": self.alt}
+            out.update({name: np.concatenate([b[name] for b in blocks]) for name in blocks[0]})
+            return out
+
+        first = self.load(0)
+        dims = {
+            name: ("time", "lat", "lon", "alt")[: value.ndim]
+            for name, value in first.items()
+            if name != "time"
+        }
+        coords = {"lat": self.lat, "lon": self.lon, "alt": self.alt}
+        attrs = {"spec": json.dumps(self.spec)}
+        writer = export.writer(path, dims, coords, record="time", chunk=1, attrs=attrs)
+        try:
+            for shard in range(self.nshards):
+                writer.write(first if shard == 0 else self.load(shard))
+        finally:
+            writer.close()
+
+
+# Job of the current worker process, by directory
+_jobs: dict[str, Job] = {}
+
+
+def _run_shard(shard, path):
+    """Compute one shard, write its file and append it to the manifest"""
+
+    if path not in _jobs:
+        _jobs[path] = Job(path)
+    job = _jobs[path]
+    spec = job.spec
+    start = time.perf_counter()
+
+    times = job.shard_times(shard)
+    t, la, lo = (a.ravel() for a in np.meshgrid(times, job.lat, job.lon, indexing="ij"))
+    year, month, day, hour = calendar(t)
+
+    parts = []
+    for first in range(0, t.size, spec["chunk_size"]):
+        part = slice(first, first + spec["chunk_size"])
+        outf, oarr = batch.evaluate(
+            year[part],
+            month[part],
+            day[part],
+            hour[part],
+            la[part],
+            lo[part],
+            alt=job.alt[0],
+            altstp=spec["altstp"],
+            nalt=job.alt.size,
+            iut=spec["iut"],
+            jmag=spec["jmag"],
+            htecmax=spec["htecmax"],
+            preset=spec["preset"],
+        )
+        parts.append(batch.to_fields(outf, oarr, spec["fields"]))
+
+    shape = (times.size, job.lat.size, job.lon.size)
+    values = {"time": times}
+    for name in spec["fields"]:
+        value = np.concatenate([p[name] for p in parts])
+        values[name] = value.reshape(shape + value.shape[1:])
+
+    target = job.shard_file(shard)
+    tmp = target.with_name(f".{shard:06d}.{socket.gethostname()}.{os.getpid()}.npz")
+    np.savez(tmp, **values)
+    os.replace(tmp, target)
+
+    elapsed = time.perf_counter() - start
+    record = {
+        "shard": shard,
+        "file": target.name,
+        "times": int(times.size),
+        "elapsed": round(elapsed, 3),
+        "host": socket.gethostname(),
+        "pid": os.getpid(),
+    }
+    fd = os.open(job.manifest, os.O_CREAT | os.O_APPEND | os.O_WRONLY)
+    try:
+        os.write(fd, (json.dumps(record) + "\n").encode())
+    finally:
+        os.close(fd)
+
+    return shard, elapsed
+
+
+def main(args):
+    """Entry point for 'python -m pyiri2016 job'"""
+
+    spec = None
+    if args.spec is not None:
+        with open(args.spec) as fp:
+            spec = json.load(fp)
+    job = Job(args.directory, spec)
+
+    if args.action == "run":
+        start = time.perf_counter()
+        count = job.run(
+            workers=args.workers, stale=args.stale, progress=sys.stderr if args.progress else None
+        )
+        print(
+            f"{count} shards in {time.perf_counter() - start:.2f} s, "
+            f"{len(job.completed())}/{job.nshards} done",
+            file=sys.stderr,
+        )
+    elif args.action == "status":
+        done = job.completed()
+        elapsed = sum(record["elapsed"] for record in done.values())
+        print(f"{len(done)}/{job.nshards} shards done, {elapsed:.1f} s of compute")
+    else:
+        if args.output is None:
+            raise SystemExit("merge needs -o/--output")
+        job.merge(args.output)
+
+
+def add_parser(subparsers):
+    """Register the 'job' sub-command"""
+
+    parser = subparsers.add_parser(
+        "job",
+        help="run, check or merge a resumable sharded grid job",
+        description="Split a lat x lon x height x time grid into shards computed by any "
+        "number of processes or nodes sharing the job directory.",
+    )
+    parser.add_argument("action", choices=("run", "status", "merge"))
+    parser.add_argument("directory", help="job directory")
+    parser.add_argument("--spec", help="JSON job spec, to create the job")
+    parser.add_argument("-o", "--output", help="merged output (.h5, .nc or .parquet)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--stale", type=float, default=3600.0, help="age of locks from other hosts to reclaim, s"
+    )
+    parser.add_argument("--progress", action="store_true", help="report every shard")
+    parser.set_defaults(func=main)
+
+    return parser
@@ -0,0 +1,319 @@
+"""
+Magnetic coordinates (dip, modified dip, L value, ...) from a precomputed
+lookup grid instead of IGRF.
+
+IRI_SUB evaluates IGRF at every point or profile for the dip, dip latitude
+and modified dip at 300 km and the L value, dip latitude and field strength
+at 600 km. These change on yearly scales and smoothly in space, so for one
+epoch (a calendar year) they can be interpolated in a lat x lon x year grid:
+
+    >>> from pyiri2016 import batch, magnetic
+    >>> with magnetic.use(2003):
+    ...     outf, oarr = batch.evaluate(2003, 11, 21, 12.0, lat, lon)
+
+or, for requests over any number of years,
+'batch.evaluate(..., maggrid=True)'. While a grid is installed, IRI_SUB
+takes the magnetic coordinates of its epoch from it (counted as "maggrid"
+in pyiri2016.counters), also for geomagnetic inputs (jmag=1), which are
+converted to geographic coordinates before the lookup.
+
+'grid' builds the grid of an epoch on first use, with the coarsest spacing
+that keeps the interpolation errors, checked against IGRF at the centres of
+all cells, within 'tol' (degrees, for the dip angles) and 'rtol' (relative,
+for the L value and field strength). The declination (oarr[83]) is an
+output only and not bounded. Grids are kept in memory and, with a
+'cache_dir', on disk.
+"""
+
+from collections.abc import Mapping
+from contextlib import contextmanager
+from pathlib import Path
+from types import MappingProxyType
+from typing import NamedTuple
+
+import numpy as np
+
+from pyiri2016.iriweb import irimag, irimagg
+
+DataFolder = Path(__file__).parent / "data"
+
+# Outputs of 'exact' and 'Grid.interpolate' (see IGRFMG in source/igrf.for)
+FIELDS = ("dip", "magbr", "modip", "dec", "fl", "dipl", "babs")
+ANGLES = ("dip", "magbr", "modip", "dipl")
+RELATIVE = ("fl", "babs")
+
+# Default error bounds, degrees and relative
+TOL = 0.1
+RTOL = 0.01
+
+# Grid spacings tried in turn, degrees, and the capacity of the native grid
+# (NMAGG in source/igrf.for), nodes
+STEPS = (4.0, 2.0, 1.0, 0.5)
+MAXNODES = 540000
+
+# IRI_SUB caps the L value at 10
+MAXL = 10.0
+
+_grids: dict[tuple, "Grid"] = {}
+
+# Grid installed in IRI_SUB, if any
+_installed: "Grid | None" = None
+
+
+def _igrf(year, lat, lon):
+
+    lat, lon = np.broadcast_arrays(np.atleast_1d(lat), np.atleast_1d(lon))
+    out, columns = irimag(year, lat.ravel(), lon.ravel(), str(DataFolder))
+    return out.reshape((7,) + lat.shape), columns.reshape((7,) + lat.shape)
+
+
+def exact(year, lat, lon):
+    """
+    Magnetic coordinates from IGRF at arrays of geographic 'lat', 'lon'
+    (degrees) for the decimal 'year', as a dict of float32 arrays keyed by
+    FIELDS; 'fl' is not capped
+    """
+
+    out, _ = _igrf(year, lat, lon)
+    return dict(zip(FIELDS, out, strict=True))
+
+
+def _derive(columns, lat):
+    """
+    Magnetic coordinates from the grid columns (field components at 300
+    and 600 km, 1/L), as MAGGIN in source/igrf.for
+    """
+
+    north, east, down = columns[:3]
+    horizontal = np.hypot(north, east)
+    dip = np.arcsin(np.clip(down / np.hypot(horizontal, down), -1.0, 1.0))
+    dipdiv = np.clip(dip / np.sqrt(dip * dip + np.cos(np.radians(lat))), -1.0, 1.0)
+    values = {
+        "dip": np.degrees(dip),
+        "magbr": np.degrees(np.arctan(down / 2.0 / horizontal)),
+        "modip": np.degrees(np.arcsin(dipdiv)),
+        "dec": np.degrees(np.arcsin(np.clip(east / horizontal, -1.0, 1.0))),
+        "fl": 1.0 / columns[6],
+    }
+    north, east, down = columns[3:6]
+    horizontal = np.hypot(north, east)
+    values["dipl"] = np.degrees(np.arctan(down / 2.0 / horizontal))
+    values["babs"] = np.hypot(horizontal, down)
+    return values
+
+
+class Grid(NamedTuple):
+    """
+    Lookup grid for the decimal years 'start' to 'stop': 'table' holds the
+    grid columns (see IGRFMG in source/igrf.for) with shape
+    (7, nlat, nlon, ntime), at latitudes -90 to 90 and longitudes 0 to 360
+    in steps of 'step' degrees. 'error' has the largest interpolation error
+    of every bounded field found when the grid was built.
+    """
+
+    start: float
+    stop: float
+    step: float
+    table: np.ndarray
+    error: Mapping[str, float] = MappingProxyType({})
+
+    @property
+    def lat(self):
+        return np.linspace(-90.0, 90.0, self.table.shape[1])
+
+    @property
+    def lon(self):
+        return np.linspace(0.0, 360.0, self.table.shape[2])
+
+    @property
+    def times(self):
+        return np.linspace(self.start, self.stop, self.table.shape[3])
+
+    def interpolate(self, year, lat, lon):
+        """
+        Magnetic coordinates at geographic 'lat', 'lon' for the decimal
+        'year', interpolated as IRI_SUB does, as a dict keyed by FIELDS
+        """
+
+        lat, lon = np.broadcast_arrays(np.atleast_1d(lat), np.atleast_1d(lon))
+        nlat, nlon, ntime = self.table.shape[1:]
+
+        x = (lat - -90.0) / self.step
+        ia = np.clip(x.astype(int), 0, nlat - 2)
+        wa = x - ia
+        x = np.mod(lon, 360.0) / self.step
+        io = np.minimum(x.astype(int), nlon - 2)
+        wo = x - io
+        it, wt = 0, 0.0
+        if ntime > 1:
+            x = (year - self.start) / (self.stop - self.start) * (ntime - 1)
+            it = min(int(x), ntime - 2)
+            wt = x - it
+
+        columns = 0.0
+        for jt, ft in ((0, 1.0 - wt), (1, wt))[: min(2, ntime)]:
+            for jo, fo in ((0, 1.0 - wo), (1, wo)):
+                for ja, fa in ((0, 1.0 - wa), (1, wa)):
+                    columns = columns + ft * fo * fa * self.table[:, ia + ja, io + jo, it + jt]
+        return _derive(columns, lat)
+
+    def install(self):
+        """Make IRI_SUB take the magnetic coordinates from this grid"""
+
+        global _installed
+        irimagg(self.start, self.stop, -90.0, self.step, 0.0, self.step, self.table)
+        _installed = self
+
+    def save(self, path):
+        """Write the grid to an .npz file"""
+
+        np.savez(
+            path,
+            start=self.start,
+            stop=self.stop,
+            step=self.step,
+            table=self.table,
+            **{f"error_{name}": value for name, value in self.error.items()},
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Read a grid written by 'save'"""
+
+        with np.load(path) as data:
+            error = {
+                key[len("error_") :]: float(data[key]) for key in data if key.startswith("error_")
+            }
+            return cls(
+                float(data["start"]), float(data["stop"]), float(data["step"]), data["table"], error
+            )
+
+
+def installed():
+    """The grid installed in IRI_SUB, None if IRI_SUB evaluates IGRF"""
+
+    return _installed
+
+
+def clear():
+    """Remove the installed grid, IRI_SUB evaluates IGRF again"""
+
+    global _installed
+    irimagg(0.0, 0.0, 0.0, 1.0, 0.0, 1.0, np.zeros((7, 2, 2, 0), dtype=np.float32))
+    _installed = None
+
+
+def _evaluate(start, stop, step, ntime):
+
+    lat = np.linspace(-90.0, 90.0, round(180.0 / step) + 1)
+    lon = np.linspace(0.0, 360.0, round(360.0 / step) + 1)
+    lat, lon = np.meshgrid(lat, lon, indexing="ij")
+    table = [_igrf(year, lat, lon)[1] for year in np.linspace(start, stop, ntime)]
+    return Grid(start, stop, step, np.stack(table, axis=-1))
+
+
+def _errors(grid):
+    """Largest errors of 'grid' at the centres of its cells and time steps"""
+
+    lat = (grid.lat[:-1] + grid.lat[1:]) / 2.0
+    lon = (grid.lon[:-1] + grid.lon[1:]) / 2.0
+    lat, lon = np.meshgrid(lat, lon, indexing="ij")
+    times = grid.times
+    if len(times) > 1:
+        times = (times[:-1] + times[1:]) / 2.0
+
+    error = dict.fromkeys(ANGLES + RELATIVE, 0.0)
+    for year in times:
+        values = exact(year, lat, lon)
+        values["fl"] = np.minimum(values["fl"], MAXL)
+        approx = grid.interpolate(year, lat, lon)
+        approx["fl"] = np.minimum(approx["fl"], MAXL)
+        for name in ANGLES:
+            error[name] = max(error[name], float(np.abs(approx[name] - values[name]).max()))
+        for name in RELATIVE:
+            relative = np.abs(approx[name] / values[name] - 1.0).max()
+            error[name] = max(error[name], float(relative))
+    return error
+
+
+def build(start, stop=None, tol=TOL, rtol=RTOL, ntime=2):
+    """
+    Build the grid for the decimal years 'start' to 'stop' (default: the
+    following year) with 'ntime' time nodes, with the coarsest of STEPS that
+    meets the error bounds 'tol' (degrees) and 'rtol' (relative)
+
+    Raises ValueError if none of them does.
+    """
+
+    def nodes(step):
+        return (round(180.0 / step) + 1) * (round(360.0 / step) + 1) * ntime
+
+    stop = start + 1.0 if stop is None else stop
+    if nodes(STEPS[0]) > MAXNODES:
+        raise ValueError(
+            f"A grid of {STEPS[0]:g} degree steps and {ntime} time nodes exceeds {MAXNODES} nodes"
+        )
+
+    for step in STEPS:
+        if nodes(step) > MAXNODES:
+            break
+        grid = _evaluate(start, stop, step, ntime)
+        error = _errors(grid)
+        if all(error[name] <= tol for name in ANGLES) and all(
+            error[name] <= rtol for name in RELATIVE
+        ):
+            return grid._replace(error=error)
+
+    raise ValueError(
+        f"No grid of at most {MAXNODES} nodes meets tol={tol:g} and rtol={rtol:g} "
+        f"(errors with {grid.step:g} degree steps: "
+        + ", ".join(f"{name} {value:.3g}" for name, value in error.items())
+        + ")"
+    )
+
+
+def grid(year, tol=TOL, rtol=RTOL, cache_dir=None):
+    """
+    Return the grid of the epoch (calendar year) of the decimal 'year',
+    building it on first use; with a 'cache_dir', grids are also read from
+    and written to .npz files there
+    """
+
+    epoch = int(np.floor(year))
+    key = (epoch, tol, rtol)
+    if key in _grids:
+        return _grids[key]
+
+    path = None
+    if cache_dir is not None:
+        path = Path(cache_dir).expanduser() / f"maggrid-{epoch}-{tol:g}-{rtol:g}.npz"
+    if path is not None and path.exists():
+        result = Grid.load(path)
+    else:
+        result = build(float(epoch), tol=tol, rtol=rtol)
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            result.save(path)
+
+    _grids[key] = result
+    return result
+
+
+@contextmanager
+def use(year, **kwargs):
+    """
+    Context manager installing the 'grid' of the epoch of 'year' (keyword
+    arguments as for 'grid') for the IRI evaluations inside the block; the
+    grid installed before, if any, is installed again afterwards
+    """
+
+    previous = _installed
+    result = grid(year, **kwargs)
+    result.install()
+    try:
+        yield result
+    finally:
+        if previous is None:
+            clear()
+        else:
+            previous.install()
@@ -0,0 +1,154 @@
+"""
+Map plotting back end for repeated lat x lon figures.
+
+Building a Basemap and drawing its coastlines dominate the cost of a map
+plot. Here Basemap instances are cached per map extent, the background of a
+panel is drawn only when its extent changes, fields are drawn with a single
+QuadMesh, and a MapFigure is reused across frames by replacing only the
+mesh data:
+
+    >>> fig = MapFigure(1, 1, figsize=(12, 6))
+    >>> for frame in frames:
+    ...     fig.panel(1).draw(frame["lat"], frame["lon"], frame["foF2"], 0.0, 15.0)
+    ...     fig.save(f"foF2_{frame['index']:03d}.png")
+"""
+
+from functools import lru_cache
+
+from matplotlib.pyplot import close, cm, figure
+from mpl_toolkits.basemap import Basemap
+from numpy import arange, array_equal, asarray, ceil, floor, meshgrid
+
+
+@lru_cache(maxsize=16)
+def basemap(llcrnrlon, llcrnrlat, urcrnrlon, urcrnrlat, resolution="l"):
+    """Basemap for a map extent, built once per extent"""
+
+    return Basemap(
+        llcrnrlon=llcrnrlon,
+        llcrnrlat=llcrnrlat,
+        urcrnrlon=urcrnrlon,
+        urcrnrlat=urcrnrlat,
+        resolution=resolution,
+    )
+
+
+def _round_lim(lim):
+
+    return floor(lim[0] / 10.0) * 10.0, ceil(lim[1] / 10.0) * 10.0
+
+
+class MapPanel:
+    """One map axes whose background is kept while its data are replaced"""
+
+    def __init__(self, ax):
+
+        self.ax = ax
+        self.key = None
+        self.mesh = None
+        self.colorbar = None
+        self.dip = None
+        self.contour = None
+
+    def draw(
+        self,
+        lat,
+        lon,
+        arr,
+        vmin,
+        vmax,
+        dip=None,
+        dlat=20.0,
+        dlon=30.0,
+        countries=False,
+        title=None,
+        label=None,
+        dip_lat=None,
+        dip_lon=None,
+    ):
+        """
+        Show 'arr' (nlat, nlon) on the grid 'lat' x 'lon', with dashed
+        contours of 'dip' (on 'dip_lat' x 'dip_lon', the same grid by
+        default). Parallels and meridians are drawn every 'dlat' and 'dlon'
+        degrees; a colorbar is added if 'label' is given. Returns the
+        QuadMesh.
+        """
+
+        lat, lon, arr = asarray(lat), asarray(lon), asarray(arr)
+        key = (lon[0], lat[0], lon[-1], lat[-1], arr.shape, dlat, dlon, countries)
+
+        if key != self.key:
+            self._background(lat, lon, dlat, dlon, countries)
+            x, y = self.m(*meshgrid(lon, lat))
+            self.mesh = self.ax.pcolormesh(
+                x, y, arr, shading="nearest", cmap=cm.jet, vmin=vmin, vmax=vmax
+            )
+            if self.colorbar is not None:
+                self.colorbar.remove()
+                self.colorbar = None
+            if label is not None:
+                self.colorbar = self.ax.figure.colorbar(self.mesh, ax=self.ax)
+            self.key, self.dip = key, None
+        else:
+            self.mesh.set_array(arr)
+            self.mesh.set_clim(vmin, vmax)
+
+        if dip is not None and (self.dip is None or not array_equal(dip, self.dip)):
+            if self.contour is not None:
+                self.contour.remove()
+            x, y = self.m(
+                *meshgrid(lon if dip_lon is None else dip_lon, lat if dip_lat is None else dip_lat)
+            )
+            self.contour = self.ax.contour(x, y, dip, colors="k", linestyles="--")
+            self.dip = asarray(dip).copy()
+
+        if self.colorbar is not None and label is not None:
+            self.colorbar.set_label(label)
+        if title is not None:
+            self.ax.set_title(title)
+
+        return self.mesh
+
+    def _background(self, lat, lon, dlat, dlon, countries):
+
+        self.ax.cla()
+        self.contour = None
+        self.m = basemap(float(lon[0]), float(lat[0]), float(lon[-1]), float(lat[-1]))
+        self.m.drawcoastlines(ax=self.ax)
+        if countries:
+            self.m.drawcountries(ax=self.ax)
+
+        parallels = _round_lim([lat[0], lat[-1]])
+        self.m.drawparallels(
+            arange(parallels[0], parallels[1], dlat), labels=[True, False, False, True], ax=self.ax
+        )
+        meridians = _round_lim([lon[0], lon[-1]])
+        self.m.drawmeridians(
+            arange(meridians[0], meridians[1], dlon), labels=[True, False, False, True], ax=self.ax
+        )
+
+
+class MapFigure:
+    """A figure of nrows x ncols map panels, reused from frame to frame"""
+
+    def __init__(self, nrows=1, ncols=1, figsize=(12, 6)):
+
+        self.figure = figure(figsize=figsize)
+        self.nrows, self.ncols = nrows, ncols
+        self.panels = {}
+
+    def panel(self, index):
+        """Return the MapPanel at subplot 'index' (1-based), creating it once"""
+
+        if index not in self.panels:
+            ax = self.figure.add_subplot(self.nrows, self.ncols, index)
+            self.panels[index] = MapPanel(ax)
+        return self.panels[index]
+
+    def save(self, path, dpi=100):
+
+        self.figure.savefig(str(path), dpi=dpi, bbox_inches="tight")
+
+    def close(self):
+
+        close(self.figure)
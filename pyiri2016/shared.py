@@ -0,0 +1,121 @@
+"""
+Result arrays in OS shared memory for multi-process grid runs.
+
+A SharedArrays block holds named arrays in one shared memory segment.
+Workers attach to it through its picklable 'spec' and write their slices in
+place, so results are never pickled back to the parent:
+
+    >>> def work(spec, cols):
+    ...     attach(spec)["ne"][:, cols] = ...
+    >>> arrays = fill({"ne": (nalt, nhour)}, work, tasks, workers=4)
+
+Only the creating process removes the segment: 'release()' (on leaving a
+'with' block, or when the SharedArrays is garbage collected) unlinks its
+name, so a crashing worker leaves nothing behind, and the multiprocessing
+resource tracker unlinks it if the parent dies. Arrays stay valid after
+'release()': each process unmaps the segment once the last of its views
+is garbage collected.
+"""
+
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Byte alignment of every array in the segment
+ALIGN = 64
+
+
+def _layout(shapes, dtype):
+    """Offset, shape and dtype of every array, and the segment size"""
+
+    layout, offset = {}, 0
+    for name, shape in shapes.items():
+        shape = tuple(int(n) for n in np.atleast_1d(shape))
+        dt = np.dtype(dtype[name] if isinstance(dtype, dict) else dtype)
+        layout[name] = (offset, shape, dt.str)
+        nbytes = int(np.prod(shape)) * dt.itemsize
+        offset += -(-nbytes // ALIGN) * ALIGN
+    return layout, max(offset, 1)
+
+
+def _views(shm, layout):
+    """Arrays of 'layout' in 'shm'; the mapping is closed when all are gone"""
+
+    root = np.frombuffer(shm.buf, dtype=np.uint8)
+    # root.base is the memoryview exporting the mapping; it is released
+    # when the last view is, after which the mapping can be closed
+    weakref.finalize(root.base, shm.close).atexit = False
+
+    arrays = {}
+    for name, (offset, shape, dt) in layout.items():
+        dt = np.dtype(dt)
+        size = int(np.prod(shape)) * dt.itemsize
+        arrays[name] = root[offset : offset + size].view(dt).reshape(shape)
+    return arrays
+
+
+def attach(spec):
+    """
+    Return the arrays of the SharedArrays described by 'spec' (its 'spec'
+    attribute), as views of the shared segment
+    """
+
+    name, layout = spec
+    return _views(shared_memory.SharedMemory(name=name), layout)
+
+
+class SharedArrays:
+    """
+    Named arrays in one shared memory segment
+
+    'shapes' maps names to shapes and 'dtype' is a dtype or a mapping of
+    names to dtypes. The arrays are zero-initialized.
+    """
+
+    def __init__(self, shapes, dtype=float):
+
+        layout, size = _layout(shapes, dtype)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        self._release = weakref.finalize(self, shm.unlink)
+        self.spec = (shm.name, layout)
+        self.arrays = _views(shm, layout)
+
+    def __getitem__(self, name):
+
+        return self.arrays[name]
+
+    def release(self):
+        """Unlink the segment; arrays already obtained remain usable"""
+
+        self._release()
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exc):
+
+        self.release()
+
+
+def fill(shapes, func, tasks, workers, dtype=float, fill_value=None):
+    """
+    Allocate SharedArrays 'shapes' (initialized to 'fill_value' if given)
+    and call 'func(spec, task)' for every one of 'tasks' in 'workers'
+    processes
+
+    Returns the dict of arrays, views of the shared segment, which is
+    unlinked before returning, also if a worker fails.
+    """
+
+    with SharedArrays(shapes, dtype) as shared:
+        if fill_value is not None:
+            for arr in shared.arrays.values():
+                arr[...] = fill_value
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(func, shared.spec, task) for task in tasks]
+            for future in futures:
+                future.result()
+        return shared.arrays
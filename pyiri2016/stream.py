@@ -0,0 +1,93 @@
+"""
+Generator-based evaluation of long, high-cadence time series of height
+profiles at one location.
+
+    >>> from pyiri2016.stream import iter_profiles
+    >>> for block in iter_profiles("2003-01-01", "2004-01-01", 300, lat=-11.95, lon=-76.87):
+    ...     consume(block["time"], block["ne"])
+
+Each step of the generator evaluates one chunk of profiles in a single
+native call and yields it as a time-by-height block, so memory is bounded by
+the chunk size whatever the length of the series. Chunks are evaluated in
+time order, which keeps the per-month CCIR/URSI coefficients and per-day
+index state cached inside IRI_SUB from one chunk to the next.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+
+from pyiri2016 import batch, nsteps
+from pyiri2016.times import calendar
+
+
+def _as_timedelta64(cadence):
+
+    if isinstance(cadence, timedelta):
+        return np.timedelta64(int(cadence.total_seconds() * 1e6), "us")
+    if isinstance(cadence, np.timedelta64):
+        return cadence
+    return np.timedelta64(round(float(cadence) * 1e6), "us")
+
+
+def iter_profiles(
+    start,
+    stop,
+    cadence,
+    lat=0.0,
+    lon=0.0,
+    altlim=(90.0, 600.0),
+    altstp=10.0,
+    chunk=256,
+    fields=("ne", "te", "ti"),
+    iut=1,
+    jmag=0,
+    jf=None,
+    htecmax=0.0,
+):
+    """
+    Yield height profiles from 'start' (inclusive) to 'stop' (exclusive)
+    every 'cadence', in blocks of at most 'chunk' time steps
+
+    'start' and 'stop' are datetimes, datetime64 or ISO strings, and
+    'cadence' a timedelta, timedelta64 or a number of seconds. Times are UT
+    if iut=1, LT otherwise.
+
+    Every block is a dict with 'time' (datetime64, shape (k,)), 'alt'
+    (shape (nalt,)) and the requested 'fields', height-dependent ones with
+    shape (k, nalt) and peak parameters with shape (k,).
+    """
+
+    start = np.datetime64(start, "us")
+    stop = np.datetime64(stop, "us")
+    step = _as_timedelta64(cadence)
+    if step <= np.timedelta64(0, "us"):
+        raise ValueError("cadence must be positive")
+
+    nalt = nsteps(altlim[0], altlim[1], altstp)
+    alt = altlim[0] + altstp * np.arange(nalt)
+    total = int(np.ceil((stop - start) / step))
+
+    for first in range(0, total, chunk):
+        times = start + step * np.arange(first, min(first + chunk, total))
+        year, month, day, hour = calendar(times)
+
+        outf, oarr = batch.evaluate(
+            year,
+            month,
+            day,
+            hour,
+            lat,
+            lon,
+            alt=altlim[0],
+            altstp=altstp,
+            nalt=nalt,
+            iut=iut,
+            jmag=jmag,
+            jf=jf,
+            htecmax=htecmax,
+        )
+
+        block = {"time": times, "alt": alt}
+        block.update(batch.to_fields(outf, oarr, fields))
+        yield block
@@ -0,0 +1,80 @@
+"""
+Vectorized calendar arithmetic for NumPy datetime64 inputs.
+
+    >>> year, mmdd, doy, hour = decompose(times)
+
+Times may be anything 'numpy.asarray' converts to datetime64: datetime64
+arrays, ISO strings, datetimes, or the values of a (time zone naive) pandas
+DatetimeIndex. Whether they are UT or LT is up to the caller.
+"""
+
+import numpy as np
+
+
+def as_datetime64(times):
+    """'times' as a datetime64[s] array (a 0-d array for a scalar)"""
+
+    return np.asarray(times).astype("datetime64[s]")
+
+
+def calendar(times):
+    """
+    Split a datetime64 array into year, month, day of month and decimal
+    hour arrays
+    """
+
+    times = as_datetime64(times)
+    months = times.astype("datetime64[M]")
+    days = times.astype("datetime64[D]")
+
+    year = months.astype("datetime64[Y]").astype(int) + 1970
+    month = months.astype(int) % 12 + 1
+    day = (days - months.astype("datetime64[D]")).astype(int) + 1
+    hour = (times - days) / np.timedelta64(1, "h")
+
+    return year, month, day, hour
+
+
+def decompose(times):
+    """
+    Split a datetime64 array into the arrays the native drivers take: year,
+    month and day as MMDD, day of year (1-366) and decimal hour
+    """
+
+    times = as_datetime64(times)
+    year, month, day, hour = calendar(times)
+    days = times.astype("datetime64[D]")
+    doy = (days - days.astype("datetime64[Y]")).astype(int) + 1
+
+    return year, month * 100 + day, doy, hour
+
+
+def decimal_year(times):
+    """Year plus the elapsed fraction of it, as used by IGRF and Apex"""
+
+    times = as_datetime64(times)
+    start = times.astype("datetime64[Y]")
+    length = (start + np.timedelta64(1, "Y")).astype("datetime64[s]") - start
+    year = start.astype(int) + 1970
+
+    return year + (times - start) / length
+
+
+def day_order(times):
+    """
+    Order of 'times' that keeps the input order within each calendar day and
+    puts the days in time order
+    """
+
+    days = as_datetime64(times).astype("datetime64[D]").ravel()
+    return np.argsort(days, kind="stable")
+
+
+def by_day(times):
+    """'day_order' of 'times' and the start of every day in that order"""
+
+    days = as_datetime64(times).astype("datetime64[D]").ravel()
+    order = day_order(days)
+    starts = np.flatnonzero(np.r_[True, days[order][1:] != days[order][:-1]])
+
+    return order, starts
@@ -0,0 +1,574 @@
+"""
+Accuracy-versus-speed validation of the fast paths behind
+``python -m pyiri2016 validate``.
+
+A reference dataset is generated from the exact model paths, reproducibly
+from a seed: height profiles from 'iriwebg' (one call per profile),
+points along field lines from 'irisubgl' and D-region points from
+'firisubl', at random locations and times in every season (March, June,
+September and December solstices and equinoxes) of a year of low, medium
+and high solar activity:
+
+    >>> from pyiri2016 import validate
+    >>> ref = validate.reference("reference.npz")   # built and saved once
+    >>> report = validate.score(ref, ["batch", "maggrid"])
+    >>> print(validate.format_report(report))
+    >>> failures = validate.check(report)
+
+Every engine in ENGINES (a dict of functions per part of the dataset, which
+take the part's inputs and return its fields) is scored on the percentiles
+of its errors against the dataset, relative for densities and temperatures
+and in km for heights, next to its speedup over the exact path, both timed
+here on the same inputs. 'check' compares the report with error and speedup
+bounds (GATES, or a JSON file of the same layout with --gate), so the
+command exits with status 1 when a fast path drifts from the model.
+
+Scoring "exact" itself checks that the saved dataset still matches the
+model (errors must be zero).
+"""
+
+import json
+import sys
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from pyiri2016 import adaptive, batch, ccir, firi, magnetic, presets
+from pyiri2016.iriweb import firisubl, irisubgl, iriwebg, iriwebgs
+from pyiri2016.times import decimal_year, decompose
+
+# Month and day of every season, and a year of low, medium and high solar
+# activity (12-month Rz about 3, 57 and 120)
+SEASONS = ((3, 21), (6, 21), (9, 23), (12, 21))
+YEARS = (2008, 2012, 2000)
+
+# Profile heights, km
+ALT = (80.0, 1000.0, 20.0)
+
+# Field-line points between 100 and 1000 km, D-region points of FIRI
+# between 60 and 140 km
+FL_ALT = (100.0, 1000.0)
+FIRI_ALT = (60.0, 140.0)
+
+# Profiles and points per case (season and year)
+SIZES = {"small": (16, 50), "full": (100, 500)}
+
+# Fields of every part; heights (km) are compared as absolute errors
+PROFILE_FIELDS = ("ne", "te", "ti")
+PEAK_FIELDS = ("NmF2", "hmF2", "B0", "M3000F2", "NmE", "hmE")
+FL_FIELDS = {"ne": 0, "tn": 1, "ti": 2, "te": 3}
+ABSOLUTE = ("hmF2", "B0", "hmE", "hmF1")
+
+PERCENTILES = (50, 90, 99)
+
+
+class Reference(NamedTuple):
+    """
+    Reference dataset: 'inputs' and exact 'values' of every part
+    ("profiles", "fieldlines", "firi"), as dicts of arrays keyed by name
+    """
+
+    seed: int
+    inputs: dict
+    values: dict
+
+    def save(self, path):
+        """Write the dataset to an .npz file"""
+
+        arrays = {"seed": self.seed}
+        for kind in ("inputs", "values"):
+            for part, columns in getattr(self, kind).items():
+                arrays.update({f"{kind}.{part}.{name}": a for name, a in columns.items()})
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Read a dataset written by 'save'"""
+
+        inputs, values = {}, {}
+        with np.load(path) as data:
+            for key in data:
+                if key == "seed":
+                    continue
+                kind, part, name = key.split(".")
+                target = inputs if kind == "inputs" else values
+                target.setdefault(part, {})[name] = data[key]
+            return cls(int(data["seed"]), inputs, values)
+
+
+def _cases(rng):
+    """Case times (one per season and year) at a random UT of the day"""
+
+    days = [np.datetime64(f"{y}-{m:02d}-{d:02d}") for y in YEARS for m, d in SEASONS]
+    seconds = rng.integers(0, 86400, len(days))
+    return np.array(days, dtype="datetime64[s]") + seconds.astype("timedelta64[s]")
+
+
+def _time_columns(times):
+
+    year, mmdd, doy, hour = decompose(times)
+    return {"year": year, "mmdd": mmdd, "doy": doy, "hour": hour}
+
+
+def _points(rng, shape, alt):
+    """Random (lon, alt, lat) points, uniform over the sphere"""
+
+    lat = np.degrees(np.arcsin(rng.uniform(-1.0, 1.0, shape)))
+    lon = rng.uniform(-180.0, 180.0, shape)
+    return np.stack([lon, rng.uniform(*alt, shape), lat], axis=-1)
+
+
+def inputs(profiles=16, points=50, seed=0):
+    """
+    Inputs of the reference dataset with 'profiles' profiles and 'points'
+    field-line and FIRI points per case, drawn with 'seed'
+    """
+
+    rng = np.random.default_rng(seed)
+    cases = _cases(rng)
+
+    # Profiles: every case's day, at random UTs and locations
+    days = cases.astype("datetime64[D]").repeat(profiles)
+    times = days + rng.integers(0, 86400, days.size).astype("timedelta64[s]")
+    lon, _, lat = _points(rng, days.size, ALT[:2]).T
+    part = _time_columns(times)
+    part.update(lat=lat, lon=lon, alt=np.arange(ALT[0], ALT[1] + ALT[2] / 2, ALT[2]))
+
+    result = {"profiles": part}
+    for name, alt in (("fieldlines", FL_ALT), ("firi", FIRI_ALT)):
+        result[name] = dict(_time_columns(cases), points=_points(rng, (cases.size, points), alt))
+    return result
+
+
+def _fields(outf, oarr):
+    """Profile fields from 'outf' (30, n, nalt) and 'oarr' (100, n)"""
+
+    values = {name: outf[batch.OUTF_FIELDS[name]] for name in PROFILE_FIELDS}
+    values.update({name: oarr[batch.OARR_FIELDS[name]] for name in PEAK_FIELDS})
+    return values
+
+
+def _altitudes(part):
+
+    alt = part["alt"]
+    return alt[0], alt[1] - alt[0], alt.size
+
+
+#
+# Engines: functions of the inputs of a part returning its fields
+#
+
+
+def _exact_profiles(part):
+
+    alt0, altstp, nalt = _altitudes(part)
+    jf = batch.default_switches()
+    addinp = -np.ones(12)
+    outf = np.empty((30, part["lat"].size, nalt), dtype=np.float32)
+    oarr = np.empty((100, part["lat"].size), dtype=np.float32)
+    for i in range(part["lat"].size):
+        a, b = iriwebg(
+            0,
+            jf,
+            part["lat"][i],
+            part["lon"][i],
+            part["year"][i],
+            part["mmdd"][i],
+            1,
+            part["hour"][i],
+            alt0,
+            0.0,
+            1,
+            alt0,
+            alt0 + altstp * (nalt - 1),
+            altstp,
+            addinp,
+            str(batch.DataFolder),
+        )
+        outf[:, i], oarr[:, i] = a[:, :nalt], b[:, 0]
+    return _fields(outf, oarr)
+
+
+def _float32_profiles(part):
+
+    alt0, altstp, nalt = _altitudes(part)
+    jf = batch.default_switches()
+    addinp = -np.ones(12)
+    outf = np.empty((30, part["lat"].size, nalt), dtype=np.float32)
+    oarr = np.empty((100, part["lat"].size), dtype=np.float32)
+    for i in range(part["lat"].size):
+        hour = part["hour"][i]
+        a, b = iriwebgs(
+            0,
+            jf,
+            part["lat"][i],
+            part["lon"][i],
+            part["year"][i],
+            part["mmdd"][i],
+            1,
+            hour,
+            alt0,
+            0.0,
+            1,
+            alt0,
+            altstp,
+            nalt,
+            8,
+            [hour],
+            addinp,
+            str(batch.DataFolder),
+        )
+        outf[:, i], oarr[:, i] = a[:, :, 0], b[:, 0, 0]
+    return _fields(outf, oarr)
+
+
+def _batch_profiles(part, **kwargs):
+
+    alt0, altstp, nalt = _altitudes(part)
+    month, day = np.divmod(part["mmdd"], 100)
+    outf, oarr = batch.evaluate(
+        part["year"],
+        month,
+        day,
+        part["hour"],
+        part["lat"],
+        part["lon"],
+        alt=alt0,
+        altstp=altstp,
+        nalt=nalt,
+        **kwargs,
+    )
+    return _fields(outf.transpose(0, 2, 1), oarr)
+
+
+def _preset_profiles(name):
+
+    def profiles(part):
+        values = _batch_profiles(part, preset=name)
+        return {key: value for key, value in values.items() if key in presets.get(name).fields}
+
+    return profiles
+
+
+def _adaptive_profiles(part):
+
+    alt = part["alt"]
+    month, day = np.divmod(part["mmdd"], 100)
+    values = {name: np.empty((part["lat"].size, alt.size)) for name in PROFILE_FIELDS}
+    for i in range(part["lat"].size):
+        profile = adaptive.height_profile(
+            part["year"][i],
+            month[i],
+            day[i],
+            part["hour"][i],
+            part["lat"][i],
+            part["lon"][i],
+            altlim=(alt[0], alt[-1]),
+        )
+        for name, value in profile(alt).items():
+            values[name][i] = value
+    return values
+
+
+def _ccir_profiles(part):
+
+    days = (part["year"] - 1970).astype("datetime64[Y]").astype("datetime64[D]") + part["doy"] - 1
+    times = days + np.round(part["hour"] * 3600.0).astype("timedelta64[s]")
+    values = ccir.evaluate(times, part["lat"], part["lon"])
+    # NmF2 of the reference is storm updated, hmF2 takes the quiet foF2
+    return {name: values[name] for name in ("M3000F2", "hmF2")}
+
+
+def _fieldlines(part, maggrid=False):
+
+    jf = batch.default_switches()
+    shape = part["points"].shape[:2]
+    values = {name: np.empty(shape, dtype=np.float32) for name in FL_FIELDS}
+    for k in range(shape[0]):
+        args = (jf, 0, part["year"][k], part["mmdd"][k], part["hour"][k] + 25.0)
+        if maggrid:
+            month, day = divmod(int(part["mmdd"][k]), 100)
+            with magnetic.use(decimal_year(f"{part['year'][k]}-{month:02d}-{day:02d}")):
+                outf, _ = irisubgl(*args, part["points"][k], str(batch.DataFolder))
+        else:
+            outf, _ = irisubgl(*args, part["points"][k], str(batch.DataFolder))
+        for name, row in FL_FIELDS.items():
+            values[name][k] = outf[row]
+    return values
+
+
+def _exact_firi(part):
+
+    shape = part["points"].shape[:2]
+    ne = np.empty(shape, dtype=np.float32)
+    for k in range(shape[0]):
+        edens, ierr = firisubl(
+            part["year"][k],
+            part["doy"][k],
+            part["hour"][k],
+            part["points"][k],
+            str(batch.DataFolder),
+        )
+        ne[k] = np.where(ierr == 0, edens, np.nan)
+    return {"neFIRI": ne}
+
+
+def _point_firi(part):
+
+    lon, alt, lat = np.moveaxis(part["points"], -1, 0)
+    ne, ierr = firi.evaluate(
+        *(part[name][:, None] for name in ("year", "doy", "hour")), lat, lon, alt
+    )
+    return {"neFIRI": np.where(ierr == 0, ne, np.nan)}
+
+
+ENGINES = {
+    # the paths the reference is generated with
+    "exact": {"profiles": _exact_profiles, "fieldlines": _fieldlines, "firi": _exact_firi},
+    # all profiles in one native call (irisubgb)
+    "batch": {"profiles": _batch_profiles},
+    # the single-precision driver behind dtype=float32
+    "float32": {"profiles": _float32_profiles},
+    "ne-only": {"profiles": _preset_profiles("ne-only")},
+    "peaks-only": {"profiles": _preset_profiles("peaks-only")},
+    # magnetic coordinates from pyiri2016.magnetic lookup grids
+    "maggrid": {
+        "profiles": lambda part: _batch_profiles(part, maggrid=True),
+        "fieldlines": lambda part: _fieldlines(part, maggrid=True),
+    },
+    # pyiri2016.adaptive profiles, interpolated to the reference heights
+    "adaptive": {"profiles": _adaptive_profiles},
+    # pyiri2016.firi, the D-region points of all UTs in one native call
+    "firi": {"firi": _point_firi},
+    # pyiri2016.ccir, the F2 peak maps as matrix products
+    "ccir": {"profiles": _ccir_profiles},
+}
+
+# Error bounds (relative, or km for ABSOLUTE fields) per engine and field,
+# '*' for every field scored, and the smallest speedup per part; the number
+# of values valid in only one of engine and reference ('invalid') must be 0
+# unless bounded here
+GATES = {
+    "exact": {"fields": {"*": {"max": 0.0}}},
+    "float32": {"fields": {"*": {"max": 0.0}}},
+    "batch": {"fields": {"*": {"p99": 1e-3, "max": 1e-2}}},
+    "ne-only": {"fields": {"*": {"p99": 1e-3, "max": 1e-2}}, "speedup": {"profiles": 2.0}},
+    "peaks-only": {"fields": {"*": {"p99": 1e-3, "max": 1e-2}}, "speedup": {"profiles": 2.0}},
+    "maggrid": {
+        "fields": {
+            "*": {"p99": 0.005, "max": 0.02},
+            "hmF2": {"p99": 0.5, "max": 2.0},
+            "B0": {"p99": 0.5, "max": 2.0},
+        }
+    },
+    "adaptive": {"fields": {"*": {"p90": 0.005, "p99": 0.02}}},
+    "firi": {"fields": {"*": {"p99": 1e-4, "max": 1e-3}}},
+    "ccir": {"fields": {"*": {"p99": 1e-4, "max": 1e-3}, "hmF2": {"p99": 0.005, "max": 0.01}}},
+}
+
+
+def build(profiles=16, points=50, seed=0):
+    """Generate the reference dataset (see 'inputs') with the "exact" engine"""
+
+    parts = inputs(profiles, points, seed)
+    values = {name: func(parts[name]) for name, func in ENGINES["exact"].items()}
+    return Reference(seed, parts, values)
+
+
+def reference(path=None, size="small", seed=0):
+    """
+    Return the reference dataset of 'size' (a name in SIZES) and 'seed',
+    read from the .npz file 'path' if it exists, otherwise built (and saved
+    there, with a 'path')
+    """
+
+    if path is not None:
+        try:
+            return Reference.load(path)
+        except FileNotFoundError:
+            pass
+    result = build(*SIZES[size], seed=seed)
+    if path is not None:
+        result.save(path)
+    return result
+
+
+#
+# Scoring
+#
+
+
+def _valid(values):
+
+    return np.isfinite(values) & (values > 0.0)
+
+
+def errors(name, values, exact, percentiles=PERCENTILES):
+    """
+    Error statistics of the field 'name': the given percentiles (keys 'p50',
+    ...) and maximum of the errors where both 'values' and 'exact' are
+    valid (finite and positive), their number 'n', and the number of values
+    valid in only one of them, 'invalid'
+    """
+
+    values = np.asarray(values, dtype=float)
+    exact = np.asarray(exact, dtype=float)
+    valid, expected = _valid(values), _valid(exact)
+    both = valid & expected
+    if name in ABSOLUTE:
+        error = np.abs(values[both] - exact[both])
+    else:
+        error = np.abs(values[both] / exact[both] - 1.0)
+
+    stats = {"n": int(both.sum()), "invalid": int((valid != expected).sum())}
+    stats.update(dict.fromkeys([f"p{q:g}" for q in percentiles] + ["max"], 0.0))
+    if error.size:
+        for q, value in zip(percentiles, np.percentile(error, percentiles), strict=True):
+            stats[f"p{q:g}"] = float(value)
+        stats["max"] = float(error.max())
+    return stats
+
+
+def _timed(func, part, repeat):
+    """Values of 'func' and its best time of 'repeat' runs, after a warm-up"""
+
+    values = func(part)
+    seconds = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(part)
+        seconds = min(seconds, time.perf_counter() - start)
+    return values, seconds
+
+
+def score(ref, engines=None, repeat=1):
+    """
+    Score 'engines' (names in ENGINES, default all) against the reference
+    dataset 'ref'; every part is timed 'repeat' times, after a warm-up run,
+    as is the "exact" engine for the speedups
+
+    Returns the report as a JSON-compatible dict.
+    """
+
+    engines = list(ENGINES) if engines is None else list(engines)
+    unknown = set(engines) - set(ENGINES)
+    if unknown:
+        raise KeyError(f"Unknown engine(s): {', '.join(sorted(unknown))}")
+
+    baseline = {}
+    report = {
+        "seed": ref.seed,
+        "size": {
+            part: int(np.prod(v["points"].shape[:2])) if "points" in v else v["lat"].size
+            for part, v in ref.inputs.items()
+        },
+        "engines": {},
+    }
+    for name in engines:
+        report["engines"][name] = {}
+        for part, func in ENGINES[name].items():
+            if part not in baseline:
+                baseline[part] = _timed(ENGINES["exact"][part], ref.inputs[part], repeat)
+            if name == "exact":
+                values, seconds = baseline[part]
+            else:
+                values, seconds = _timed(func, ref.inputs[part], repeat)
+            report["engines"][name][part] = {
+                "seconds": seconds,
+                "speedup": baseline[part][1] / seconds,
+                "fields": {
+                    field: errors(field, value, ref.values[part][field])
+                    for field, value in values.items()
+                },
+            }
+    return report
+
+
+def check(report, gates=GATES):
+    """Failures of the engines in 'report' against the bounds 'gates', as messages"""
+
+    failures = []
+    for name, result in report["engines"].items():
+        gate = gates.get(name)
+        if gate is None:
+            continue
+        bounds = gate.get("fields", {})
+        for part, scored in result.items():
+            minimum = gate.get("speedup", {}).get(part)
+            if minimum is not None and scored["speedup"] < minimum:
+                failures.append(f"{name} {part}: speedup {scored['speedup']:.2f} below {minimum:g}")
+            for field, stats in scored["fields"].items():
+                bound = {"invalid": 0, **bounds.get("*", {}), **bounds.get(field, {})}
+                for key, limit in bound.items():
+                    if stats[key] > limit:
+                        failures.append(
+                            f"{name} {part} {field}: {key} {stats[key]:.3g} above {limit:g}"
+                        )
+    return failures
+
+
+def format_report(report):
+    """The report as a text table"""
+
+    lines = [
+        (
+            f"{'engine':<11} {'part':<10} {'speedup':>8} {'field':<8} "
+            f"{'p50':>9} {'p90':>9} {'p99':>9} {'max':>9} {'invalid':>7}"
+        )
+    ]
+    for name, result in report["engines"].items():
+        for part, scored in result.items():
+            for field, stats in scored["fields"].items():
+                lines.append(
+                    f"{name:<11} {part:<10} {scored['speedup']:>7.2f}x {field:<8} "
+                    + " ".join(f"{stats[key]:>9.2e}" for key in ("p50", "p90", "p99", "max"))
+                    + f" {stats['invalid']:>7d}"
+                )
+    return "\n".join(lines)
+
+
+def main(args):
+    """Entry point for 'python -m pyiri2016 validate'"""
+
+    ref = reference(args.reference, args.size, args.seed)
+    report = score(ref, args.engines.split(",") if args.engines else None, args.repeat)
+
+    gates = GATES
+    if args.gate is not None:
+        with open(args.gate) as fp:
+            gates = json.load(fp)
+    report["failures"] = check(report, gates)
+
+    print(format_report(report))
+    if args.report is not None:
+        with open(args.report, "w") as fp:
+            json.dump(report, fp, indent=1)
+    for failure in report["failures"]:
+        print(f"FAIL {failure}", file=sys.stderr)
+    if report["failures"]:
+        raise SystemExit(1)
+
+
+def add_parser(subparsers):
+    """Register the 'validate' sub-command"""
+
+    parser = subparsers.add_parser(
+        "validate",
+        help="score the fast paths against a reference dataset of the exact model",
+        description="Score engines on their error percentiles against a reproducible reference "
+        "dataset of the exact model paths and on their speedup, and exit with status 1 if any "
+        "exceeds its bounds.",
+    )
+    parser.add_argument("--reference", help=".npz reference dataset, built there if missing")
+    parser.add_argument("--size", choices=list(SIZES), default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--engines", help="comma-separated engines, from: " + ", ".join(ENGINES) + " (default all)"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per engine, best taken")
+    parser.add_argument("--gate", help="JSON file of bounds, as validate.GATES")
+    parser.add_argument("--report", help="write the report as JSON")
+    parser.set_defaults(func=main)
+
+    return parser
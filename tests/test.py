@@ -1,6 +1,10 @@
 #!/usr/bin/env python
+import numpy as np
 from numpy.testing import assert_allclose
+from pyiri2016.iriweb import irisubgl
+
 from pyiri2016 import IRI2016
+from pyiri2016.iri2016prof2D import DataFolder
 
 
 def test_main1():
@@ -11,3 +15,20 @@ def test_main1():
         (IRIData["ne"], IRIDATAAdd["NmF2"], IRIDATAAdd["hmF2"]),
         (267285184512.0, 2580958937088.0, 438.78643798828125),
     )
+
+
+def test_field_line_ion_composition():
+
+    # O+, O2+, NO+ and N+ (%) at 150-300 km over Jicamarca; NaN before CHEMION set NPLUS and NNO
+    coordl = np.array([[-76.87, alt, -11.95] for alt in (150.0, 200.0, 250.0, 300.0)], np.float32)
+    outf, _ = irisubgl(IRI2016().Switches(), 0, 2003, 1121, 13.0, coordl, DataFolder)
+    assert_allclose(
+        outf[[4, 7, 8, 10]],
+        [
+            [10.231071, 60.869617, 90.765884, 97.359695],
+            [20.138262, 6.8500303, 1.2932236, 0.18319169],
+            [68.359222, 29.903522, 5.8305302, 0.70975441],
+            [0.36898372, 1.0588537, 1.4030013, 1.5160816],
+        ],
+        rtol=1e-5,
+    )
@@ -0,0 +1,51 @@
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from pyiri2016 import batch
+from pyiri2016.adaptive import height_profile, lat_lon_map
+
+
+def test_lat_lon_map_matches_dense_grid():
+
+    rtol = 0.02
+    m = lat_lon_map(
+        2003,
+        11,
+        21,
+        12.0,
+        latlim=(-40.0, 40.0),
+        latstp=2.0,
+        lonlim=(-120.0, 0.0),
+        lonstp=2.0,
+        levels=3,
+        rtol=rtol,
+    )
+
+    lat, lon = np.meshgrid(m["lat"], m["lon"], indexing="ij")
+    assert m["NmF2"].shape == lat.shape
+    assert m["evaluations"] == m["evaluated"].sum() < lat.size
+    assert (m["error"][m["evaluated"]] == 0).all()
+
+    outf, oarr = batch.evaluate(2003, 11, 21, 12.0, lat.ravel(), lon.ravel(), htecmax=2000.0)
+    dense = batch.to_fields(outf, oarr, ("NmF2", "hmF2", "TEC"))
+
+    for name, ref in dense.items():
+        ref = ref.reshape(lat.shape)
+        assert_array_equal(m[name][m["evaluated"]], ref[m["evaluated"]])
+        err = np.abs(m[name] - ref) / (ref.max() - ref.min())
+        assert np.percentile(err, 99) < rtol
+        assert err.max() < 3 * rtol
+
+
+def test_height_profile_matches_dense_profile():
+
+    p = height_profile(2003, 11, 21, 12.0, -11.95, -76.87, altlim=(80.0, 1000.0), rtol=0.01)
+
+    alt = np.arange(80.0, 1000.0, 0.5)
+    outf, oarr = batch.evaluate(2003, 11, 21, 12.0, -11.95, -76.87, alt=alt)
+    ref = batch.to_fields(outf, oarr, ("ne",))["ne"]
+
+    assert p.evaluations < 200
+    assert np.isin(np.float32(oarr[1, 0]), p.alt.astype(np.float32))  # hmF2 is a node
+    assert (np.diff(p.alt) > 0).all()
+    assert (np.abs(p(alt)["ne"] - ref) / ref).max() < 0.02
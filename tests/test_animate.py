@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+pytest.importorskip("mpl_toolkits.basemap")
+
+from pyiri2016.animate import animate
+
+
+def test_animate_gif_is_deterministic(tmp_path):
+
+    times = np.datetime64("2010-09-01T00:00") + np.arange(3) * np.timedelta64(1, "h")
+    kwargs = {"latstp": 10.0, "lonstp": 20.0, "figsize": (4, 2), "dpi": 50}
+
+    assert animate(times, tmp_path / "serial.gif", workers=1, **kwargs) == 3
+    assert animate(times, tmp_path / "parallel.gif", workers=2, **kwargs) == 3
+
+    serial = (tmp_path / "serial.gif").read_bytes()
+    assert serial == (tmp_path / "parallel.gif").read_bytes()
+
+    with Image.open(tmp_path / "serial.gif") as im:
+        assert im.n_frames == 3
+        assert im.size == (200, 100)
@@ -1,7 +1,10 @@
 import io
+import shutil
 import tarfile
 import tempfile
 from pyiri2016.api import update
+from pyiri2016.batch import DataFolder
+from pyiri2016.iriweb import iritcon
 from unittest import TestCase
 from unittest.mock import patch, ANY
 from simple_settings import LazySettings
@@ -78,3 +81,23 @@ class TestApiUpdate(TestCase):
             with patch("pyiri2016.api.update.wget.download", return_value=fake_path):
                 with self.assertRaises(ValueError):
                     update.retrieve("http://example.com", "absolute.tar", directory=tmpdir)
+
+    def test_retrieve_reloads_indices(self):
+        """Indices retrieved in a running process are used by the next model call."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            index = pathlib.Path(tmpdir) / "index"
+            shutil.copytree(DataFolder / "index", index)
+            before = iritcon([2016], [101], tmpdir)[4]
+
+            def download(url, out, bar):
+                # New apf107.dat with a 365-day F10.7 mean of 200
+                rows = (DataFolder / "index" / "apf107.dat").read_text().splitlines()
+                path = pathlib.Path(out) / "apf107.dat"
+                path.write_text("".join(row[:-5] + "200.0\n" for row in rows))
+                return str(path)
+
+            with patch("pyiri2016.api.update.wget.download", side_effect=download):
+                update.retrieve(SETTINGS.INDICES_URL, "apf107.dat", directory=str(index))
+
+            self.assertNotEqual(before[0], 200.0)
+            self.assertEqual(iritcon([2016], [101], tmpdir)[4][0], 200.0)
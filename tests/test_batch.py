@@ -0,0 +1,56 @@
+import io
+import json
+
+from numpy.testing import assert_allclose
+
+from pyiri2016 import IRI2016, batch
+
+
+def test_evaluate_matches_iri():
+
+    IRIData, IRIDataAdd = IRI2016().IRI()
+
+    # IRI2016.IRI defaults: 1980-03-21, 12 LT, equator, 130 km
+    outf, oarr = batch.evaluate(1980, 3, 21, 12.0, 0.0, 0.0, alt=[130.0, 130.0], iut=0)
+    fields = batch.to_fields(outf, oarr, ("ne", "NmF2", "hmF2"))
+
+    assert_allclose(fields["ne"], IRIData["ne"])
+    assert_allclose(fields["NmF2"], IRIDataAdd["NmF2"])
+    assert_allclose(fields["hmF2"], IRIDataAdd["hmF2"])
+
+
+def test_run_csv_to_ndjson_profiles():
+
+    source = io.StringIO(
+        "year,month,day,hour,lat,lon\n2003,11,21,12,0,0\n2003,11,21,18,10,-70\n2003,11,22,0,-10,60\n"
+    )
+    sink = io.StringIO()
+
+    count, _ = batch.run(
+        source,
+        sink,
+        outformat="ndjson",
+        fields=("ne", "hmF2"),
+        chunk_size=2,
+        alt=100.0,
+        profile=(50.0, 5),
+    )
+    records = [json.loads(line) for line in sink.getvalue().splitlines()]
+
+    assert count == 3
+    assert [r["lon"] for r in records] == [0.0, -70.0, 60.0]
+    assert all(len(r["ne"]) == 5 for r in records)
+
+
+def test_out_of_range_date_does_not_leak():
+
+    outf, _ = batch.evaluate(2003, 11, 21, 12.0, 0.0, 0.0)
+    assert batch.evaluate(2099, 11, 21, 12.0, 0.0, 0.0)[0][0, 0] == -1.0
+    assert_allclose(batch.evaluate(2003, 11, 21, 12.0, 0.0, 0.0)[0], outf)
+
+
+def test_profile_with_inexact_step_fills_every_height():
+
+    for alt, altstp, nalt in ((100.0, 0.3, 50), (65.0, 0.1, 1000)):
+        outf, _ = batch.evaluate(2016, 1, 1, 12.0, -11.95, -76.87, alt, altstp, nalt)
+        assert (outf[0, :, 0] > 0.0).all()
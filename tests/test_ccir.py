@@ -0,0 +1,45 @@
+import numpy as np
+from numpy.testing import assert_allclose
+
+from pyiri2016 import IRI2016, batch, ccir
+from pyiri2016.times import decompose
+
+
+def test_evaluate_matches_iri():
+
+    rng = np.random.default_rng(0)
+    lat = np.degrees(np.arcsin(rng.uniform(-1.0, 1.0, 200)))
+    lon = rng.uniform(-180.0, 180.0, 200)
+    times = np.datetime64("2003-11-21") + rng.integers(0, 3 * 86400, 200).astype("timedelta64[s]")
+
+    year, mmdd, _, hour = decompose(times)
+    outf, oarr = batch.evaluate(
+        year, mmdd // 100, mmdd % 100, hour, lat, lon, jf=IRI2016().Switches()
+    )
+    expected = batch.to_fields(outf, oarr, ("NmF2", "hmF2", "M3000F2", "NmE"))
+    peaks = ccir.evaluate(times, lat, lon)
+
+    for name in ("NmF2", "hmF2", "M3000F2"):
+        assert_allclose(peaks[name], expected[name], rtol=1e-4)
+    assert_allclose(peaks["foE"] ** 2 * 1.24e10, expected["NmE"], rtol=1e-3)
+
+
+def test_maps():
+
+    lat, lon = np.arange(-90.0, 91.0, 30.0), np.arange(0.0, 360.0, 45.0)
+    times = np.array(["2003-11-21T03", "2003-11-22T10", "2099-01-01"], dtype="datetime64[s]")
+    maps = ccir.maps(times, lat, lon, ccir=True)
+    points = ccir.evaluate(times[:, None, None], lat[:, None], lon, ccir=True)
+
+    assert maps["hmF2"].shape == (3, lat.size, lon.size)
+    for name in ccir.FIELDS:
+        assert_allclose(maps[name], points[name])
+        assert np.isnan(maps[name][2]).all()
+        assert np.isfinite(maps[name][:2]).all()
+
+
+def test_functions():
+
+    assert ccir.geographic(10.0, 20.0, 30.0, ccir.QF).shape == (76,)
+    assert ccir.geographic([10.0, 0.0], 20.0, 30.0, ccir.QM).shape == (2, 49)
+    assert_allclose(ccir.harmonics(12.0, 2), [1.0, 0.0, 1.0, 0.0, 1.0], atol=1e-12)
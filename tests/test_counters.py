@@ -0,0 +1,42 @@
+from numpy.testing import assert_array_equal
+
+from pyiri2016 import IRI2016, counters, msis_cache, reload_indices
+
+
+def test_counters_reset_and_track():
+
+    counters.reset()
+    assert set(counters.get().values()) == {0}
+
+    reload_indices()
+    with counters.track() as first:
+        IRI2016().IRI()
+    assert first["iri_sub"] == 1
+    assert first["ig_rz_open"] == 1
+    assert first["apf107_open"] == 1
+    assert first["gtd7"] + first["gtd7_hit"] > 0
+
+    # Same month: CCIR/URSI coefficients stay cached inside IRI_SUB
+    with counters.track() as second:
+        IRI2016().IRI()
+    assert second["iri_sub"] == 1
+    assert second["ig_rz_open"] == 0
+    assert second["apf107_open"] == 0
+    assert second["ccir_open"] == 0
+    assert second["ursi_open"] == 0
+
+
+def test_msis_cache():
+
+    msis_cache(0)
+    with counters.track() as uncached:
+        iri, _ = IRI2016().IRI(vstp=10.0)
+    assert uncached["gtd7_hit"] == 0
+
+    msis_cache(256)
+    with counters.track() as cached:
+        iri2, _ = IRI2016().IRI(vstp=10.0)
+    assert cached["gtd7_hit"] > 0
+    assert cached["gtd7"] + cached["gtd7_hit"] == uncached["gtd7"]
+    for name in ("ne", "te", "ti", "oplus"):
+        assert_array_equal(iri2[name], iri[name])
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+from pyiri2016.iriweb import iriwebg
+
+from pyiri2016 import batch, ensemble
+
+
+def _addinp():
+
+    return ensemble.members(
+        Rz12=[-1.0, 80.0, -1.0, -1.0, 120.0, -1.0],
+        F107=[-1.0, -1.0, 150.0, -1.0, 200.0, -1.0],
+        foF2=[-1.0, -1.0, -1.0, 9.0, -1.0, -1.0],
+        hmF2=[-1.0, -1.0, -1.0, 320.0, -1.0, -1.0],
+    )
+
+
+def test_members():
+
+    addinp = ensemble.members(4, F107=150.0, IG12=[90.0, 100.0, 110.0, 120.0])
+
+    assert addinp.shape == (4, 12)
+    assert_array_equal(addinp[:, ensemble.ADDINP["F107"]], 150.0)
+    assert_array_equal(addinp[:, ensemble.ADDINP["IG12"]], [90.0, 100.0, 110.0, 120.0])
+    assert (addinp[:, :10] == -1.0).all()
+    with pytest.raises(KeyError):
+        ensemble.members(Kp=3.0)
+
+
+def test_run_matches_single_members():
+
+    jf = batch.default_switches()
+    addinp = _addinp()
+    result = ensemble.run(addinp, 2003, 11, 21, 13.5, lat=-11.95, lon=-76.87, jf=jf)
+
+    for k, row in enumerate(addinp):
+        a, b = iriwebg(
+            0,
+            jf,
+            -11.95,
+            -76.87,
+            2003,
+            1121,
+            1,
+            13.5,
+            90.0,
+            0.0,
+            1,
+            90.0,
+            600.0,
+            10.0,
+            row,
+            str(batch.DataFolder),
+        )
+        assert_array_equal(result["ne"][k], a[0, :52].astype(np.float32))
+        assert result["NmF2"][k] == np.float32(b[0, 0])
+
+
+def test_members_are_independent():
+
+    addinp = _addinp()
+    result = ensemble.run(addinp, 2003, 11, 21, 13.5, lat=-11.95, lon=-76.87)
+    reverse = ensemble.run(addinp[::-1], 2003, 11, 21, 13.5, lat=-11.95, lon=-76.87)
+
+    for name in batch.FIELDS:
+        assert_array_equal(reverse[name], result[name][::-1])
+    assert_array_equal(result["stats"]["hmF2"]["p50"], np.median(result["hmF2"]))
+    assert_array_equal(result["stats"]["ne"]["mean"], result["ne"].astype(float).mean(axis=0))
+
+
+def test_statistics_leave_out_invalid_values():
+
+    stats = ensemble.statistics([[1.0, -1.0, -1.0], [3.0, -1.0, 4.0], [5.0, -1.0, 2.0]])
+
+    assert_array_equal(stats["n"], [3, 0, 2])
+    assert_array_equal(stats["mean"], [3.0, np.nan, 3.0])
+    assert_array_equal(stats["p50"], [3.0, np.nan, 3.0])
+
+
+def test_inexact_step_fills_every_height():
+
+    addinp = _addinp()
+    for altlim, altstp in (((100.0, 130.0), 0.3), ((65.0, 164.9), 0.1)):
+        result = ensemble.run(addinp, 2003, 11, 21, 13.5, altlim=altlim, altstp=altstp)
+        assert result["alt"][-1] == pytest.approx(altlim[1])
+        assert (result["ne"] > 0.0).all()
+        assert (result["stats"]["ne"]["n"] == len(addinp)).all()
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+from pyiri2016 import export
+from pyiri2016.stream import iter_profiles
+
+
+def _blocks():
+
+    return iter_profiles(
+        "2003-11-21", "2003-11-21T06:00", 3600, altlim=(100.0, 300.0), altstp=50.0, chunk=4
+    )
+
+
+def test_hdf5_stream_and_append(tmp_path):
+
+    h5py = pytest.importorskip("h5py")
+    path = tmp_path / "ne.h5"
+    blocks = list(_blocks())
+
+    assert export.save_stream(path, blocks[:1], chunk=2) == 4
+    assert export.save_stream(path, blocks[1:], mode="a", chunk=2) == 2
+
+    with h5py.File(path) as f:
+        assert f["ne"].shape == (6, 5)
+        assert f["ne"].compression == "gzip"
+        assert f["ne"].dims[1][0].name == "/alt"
+        assert_array_equal(f["alt"][:], blocks[0]["alt"])
+        assert_array_equal(f["ne"][4:], blocks[1]["ne"])
+        time = f["time"][:].astype("datetime64[s]")
+    assert_array_equal(time, np.concatenate([b["time"] for b in blocks]))
+
+
+def test_netcdf_stream_and_append(tmp_path):
+
+    netCDF4 = pytest.importorskip("netCDF4")
+    path = tmp_path / "ne.nc"
+    blocks = list(_blocks())
+
+    export.save_stream(path, blocks[:1])
+    export.save_stream(path, iter(blocks[1:]), mode="a")
+
+    with netCDF4.Dataset(path) as f:
+        assert f.dimensions["time"].isunlimited()
+        assert f.variables["ne"].dimensions == ("time", "alt")
+        assert f.variables["ne"].filters()["zlib"]
+        assert f.variables["te"].units == "K"
+        assert_array_equal(f.variables["ne"][:], np.concatenate([b["ne"] for b in blocks]))
+
+
+def test_parquet_stream_and_append(tmp_path):
+
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "ne.parquet"
+    blocks = list(_blocks())
+
+    export.save_stream(path, blocks[:1])
+    export.save_stream(path, blocks[1:], mode="a")
+
+    table = pq.read_table(path)
+    assert table.num_rows == 6
+    ne = np.stack(table["ne"].to_numpy(zero_copy_only=False))
+    assert_array_equal(ne, np.concatenate([b["ne"] for b in blocks]))
+    assert b"coords" in pq.read_schema(path / "part-00000.parquet").metadata
+
+
+def test_save_grid_lat_vs_lon(tmp_path):
+
+    netCDF4 = pytest.importorskip("netCDF4")
+    pytest.importorskip("mpl_toolkits.basemap")
+    from pyiri2016.iri2016prof2D import IRI2016_2DProf
+
+    grid = IRI2016_2DProf(latlim=[-30.0, 30.0], latstp=30.0, option=2, verbose=False)
+    grid.LatVsLon(lonlim=[-60.0, 60.0], lonstp=60.0)
+    path = tmp_path / "map.nc"
+    export.save_grid(path, grid)
+
+    with netCDF4.Dataset(path) as f:
+        assert f.variables["NmF2"].dimensions == ("lon", "lat")
+        assert_array_equal(f.variables["lat"][:], grid.data2D["lat"])
+        assert_array_equal(f.variables["NmF2"][:], grid.data2D["NmF2"])
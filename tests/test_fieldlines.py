@@ -0,0 +1,57 @@
+from unittest.mock import patch
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from pyiri2016 import fieldlines
+
+
+def _trace(date, dlon, dlat, hateq, mlatlim, mlatstp):
+    """Stand-in for the pyapex tracing: a parabola of apex height 'hateq'"""
+
+    mlat = np.arange(mlatlim[0], mlatlim[1] + mlatstp / 2, mlatstp)
+    alt = hateq * (1.0 - (mlat / 30.0) ** 2)
+    lon = np.full_like(mlat, dlon + date - 2000.0)
+    return [lon, alt, dlat + mlat], [lon + 5.0, alt, mlat]
+
+
+def test_lines_are_cached(tmp_path):
+
+    fieldlines.clear()
+    args = (-77.76, -11.95, np.arange(100.0, 150.0, 10.0), (-10.0, 10.0), 1.0)
+    with patch.object(fieldlines, "trace", side_effect=_trace) as trace:
+        first = fieldlines.lines(2003.891, *args, cache_dir=tmp_path)
+        assert trace.call_count == 5
+        assert first.coordl.shape == (5, 3, 21)
+        assert np.isclose(first.coordl[0, 0, 0], -77.76 + 3.89)
+
+        # same rounded date: from memory, then from disk
+        first.coordl[:] = 0.0
+        second = fieldlines.lines(2003.889, *args, cache_dir=tmp_path)
+        fieldlines.clear()
+        third = fieldlines.lines(2003.89, *args, cache_dir=tmp_path)
+        assert trace.call_count == 5
+        assert_array_equal(second.coordl, third.coordl)
+        assert_array_equal(second.qdcoordl, third.qdcoordl)
+        assert len(list(tmp_path.glob("fieldlines-*.npz"))) == 1
+
+        # the exact date, other heights
+        fieldlines.lines(2003.891, *args, date_step=0)
+        fieldlines.lines(2003.89, args[0], args[1], [100.0], *args[3:])
+        assert trace.call_count == 11
+    fieldlines.clear()
+
+
+def test_memory_cache_is_bounded(monkeypatch):
+
+    fieldlines.clear()
+    monkeypatch.setattr(fieldlines, "MAXLINES", 2)
+    args = (-77.76, -11.95, [100.0], (-10.0, 10.0), 1.0)
+    with patch.object(fieldlines, "trace", side_effect=_trace) as trace:
+        for date in (2003.0, 2004.0, 2003.0, 2005.0, 2003.0):
+            fieldlines.lines(date, *args, date_step=0)
+        assert trace.call_count == 3
+        assert len(fieldlines._lines) == 2
+        fieldlines.lines(2004.0, *args, date_step=0)
+        assert trace.call_count == 4
+    fieldlines.clear()
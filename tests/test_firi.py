@@ -0,0 +1,60 @@
+from collections import OrderedDict
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+from pyiri2016.iriweb import firisubl
+
+from pyiri2016 import batch, firi
+
+
+def test_evaluate_matches_firisubl():
+
+    rng = np.random.default_rng(0)
+    lat = np.degrees(np.arcsin(rng.uniform(-1.0, 1.0, 2000)))
+    lon, alt = rng.uniform(-180.0, 180.0, 2000), rng.uniform(55.0, 145.0, 2000)
+    points = np.stack([lon, alt, lat], axis=-1).astype(np.float32)
+
+    for year, doy, hour in [(2003, 325, 12.3), (2008, 3, 0.5), (2000, 366, 23.9)]:
+        expected, code = firisubl(year, doy, hour, points, str(batch.DataFolder))
+        ne, ierr = firi.evaluate(year, doy, hour, *points[:, [2, 0, 1]].T.astype(float))
+        assert_array_equal(ierr, code)
+        assert_array_equal(ne, expected)
+
+
+def test_f00_error_codes():
+
+    ne, ierr = firi.f00([100.0, 50.0, 100.0], [10.0, 10.0, 70.0], 172, 30.0, 150.0)
+    assert_array_equal(ierr % 2, ne == 0.0)
+    assert_array_equal(ierr // 2, [0, 1, 1])
+
+
+def test_local_time_wraps_days_and_years():
+
+    year, doy, lt = firi.local_time(2003, [365, 1, 100], [23.0, 1.0, 12.0], [30.0, -30.0, 360.0])
+    assert_array_equal(year, [2004, 2002, 2003])
+    assert_array_equal(doy, [1, 365, 100])
+    assert_allclose(lt, [1.0, 23.0, 12.0])
+
+
+def test_f00_matches_evaluate():
+
+    year, doy, hour = 2003, 325, 12.3
+    lat, lon, alt = np.linspace(-50.0, 50.0, 11), np.linspace(-170.0, 170.0, 11), 90.0
+    _, ldoy, lt = firi.local_time(year, doy, hour, lon)
+    f107 = firi.daily_f107(year, doy)
+
+    ne, ierr = firi.f00(alt, lat, ldoy, firi.zenith(ldoy, lt, lat, lon), f107)
+    expected, code = firi.evaluate(year, doy, hour, lat, lon, alt)
+    assert_array_equal(ierr, code)
+    assert_allclose(ne, expected, rtol=1e-4)
+
+
+def test_daily_f107_cache_is_bounded(monkeypatch):
+
+    monkeypatch.setattr(firi, "F107_DAYS", 3)
+    monkeypatch.setattr(firi, "_f107", OrderedDict())
+    first = firi.daily_f107(2003, [1, 2, 3])
+    firi.daily_f107(2003, [3, 4])
+
+    assert list(firi._f107) == [2003002, 2003003, 2003004]
+    assert_array_equal(firi.daily_f107(2003, [1, 2, 3]), first)
@@ -0,0 +1,26 @@
+import pickle
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+from pyiri2016.interpolate import MapInterpolator
+
+
+def test_map_interpolator():
+
+    lat, lon = np.arange(-60.0, 61.0, 20.0), np.arange(-180.0, 181.0, 30.0)
+    la, lo = np.meshgrid(lat, lon, indexing="ij")
+    f = MapInterpolator(lat[::-1], lon, a=(2.0 * la + lo)[::-1], b=la * 0.0 + 5.0)
+
+    # Linear fields are reproduced exactly, inside and at the nodes
+    qlat, qlon = np.array([-55.0, 0.0, 33.3, 60.0]), np.array([-170.0, 12.5, 179.0, 180.0])
+    out = f(qlat, qlon)
+    assert_allclose(out["a"], 2.0 * qlat + qlon)
+    assert_allclose(out["b"], 5.0)
+
+    # Nearest edge value outside the grid
+    assert_allclose(f(90.0, 0.0)["a"], 120.0)
+
+    grid = pickle.loads(pickle.dumps(f)).grid(qlat, qlon)
+    assert grid["a"].shape == (4, 4)
+    assert_allclose(grid["a"], 2.0 * qlat[:, None] + qlon[None, :])
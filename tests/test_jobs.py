@@ -0,0 +1,64 @@
+import json
+import os
+import socket
+
+import pytest
+from numpy.testing import assert_array_equal
+
+from pyiri2016 import batch
+from pyiri2016.jobs import Job
+from pyiri2016.stream import calendar
+
+SPEC = {
+    "start": "2003-11-21",
+    "stop": "2003-11-21T05:00",
+    "cadence": 3600,
+    "latstp": 30.0,
+    "lonstp": 60.0,
+    "altlim": [100.0, 400.0],
+    "altstp": 100.0,
+    "fields": ["ne", "NmF2"],
+    "shard_size": 2,
+}
+
+
+def test_job_resumes_and_merges(tmp_path):
+
+    job = Job(tmp_path / "job", SPEC)
+    assert job.nshards == 3
+
+    # Shard 1 claimed by a process that died
+    lock = tmp_path / "job" / "shards" / "000001.lock"
+    lock.write_text(json.dumps({"host": socket.gethostname(), "pid": 2**22 + 1, "time": 0.0}))
+    # Shard 2 claimed by a live process on another node
+    (tmp_path / "job" / "shards" / "000002.lock").write_text(
+        json.dumps({"host": "elsewhere", "pid": os.getpid(), "time": 1e12})
+    )
+
+    assert job.run() == 2
+    assert sorted(job.completed()) == [0, 1]
+    with pytest.raises(RuntimeError):
+        job.merge()
+
+    (tmp_path / "job" / "shards" / "000002.lock").unlink()
+    rerun = Job(tmp_path / "job", SPEC)
+    assert rerun.run(workers=2) == 1
+    assert Job(tmp_path / "job").run() == 0
+
+    merged = rerun.merge()
+    assert merged["ne"].shape == (5, 7, 7, 4)
+    assert merged["NmF2"].shape == (5, 7, 7)
+    assert_array_equal(merged["time"], rerun.times)
+
+    year, month, day, hour = calendar(rerun.times[3])
+    outf, oarr = batch.evaluate(
+        year, month, day, hour, 30.0, -120.0, alt=100.0, altstp=100.0, nalt=4
+    )
+    assert_array_equal(merged["ne"][3, 4, 1], batch.to_fields(outf, oarr, ("ne",))["ne"][0])
+
+
+def test_job_rejects_other_spec(tmp_path):
+
+    Job(tmp_path, SPEC)
+    with pytest.raises(ValueError):
+        Job(tmp_path, {**SPEC, "latstp": 10.0})
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose, assert_array_equal
+
+from pyiri2016 import batch, counters, magnetic
+from pyiri2016.times import decimal_year
+
+# Rows of 'oarr' (0-based): dip, dip latitude, modified dip, L value
+OARR = {"dip": 24, "magbr": 25, "modip": 26, "fl": 84}
+
+
+def _requests(n=200):
+
+    rng = np.random.default_rng(0)
+    return rng.uniform(0.0, 24.0, n), rng.uniform(-89.0, 89.0, n), rng.uniform(-180.0, 180.0, n)
+
+
+def test_grid_error_bound():
+
+    grid = magnetic.grid(2003.9)
+    assert (grid.start, grid.stop) == (2003.0, 2004.0)
+    assert all(grid.error[name] <= magnetic.TOL for name in magnetic.ANGLES)
+    assert all(grid.error[name] <= magnetic.RTOL for name in magnetic.RELATIVE)
+
+    lat, lon = np.meshgrid(np.linspace(-89.5, 89.5, 60), np.linspace(-179.5, 179.5, 120))
+    values = magnetic.exact(2003.3, lat, lon)
+    approx = grid.interpolate(2003.3, lat, lon)
+    for name in magnetic.ANGLES:
+        assert np.abs(approx[name] - values[name]).max() <= magnetic.TOL
+
+
+def test_evaluate_with_grid():
+
+    hour, lat, lon = _requests()
+    year = np.where(np.arange(len(lat)) % 3, 2003, 2004)
+    outf, oarr = batch.evaluate(year, 11, 21, hour, lat, lon)
+
+    grids = {epoch: magnetic.grid(epoch) for epoch in (2003, 2004)}
+    with counters.track() as calls:
+        outf2, oarr2 = batch.evaluate(year, 11, 21, hour, lat, lon, maggrid=True)
+    assert calls["maggrid"] > 0
+    assert calls["igrf_dip"] == calls["igrf_sub"] == 0
+
+    for epoch, grid in grids.items():
+        sel = year == epoch
+        approx = grid.interpolate(decimal_year(f"{epoch}-11-21"), lat[sel], lon[sel])
+        for name, i in OARR.items():
+            value = np.minimum(approx[name], magnetic.MAXL) if name == "fl" else approx[name]
+            assert_allclose(oarr2[i, sel], value, atol=2e-3)
+    assert np.abs(oarr2[24] - oarr[24]).max() <= magnetic.TOL
+    assert_allclose(outf2[0], outf[0], rtol=0.01)
+
+    # The grid is removed again
+    assert_array_equal(batch.evaluate(year, 11, 21, hour, lat, lon)[1], oarr)
+
+
+def test_geomagnetic_input_and_disk_cache(tmp_path):
+
+    hour, lat, lon = _requests(50)
+    _, oarr = batch.evaluate(2010, 3, 1, hour, lat, lon, jmag=1)
+    _, oarr2 = batch.evaluate(
+        2010, 3, 1, hour, lat, lon, jmag=1, maggrid={"tol": 0.05, "cache_dir": tmp_path}
+    )
+    assert np.abs(oarr2[24] - oarr[24]).max() <= 0.05
+
+    (path,) = tmp_path.glob("maggrid-2010-*.npz")
+    grid = magnetic.Grid.load(path)
+    assert_array_equal(grid.table, magnetic.grid(2010, tol=0.05).table)
+    assert grid.error == magnetic.grid(2010, tol=0.05).error
+
+
+def test_use_restores_the_previous_grid():
+
+    assert magnetic.installed() is None
+    with magnetic.use(2003) as outer:
+        with magnetic.use(2004) as inner:
+            assert magnetic.installed() is inner
+        assert magnetic.installed() is outer
+        hour, lat, lon = _requests(20)
+        with counters.track() as calls:
+            batch.evaluate(2003, 11, 21, hour, lat, lon, maggrid=True)
+        assert calls["igrf_dip"] == 0
+        assert magnetic.installed() is outer
+    assert magnetic.installed() is None
+
+
+def test_build_too_many_time_nodes():
+
+    with pytest.raises(ValueError, match="exceeds"):
+        magnetic.build(2003.0, ntime=200)
@@ -0,0 +1,52 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("mpl_toolkits.basemap")
+
+from pyiri2016.mapplot import MapFigure
+
+
+def test_map_figure_reuse(tmp_path):
+
+    lat, lon = np.arange(-60.0, 61.0, 10.0), np.arange(-120.0, 1.0, 10.0)
+    fig = MapFigure(1, 2, figsize=(8, 4))
+
+    panel = fig.panel(1)
+    mesh = panel.draw(lat, lon, np.zeros((lat.size, lon.size)), 0.0, 15.0, label="foF2 (MHz)")
+    background = list(panel.ax.collections)
+
+    # Same extent: the mesh and the background artists are kept
+    data = np.ones((lat.size, lon.size))
+    assert panel.draw(lat, lon, data, 0.0, 15.0) is mesh
+    assert list(panel.ax.collections) == background
+    assert np.array_equal(mesh.get_array(), data)
+
+    # Another panel with the same extent shares the cached Basemap
+    fig.panel(2).draw(lat, lon, data, 0.0, 15.0)
+    assert fig.panel(2).m is panel.m
+    assert fig.panel(1) is panel
+
+    fig.save(tmp_path / "map.png")
+    assert (tmp_path / "map.png").stat().st_size > 0
+    fig.close()
+
+
+def test_map_figures_are_shared(capsys):
+
+    from matplotlib.pyplot import get_fignums
+
+    from pyiri2016.iri2016prof2D import IRI2016_2DProf
+
+    # Three instances draw on the same figure
+    fignums = []
+    for _ in range(3):
+        grid = IRI2016_2DProf(latlim=[-30.0, 30.0], latstp=30.0, option=2, verbose=False)
+        grid.LatVsLon(lonlim=[-60.0, 60.0], lonstp=60.0)
+        grid.Plot2D()
+        fignums.append(get_fignums())
+
+    for line in capsys.readouterr().out.splitlines():
+        Path(line.split(": ", 1)[1]).unlink()
+    assert fignums[1] == fignums[2] == fignums[0]
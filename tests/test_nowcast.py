@@ -0,0 +1,71 @@
+import shutil
+from unittest.mock import patch
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from pyiri2016 import nowcast
+
+SPEC = {"lat": -11.95, "lon": -76.87, "altlim": [100.0, 500.0], "altstp": 50.0}
+
+
+def test_extend_matches_full_run(tmp_path):
+
+    path = tmp_path / "product.npz"
+    _, report = nowcast.update(path, "2016-01-01", "2016-01-03", SPEC)
+    assert (report["computed"], report["reused"]) == (48, 0)
+
+    product, report = nowcast.update(path, "2016-01-01T12", "2016-01-04")
+    assert (report["computed"], report["reused"], report["dropped"]) == (24, 36, 12)
+
+    full, _ = nowcast.update(tmp_path / "full.npz", "2016-01-01T12", "2016-01-04", SPEC)
+    loaded = nowcast.Product.load(path)
+    assert_array_equal(loaded.time, full.time)
+    for name in full.values:
+        assert_array_equal(product.values[name], full.values[name])
+        assert_array_equal(loaded.values[name], full.values[name])
+
+
+def test_revised_days_are_recomputed(tmp_path):
+
+    path = tmp_path / "product.npz"
+    nowcast.update(path, "2016-01-01", "2016-01-04", SPEC)
+
+    original = nowcast.fingerprints
+
+    def revised(days, folder=nowcast.DataFolder):
+        prints = original(days, folder)
+        prints[np.asarray(days) == np.datetime64("2016-01-02")] = "revised"
+        return prints
+
+    with patch.object(nowcast, "fingerprints", revised):
+        product, report = nowcast.update(path, "2016-01-01", "2016-01-04")
+    assert (report["computed"], report["reused"]) == (24, 48)
+    assert report["revised"] == ["2016-01-02"]
+    assert "revised" in product.fingerprint
+
+
+def test_fingerprints_follow_index_files(tmp_path):
+
+    shutil.copytree(nowcast.DataFolder / "index", tmp_path / "index")
+    days = np.arange("2016-01-01", "2016-01-12", dtype="datetime64[D]")
+    before = nowcast.fingerprints(days, tmp_path)
+    assert_array_equal(before, nowcast.fingerprints(days, nowcast.DataFolder))
+
+    # Revise the ap indices of 2016-01-05
+    apf = tmp_path / "index" / "apf107.dat"
+    rows = apf.read_text().splitlines(keepends=True)
+    row = (np.datetime64("2016-01-05") - nowcast.APF_START).astype(int)
+    rows[row] = rows[row][:9] + " 99" + rows[row][12:]
+    apf.write_text("".join(rows))
+
+    changed = nowcast.fingerprints(days, tmp_path) != before
+    assert_array_equal(days[changed], np.arange("2016-01-04", "2016-01-10", dtype="datetime64[D]"))
+
+
+def test_inexact_step_fills_every_height(tmp_path):
+
+    spec = {**SPEC, "altlim": [100.0, 102.1], "altstp": 0.7}
+    product, _ = nowcast.update(tmp_path / "product.npz", "2016-01-01", "2016-01-01T03", spec)
+    assert_array_equal(product.alt, [100.0, 100.7, 101.4, 102.1])
+    assert (product.values["ne"] > 0).all()
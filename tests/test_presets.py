@@ -0,0 +1,24 @@
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from pyiri2016 import batch, presets
+
+
+def test_presets_match_full():
+
+    rng = np.random.default_rng(0)
+    lat, lon, hour = rng.uniform(-80, 80, 50), rng.uniform(-180, 180, 50), rng.uniform(0, 24, 50)
+    kwargs = {"alt": 80.0, "altstp": 20.0, "nalt": 40}
+
+    full = batch.evaluate(2003, 11, 21, hour, lat, lon, preset="full", **kwargs)
+    assert_array_equal(full[1][36] > 0, True)  # TEC
+
+    for name, preset in presets.PRESETS.items():
+        assert presets.get(name) is preset
+        assert hash(preset) == hash(presets.Preset(*preset))
+        if not preset.fields:
+            continue
+        out = batch.evaluate(2003, 11, 21, hour, lat, lon, preset=preset, **kwargs)
+        got, ref = batch.to_fields(*out, preset.fields), batch.to_fields(*full, preset.fields)
+        for field in preset.fields:
+            assert_array_equal(got[field], ref[field], err_msg=f"{name}: {field}")
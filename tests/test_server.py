@@ -0,0 +1,131 @@
+import asyncio
+import json
+import multiprocessing
+import time
+from unittest.mock import patch
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+from pyiri2016 import batch, server
+
+
+def _requests(n=40):
+
+    rng = np.random.default_rng(0)
+    hour, lat, lon = rng.uniform(0.0, 24.0, n), rng.uniform(-60.0, 60.0, n), rng.uniform(0, 360, n)
+    return [
+        {"id": i, "year": 2003, "month": 11, "day": 21, "hour": h, "lat": a, "lon": o}
+        for i, (h, a, o) in enumerate(zip(hour.tolist(), lat.tolist(), lon.tolist(), strict=True))
+    ]
+
+
+async def _exchange(path, messages):
+    """Send 'messages' pipelined on one connection, return the replies"""
+
+    reader, writer = await asyncio.open_unix_connection(path)
+    writer.write(b"".join(json.dumps(message).encode() + b"\n" for message in messages))
+    await writer.drain()
+    replies = [json.loads(await reader.readline()) for _ in messages]
+    writer.close()
+    await writer.wait_closed()
+    return replies
+
+
+def _serve(tmp_path, messages, clients=1, **options):
+    """Replies of every client and the metrics of a Server with 'options'"""
+
+    async def main():
+        model = server.Server(**{"workers": 0, **options})
+        path = str(tmp_path / "iri.sock")
+        listener = await model.start(path=path)
+        try:
+            replies = await asyncio.gather(*(_exchange(path, messages) for _ in range(clients)))
+            (metrics,) = await _exchange(path, [{"op": "metrics"}])
+        finally:
+            listener.close()
+            await listener.wait_closed()
+            model.close()
+        return replies, metrics
+
+    return asyncio.run(main())
+
+
+def test_points_match_batch(tmp_path):
+
+    messages = _requests()
+    (replies,), metrics = _serve(tmp_path, messages, window=0.05)
+
+    columns = {name: np.array([m[name] for m in messages]) for name in batch.COLUMNS[:-1]}
+    outf, oarr = batch.evaluate(*columns.values())
+    expected = batch.to_fields(outf, oarr)
+    replies = {reply["id"]: reply for reply in replies}
+    for name in batch.FIELDS:
+        assert_allclose([replies[i][name] for i in range(len(messages))], expected[name])
+
+    assert metrics["requests"] == len(messages)
+    assert metrics["errors"] == 0
+    assert metrics["batches"] < len(messages)
+    assert metrics["latency_ms"]["max"] > 0.0
+
+
+def test_profiles_and_errors(tmp_path):
+
+    profile = dict(_requests(1)[0], id="p", alt=100.0, nalt=30, altstp=10.0, fields=["ne", "hmF2"])
+    missing = {"id": "m", "year": 2003, "month": 11, "day": 21, "hour": 12.0, "lat": 0.0}
+    unknown = dict(_requests(1)[0], id="u", fields=["Kp"])
+    (replies,), metrics = _serve(tmp_path, [profile, missing, unknown, "nonsense"])
+    replies = {reply["id"]: reply for reply in replies}
+
+    assert set(replies["p"]) == {"id", "ne", "hmF2"}
+    assert len(replies["p"]["ne"]) == 30
+    assert np.isscalar(replies["p"]["hmF2"])
+    assert "lon" in replies["m"]["error"]
+    assert "Kp" in replies["u"]["error"]
+    assert "error" in replies[None]
+    assert metrics["errors"] == 3
+
+
+def test_internal_errors(tmp_path, caplog):
+
+    def fail(*args):
+        raise RuntimeError("native crash")
+
+    messages = _requests(2)
+    with patch.object(server, "_evaluate", fail):
+        (replies,), metrics = _serve(tmp_path, messages, window=0.05)
+
+    # Answered as server errors, and logged with the traceback
+    assert [reply["status"] for reply in replies] == [500, 500]
+    assert "native crash" not in json.dumps(replies)
+    assert metrics["errors"] == 2
+    (record,) = [r for r in caplog.records if r.name == "pyiri2016.server"]
+    assert "native crash" in str(record.exc_info[1])
+
+
+def test_backpressure(tmp_path):
+
+    messages = _requests(60)
+    replies, metrics = _serve(tmp_path, messages, clients=3, max_queue=4, max_batch=8)
+
+    for client in replies:
+        assert sorted(reply["id"] for reply in client) == list(range(len(messages)))
+    assert metrics["requests"] == 3 * len(messages)
+    assert metrics["mean_batch"] <= 8
+
+
+def test_worker_processes(tmp_path):
+
+    messages = _requests()
+    (expected,), _ = _serve(tmp_path, messages, window=0.05)
+    (replies,), metrics = _serve(tmp_path, messages, workers=2, window=0.05)
+
+    expected = {reply["id"]: reply for reply in expected}
+    assert {reply["id"]: reply for reply in replies} == expected
+    assert metrics["errors"] == 0
+
+    # The pool is shut down with the server
+    deadline = time.monotonic() + 10.0
+    while multiprocessing.active_children() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not multiprocessing.active_children()
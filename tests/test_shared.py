@@ -0,0 +1,56 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+from pyiri2016 import IRI2016Profile
+from pyiri2016.shared import attach, fill
+
+
+def _segments():
+
+    shm = Path("/dev/shm")
+    return set(shm.iterdir()) if shm.is_dir() else set()
+
+
+def _write_row(spec, row):
+
+    attach(spec)["x"][row] = row
+
+
+def _crash(spec, row):
+
+    if row == 3:
+        os._exit(1)
+    _write_row(spec, row)
+
+
+def test_fill_writes_in_place():
+
+    arrays = fill({"x": (4, 3)}, _write_row, range(4), workers=2, dtype=np.float32)
+
+    assert arrays["x"].dtype == np.float32
+    assert_array_equal(arrays["x"], np.repeat(np.arange(4.0), 3).reshape(4, 3))
+
+
+def test_fill_unlinks_after_worker_crash():
+
+    before = _segments()
+    with pytest.raises(BrokenProcessPool):
+        fill({"x": (8, 3)}, _crash, range(8), workers=2)
+    assert _segments() == before
+
+
+def test_sweep_workers_match_serial():
+
+    profile = IRI2016Profile(latlim=[-30.0, 30.0], latstp=10.0, option=2, verbose=False)
+    lons = [-120.0, -60.0, 0.0, 60.0, 120.0]
+
+    a, b = profile.Sweep(3, lons)
+    a2, b2 = profile.Sweep(3, lons, workers=2)
+
+    assert_array_equal(a2, a)
+    assert_array_equal(b2, b)
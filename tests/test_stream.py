@@ -0,0 +1,57 @@
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+
+from pyiri2016 import IRI2016, IRI2016Profile
+from pyiri2016.stream import calendar, iter_profiles
+
+
+def test_calendar():
+
+    times = np.array(["2004-02-29T13:30", "1999-12-31T23:59:59"], dtype="datetime64[s]")
+    year, month, day, hour = calendar(times)
+
+    assert_array_equal(year, [2004, 1999])
+    assert_array_equal(month, [2, 12])
+    assert_array_equal(day, [29, 31])
+    assert_allclose(hour, [13.5, 23.0 + 3599.0 / 3600.0])
+
+
+def test_iter_profiles_matches_profile():
+
+    blocks = list(
+        iter_profiles(
+            "2003-11-21",
+            "2003-11-22",
+            3600,
+            lat=-11.95,
+            lon=-76.87,
+            altlim=(100.0, 500.0),
+            altstp=20.0,
+            chunk=5,
+            jf=IRI2016().Switches(),
+        )
+    )
+
+    assert [len(b["time"]) for b in blocks] == [5, 5, 5, 5, 4]
+    assert blocks[2]["ne"].shape == (5, 21)
+
+    profile = IRI2016Profile(
+        altlim=[100.0, 500.0], altstp=20.0, hour=13.0, lat=-11.95, lon=-76.87, verbose=False
+    )
+    assert blocks[2]["time"][3] == np.datetime64("2003-11-21T13:00")
+    assert_allclose(blocks[2]["ne"][3], profile.a[0, :21], rtol=1e-6)
+
+
+def test_iter_profiles_with_inexact_step_fills_every_height():
+
+    (block,) = iter_profiles(
+        "2003-11-21T12",
+        "2003-11-21T14",
+        3600,
+        lat=-11.95,
+        lon=-76.87,
+        altlim=(100.0, 102.1),
+        altstp=0.7,
+    )
+    assert block["ne"].shape == (2, 4)
+    assert (block["ne"] > 0).all()
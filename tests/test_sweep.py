@@ -0,0 +1,65 @@
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+
+from pyiri2016 import IRI2016, IRI2016Profile
+
+
+def test_sweep_matches_profiles():
+
+    hours = np.arange(0.0, 24.0, 6.0)
+    kwargs = {"altlim": [100.0, 500.0], "altstp": 50.0, "lat": -11.95, "lon": -76.87}
+
+    sweep = IRI2016Profile(hour=hours[0], option=1, verbose=False, **kwargs)
+    a, b = sweep.Sweep(8, hours)
+
+    assert a.shape == (30, sweep.numstp, hours.size)
+    assert b.shape == (100, sweep.numstp, hours.size)
+
+    for k, hour in enumerate(hours):
+        sweep.hour = hour
+        sweep._CallIRI()
+        assert_array_equal(a[:, :, k], sweep.a[:, : sweep.numstp])
+        assert_array_equal(b[:, :, k], sweep.b[:, : sweep.numstp])
+
+
+def test_single_precision_profile():
+
+    kwargs = {"altlim": [100.0, 500.0], "altstp": 50.0, "lat": -11.95, "lon": -76.87}
+
+    double = IRI2016Profile(verbose=False, **kwargs)
+    single = IRI2016Profile(verbose=False, dtype=np.float32, **kwargs)
+
+    assert single.a.dtype == np.float32
+    assert single.a.shape == double.a.shape == (30, 1000)
+    assert_array_equal(
+        single.a[:, : single.numstp], double.a[:, : double.numstp].astype(np.float32)
+    )
+    assert_array_equal(
+        single.b[:, : single.numstp], double.b[:, : double.numstp].astype(np.float32)
+    )
+
+    iri, _ = IRI2016().IRI(dtype=np.float32)
+    assert iri["ne"].dtype == np.float32
+    assert iri["ne"] == np.float32(IRI2016().IRI()[0]["ne"])
+
+
+def test_sweep_with_inexact_step_fills_every_height():
+
+    kwargs = {"altlim": [100.0, 130.0], "altstp": 0.3, "lat": -11.95, "lon": -76.87}
+    sweep = IRI2016Profile(option=1, verbose=False, **kwargs)
+    a, _ = sweep.Sweep(8, [12.0])
+
+    assert a.shape[1] == 101
+    assert (a[0, :, 0] > 0.0).all()
+
+
+def test_profile_with_inexact_step_fills_every_height():
+
+    kwargs = {"altstp": 0.1, "lat": -11.95, "lon": -76.87, "verbose": False}
+    profile = IRI2016Profile(altlim=[100.0, 101.1], **kwargs)
+    last = IRI2016Profile(altlim=[101.1, 101.1], **kwargs)
+
+    # The 12th height is computed; the columns past it are -1
+    assert profile.numstp == 12
+    assert_allclose(profile.a[:4, 11], last.a[:4, 0], rtol=1e-5)
+    assert (profile.b[:, 12:] == -1.0).all()
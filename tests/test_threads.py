@@ -0,0 +1,44 @@
+import numpy as np
+from numpy.testing import assert_array_equal
+from pyiri2016.iriweb import firisubl, irisubgl
+
+from pyiri2016 import IRI2016, threads
+from pyiri2016.iri2016prof2D import DataFolder
+
+
+def _points(n=40):
+
+    rng = np.random.default_rng(0)
+    lon = rng.uniform(-180.0, 180.0, n)
+    alt = rng.uniform(60.0, 1500.0, n)
+    lat = rng.uniform(-89.0, 89.0, n)
+    return np.stack([lon, alt, lat], 1).astype(np.float32)
+
+
+def test_threads_setting():
+
+    n = threads()
+    assert n >= 1
+    assert threads(n) == n
+
+
+def test_field_line_points_are_independent():
+    """
+    Every point gives the same result whatever was evaluated before it, as
+    needed to share the points among threads
+    """
+
+    jf = IRI2016().Switches()
+    coordl = _points()
+    perm = np.random.default_rng(1).permutation(len(coordl))
+
+    for year, mmdd, hour in [(2003, 1121, 23.25), (2010, 315, 5.5)]:
+        outf, oarr = irisubgl(jf, 0, year, mmdd, hour, coordl, DataFolder)
+        outf2, oarr2 = irisubgl(jf, 0, year, mmdd, hour, coordl[perm], DataFolder)
+        assert_array_equal(outf2, outf[:, perm])
+        assert_array_equal(oarr2, oarr[:, perm])
+
+        ne, ierr = firisubl(year, 100, hour, coordl, DataFolder)
+        ne2, ierr2 = firisubl(year, 100, hour, coordl[perm], DataFolder)
+        assert_array_equal(ne2, ne[perm])
+        assert_array_equal(ierr2, ierr[perm])
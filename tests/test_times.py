@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+
+from pyiri2016 import IRI2016, IRI2016Profile, batch
+from pyiri2016.times import by_day, day_order, decimal_year, decompose
+
+
+def test_decompose():
+
+    times = ["2004-12-31T06:00", "2003-03-01T13:30", datetime(2000, 2, 29, 23, 59, 59)]
+    year, mmdd, doy, hour = decompose(times)
+
+    assert_array_equal(year, [2004, 2003, 2000])
+    assert_array_equal(mmdd, [1231, 301, 229])
+    assert_array_equal(doy, [366, 60, 60])
+    assert_allclose(hour, [6.0, 13.5, 24.0 - 1.0 / 3600.0])
+    assert_allclose(decimal_year(["2004-07-02", "2003-01-01"]), [2004.5, 2003.0])
+
+
+def test_by_day():
+
+    times = np.array(["2003-11-22T01", "2003-11-21T05", "2003-11-22T00", "2003-11-21T02"])
+    order, starts = by_day(times.astype("datetime64[h]"))
+
+    assert_array_equal(order, [1, 3, 0, 2])
+    assert_array_equal(starts, [0, 2])
+    assert_array_equal(day_order(times), order)
+
+
+def test_evaluate_times_matches_calendar_inputs():
+
+    times = np.datetime64("2003-11-20T22:00") + np.arange(0, 300, 13) * np.timedelta64(10, "m")
+    times = times[np.random.default_rng(0).permutation(len(times))]
+    lat = np.linspace(-30.0, 30.0, len(times))
+
+    outf, oarr = batch.evaluate_times(times, lat, -76.87, alt=250.0)
+
+    year, mmdd, _, hour = decompose(times)
+    outf2, oarr2 = batch.evaluate(year, mmdd // 100, mmdd % 100, hour, lat, -76.87, alt=250.0)
+    assert_array_equal(outf, outf2)
+    assert_array_equal(oarr, oarr2)
+
+
+def test_time_argument():
+
+    iri, _ = IRI2016().IRI(time=np.datetime64("2003-11-21T13:30"), vend=300.0, vstp=10.0)
+    iri2, _ = IRI2016().IRI(year=2003, month=11, dom=21, hrlt=13.5, vend=300.0, vstp=10.0)
+    assert_array_equal(iri["ne"], iri2["ne"])
+
+    profile = IRI2016Profile(time="2003-11-21T23:15", verbose=False)
+    assert (profile.year, profile.mmdd, profile.hour) == (2003, 1121, 23.25)
@@ -0,0 +1,51 @@
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from pyiri2016 import validate
+
+
+def test_errors():
+
+    stats = validate.errors("ne", [1.1, 2.0, -1.0, 4.0], [1.0, 2.0, 3.0, -1.0])
+    assert (stats["n"], stats["invalid"]) == (2, 2)
+    assert np.isclose(stats["max"], 0.1)
+
+    stats = validate.errors("hmF2", [301.0, 250.0], [300.0, 250.0])
+    assert stats["max"] == 1.0
+    assert stats["p50"] == 0.5
+
+
+def test_reference_is_reproducible(tmp_path):
+
+    path = tmp_path / "reference.npz"
+    ref = validate.build(2, 5, seed=1)
+    ref.save(path)
+    loaded = validate.reference(path)
+
+    assert loaded.seed == 1
+    for kind in ("inputs", "values"):
+        for part, columns in getattr(ref, kind).items():
+            for name, value in columns.items():
+                assert_array_equal(getattr(loaded, kind)[part][name], value)
+    assert_array_equal(
+        validate.inputs(2, 5, seed=1)["firi"]["points"], ref.inputs["firi"]["points"]
+    )
+    assert ref.values["profiles"]["ne"].shape == (24, ref.inputs["profiles"]["alt"].size)
+
+
+def test_score_and_gate():
+
+    ref = validate.build(2, 5)
+    report = validate.score(ref, ["exact", "float32", "batch"])
+
+    assert set(report["engines"]["exact"]) == {"profiles", "fieldlines", "firi"}
+    for name in ("exact", "float32"):
+        for scored in report["engines"][name].values():
+            assert all(stats["max"] == 0.0 for stats in scored["fields"].values())
+    assert validate.check(report) == []
+
+    gates = {"batch": {"fields": {"ne": {"max": -1.0}}, "speedup": {"profiles": 1e9}}}
+    failures = validate.check(report, gates)
+    assert len(failures) == 2
+    assert "batch profiles ne: max" in failures[1]
+    assert "ne" in validate.format_report(report)